@@ -23,6 +23,33 @@ def create_app(config_name='default'):
     db.init_app(app)
     login_manager.init_app(app)
     
+    from app import dbmonitor
+    dbmonitor.init_app(app)
+    
+    from app import profiler
+    profiler.init_app(app)
+    
+    from app import metrics
+    metrics.init_app(app)
+    
+    from app.cache import cache
+    cache.init_app(app)
+    
+    from app import usercache
+    usercache.init_app(app)
+    
+    from app import passwords
+    passwords.init_app(app)
+    
+    from app import stream
+    stream.init_app(app)
+    
+    from app import jobs
+    jobs.init_app(app)
+    
+    from app import sequence
+    sequence.init_app(app)
+    
     # Login manager settings
     login_manager.login_view = 'auth.login'
     login_manager.login_message = 'Please log in to access this page.'
@@ -34,17 +61,15 @@ def create_app(config_name='default'):
     app.register_blueprint(main_bp)
     app.register_blueprint(auth_bp)
     
+    # Keep derived tables in step with sales and stock writes
+    from app import rollup  # noqa: F401
+    from app import restock  # noqa: F401
+    from app import ledger  # noqa: F401
+    
     # Create upload folder
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     
-    # Create database tables
-    with app.app_context():
-        db.create_all()
-        
-        # Add default admin user if not exists
-        from app.models import User
-        from app.auth import create_default_admin
-        create_default_admin()
+    # Schema creation and the default admin are explicit: `flask init-db`
 
     @app.context_processor
     def inject_current_year():
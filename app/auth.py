@@ -1,7 +1,10 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request
+from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app
 from flask_login import login_user, logout_user, login_required, current_user
 from app import db
 from app.models import User
+from app.passwords import HasherBusy, hasher_for
+
+BUSY_MESSAGE = 'Too many sign-ins right now, please try again in a moment'
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/auth')
 
@@ -17,7 +20,17 @@ def login():
         
         user = User.query.filter_by(username=username).first()
         
-        if user and user.check_password(password):
+        try:
+            valid = user is not None and user.check_password(password)
+            # Move old hashes to the configured parameters while we have the password
+            if valid and hasher_for(current_app).needs_rehash(user.password_hash):
+                user.set_password(password)
+                db.session.commit()
+        except HasherBusy:
+            flash(BUSY_MESSAGE, 'warning')
+            return render_template('login.html'), 503, {'Retry-After': '2'}
+        
+        if valid:
             login_user(user, remember=remember)
             flash('Login successful!', 'success')
             return redirect(url_for('main.dashboard'))
@@ -52,7 +65,11 @@ def register():
         
         # Create new user (default role: staff)
         new_user = User(username=username, email=email, role='staff')
-        new_user.set_password(password)
+        try:
+            new_user.set_password(password)
+        except HasherBusy:
+            flash(BUSY_MESSAGE, 'warning')
+            return render_template('register.html'), 503, {'Retry-After': '2'}
         
         db.session.add(new_user)
         db.session.commit()
@@ -0,0 +1,316 @@
+"""
+Server-side result cache for the JSON APIs.
+
+Responses are cached per endpoint and query string, and tagged with the
+version of each data set they read (sales, products, customers). Commits
+that touch those models bump the versions through session events, which
+both invalidates cached bodies and changes the ETag, so a client holding
+the current ETag gets a 304 without any database work.
+
+Backends:
+    memory  - per-process LRU with TTL (default). Entries and data versions
+              live in one process, so only use it with a single worker
+              process: writes made by another worker do not bump this
+              worker's versions and its ETags would go stale.
+    sqlite  - a local SQLite file shared by all workers on one host
+    null    - caching disabled; responses carry no ETag and are never 304
+"""
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, has_app_context, request
+from sqlalchemy import event
+
+from app import db
+
+# Which cached data sets a write to each model invalidates
+MODEL_NAMESPACES = {
+    'Sale': ('sales',),
+    'SaleItem': ('sales',),
+    'Product': ('products',),
+    # Customer types bucket the sales rollup
+    'Customer': ('customers', 'sales'),
+}
+
+
+class NullCache:
+    """Backend that stores nothing"""
+
+    # Whether responses may be cached and revalidated at all
+    enabled = False
+    # Whether entries and versions are seen by every worker process
+    shared = False
+
+    def __init__(self):
+        self.epoch = uuid.uuid4().hex[:8]
+        self.hits = 0
+        self.misses = 0
+        self._versions = {}
+
+    def get(self, key):
+        self.misses += 1
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def clear(self):
+        pass
+
+    def versions(self, namespaces):
+        return tuple(self._versions.get(ns, 0) for ns in namespaces)
+
+    def bump(self, namespaces):
+        for ns in namespaces:
+            self._versions[ns] = self._versions.get(ns, 0) + 1
+
+
+class LRUCache(NullCache):
+    """In-process LRU cache with per-entry expiry"""
+
+    enabled = True
+
+    def __init__(self, max_entries=512, default_timeout=60):
+        super().__init__()
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, timeout=None):
+        expires = time.monotonic() + (timeout or self.default_timeout)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def bump(self, namespaces):
+        with self._lock:
+            super().bump(namespaces)
+
+
+class SQLiteCache(NullCache):
+    """Cache stored in a local SQLite file so every worker process shares
+    entries and data versions"""
+
+    enabled = True
+    shared = True
+
+    def __init__(self, path, max_entries=2048, default_timeout=60):
+        super().__init__()
+        self.path = path
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._local = threading.local()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        conn = self._connection()
+        with conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS entries '
+                         '(key TEXT PRIMARY KEY, value BLOB, expires REAL)')
+            conn.execute('CREATE TABLE IF NOT EXISTS versions '
+                         '(namespace TEXT PRIMARY KEY, version INTEGER NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO versions VALUES ('__epoch__', ?)",
+                         (uuid.uuid4().int & 0x7FFFFFFF,))
+        self.epoch = str(conn.execute(
+            "SELECT version FROM versions WHERE namespace = '__epoch__'").fetchone()[0])
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connection().execute(
+            'SELECT value FROM entries WHERE key = ? AND expires >= ?', (key, time.time())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return pickle.loads(row[0])
+
+    def set(self, key, value, timeout=None):
+        now = time.time()
+        conn = self._connection()
+        with conn:
+            conn.execute('INSERT OR REPLACE INTO entries VALUES (?, ?, ?)',
+                         (key, pickle.dumps(value), now + (timeout or self.default_timeout)))
+            conn.execute('DELETE FROM entries WHERE expires < ?', (now,))
+            conn.execute('DELETE FROM entries WHERE key IN (SELECT key FROM entries '
+                         'ORDER BY expires DESC LIMIT -1 OFFSET ?)', (self.max_entries,))
+
+    def delete(self, key):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM entries WHERE key = ?', (key,))
+
+    def clear(self):
+        with self._connection() as conn:
+            conn.execute('DELETE FROM entries')
+
+    def versions(self, namespaces):
+        rows = dict(self._connection().execute(
+            'SELECT namespace, version FROM versions WHERE namespace IN (%s)'
+            % ','.join('?' * len(namespaces)), tuple(namespaces)
+        ).fetchall())
+        return tuple(rows.get(ns, 0) for ns in namespaces)
+
+    def bump(self, namespaces):
+        with self._connection() as conn:
+            for ns in namespaces:
+                conn.execute('INSERT INTO versions VALUES (?, 1) ON CONFLICT(namespace) '
+                             'DO UPDATE SET version = version + 1', (ns,))
+
+
+def make_backend(config):
+    """Build the cache backend named by CACHE_BACKEND"""
+    name = config.get('CACHE_BACKEND', 'memory')
+    timeout = config.get('CACHE_DEFAULT_TIMEOUT', 60)
+    max_entries = config.get('CACHE_MAX_ENTRIES', 512)
+
+    if name == 'memory':
+        return LRUCache(max_entries, timeout)
+    if name == 'sqlite':
+        return SQLiteCache(config['CACHE_PATH'], max_entries, timeout)
+    if name == 'null':
+        return NullCache()
+    raise ValueError(f'Unknown CACHE_BACKEND: {name!r}')
+
+
+class ResultCache:
+    """Flask extension holding the configured cache backend"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['result_cache'] = make_backend(app.config)
+
+    @property
+    def backend(self):
+        return current_app.extensions['result_cache']
+
+    def invalidate(self, *namespaces):
+        """Bump data versions, e.g. after writes that bypass the ORM session"""
+        if has_app_context() and 'result_cache' in current_app.extensions:
+            self.backend.bump(namespaces)
+
+    def etag_for(self, key, namespaces, timeout):
+        """ETag for a cache key at the current data versions.
+
+        The TTL window is part of the tag so time-dependent results (e.g.
+        "today") are recomputed at least once per timeout.
+        """
+        backend = self.backend
+        window = int(time.time() // timeout) if timeout else 0
+        raw = repr((backend.epoch, key, backend.versions(namespaces), window))
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+
+cache = ResultCache()
+
+
+def request_cache_key():
+    """Cache key for the current request: endpoint, URL values and sorted arguments"""
+    args = sorted(request.args.items(multi=True))
+    view_args = sorted((request.view_args or {}).items())
+    return f'{request.endpoint}{view_args!r}?{args!r}'
+
+
+def cached_json(*namespaces, timeout=None):
+    """Cache a JSON view's body and answer conditional requests with 304.
+
+    Place below @login_required so authentication is still enforced.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not cache.backend.enabled:
+                # Per-process counters cannot vouch for a 304 without a cache
+                return view(*args, **kwargs)
+            ttl = timeout or current_app.config.get('CACHE_DEFAULT_TIMEOUT', 60)
+            key = request_cache_key()
+            etag = cache.etag_for(key, namespaces, ttl)
+
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                body = cache.backend.get(etag)
+                if body is None:
+                    response = current_app.make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    body = response.get_data()
+                    cache.backend.set(etag, body, ttl)
+                response = current_app.response_class(body, mimetype='application/json')
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def _changed_namespaces(session):
+    namespaces = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        namespaces.update(MODEL_NAMESPACES.get(type(obj).__name__, ()))
+    return namespaces
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_cache_invalidations(session, flush_context, instances):
+    namespaces = _changed_namespaces(session)
+    if namespaces:
+        session.info.setdefault('cache_namespaces', set()).update(namespaces)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _invalidate_after_commit(session):
+    namespaces = session.info.pop('cache_namespaces', None)
+    if namespaces:
+        cache.invalidate(*sorted(namespaces))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_cache_invalidations(session):
+    session.info.pop('cache_namespaces', None)
@@ -0,0 +1,176 @@
+"""
+Connection pool and query instrumentation.
+
+Hooks the engine with SQLAlchemy events to count checked-out connections,
+time how long requests wait for one, and time every statement. Statements
+slower than SLOW_QUERY_MS are logged with their SQL, so pool sizes and
+timeouts can be set from real traffic instead of guesses.
+
+Checkout wait is the wall time of pool.connect(): queueing for a free
+connection, opening a new one and the pre-ping, if enabled. SQLAlchemy has
+no event before a checkout, so the pool's connect is wrapped instead (and
+re-wrapped when the engine is disposed and its pool recreated).
+"""
+
+import bisect
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+
+from app import db
+
+# Upper bounds, in seconds, of the checkout wait and query time histograms
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+QUERY_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+MAX_LOGGED_STATEMENT = 1000
+
+
+class Timings:
+    """Count, sum, max and a bucketed histogram of durations"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last slot is +Inf
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total_ms': round(self.total * 1000, 3),
+            'avg_ms': round(self.total * 1000 / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max * 1000, 3),
+            'buckets': {str(bound): n for bound, n in zip(self.buckets + ('+Inf',), self.counts)},
+        }
+
+
+class DatabaseMonitor:
+    """Pool gauges, checkout wait and query timings for one engine"""
+
+    def __init__(self, app, engine):
+        self.app = app
+        self.engine = engine
+        self.slow_query_seconds = app.config.get('SLOW_QUERY_MS', 500) / 1000
+
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak_active = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.slow_queries = 0
+        self.checkout_wait = Timings(WAIT_BUCKETS)
+        self.queries = Timings(QUERY_BUCKETS)
+
+        self._wrap_pool(engine.pool)
+        event.listen(engine, 'engine_disposed', lambda e: self._wrap_pool(e.pool))
+        event.listen(engine, 'connect', self._on_connect)
+        event.listen(engine, 'checkout', self._on_checkout)
+        event.listen(engine, 'checkin', self._on_checkin)
+        event.listen(engine, 'invalidate', self._on_invalidate)
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'handle_error', self._on_error)
+
+    def _wrap_pool(self, pool):
+        connect = pool.connect
+
+        def timed_connect():
+            start = time.perf_counter()
+            try:
+                return connect()
+            except PoolTimeout:
+                with self._lock:
+                    self.timeouts += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    self.checkout_wait.observe(elapsed)
+
+        pool.connect = timed_connect
+
+    # Pool events
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        with self._lock:
+            self.active += 1
+            self.peak_active = max(self.peak_active, self.active)
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.active -= 1
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    # Statement events; a stack copes with statements run from inside others
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['query_started'].pop()
+        with self._lock:
+            self.queries.observe(elapsed)
+            slow = elapsed >= self.slow_query_seconds
+            if slow:
+                self.slow_queries += 1
+        if slow:
+            self.app.logger.warning('Slow query (%.1f ms%s): %s', elapsed * 1000,
+                                    ', executemany' if executemany else '',
+                                    ' '.join(statement.split())[:MAX_LOGGED_STATEMENT])
+
+    def _on_error(self, context):
+        started = context.connection.info.get('query_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def pool_status(self):
+        """Size and usage reported by the pool itself, where it has them"""
+        pool = self.engine.pool
+        status = {'class': type(pool).__name__}
+        for name in ('size', 'checkedout', 'overflow', 'checkedin'):
+            if hasattr(pool, name):
+                status[name] = getattr(pool, name)()
+        return status
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'pool': self.pool_status(),
+                'active': self.active,
+                'peak_active': self.peak_active,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'checkout_wait': self.checkout_wait.to_dict(),
+                'queries': self.queries.to_dict(),
+                'slow_queries': self.slow_queries,
+                'slow_query_ms': self.slow_query_seconds * 1000,
+            }
+
+
+def init_app(app):
+    """Instrument the application's engine"""
+    with app.app_context():
+        app.extensions['db_monitor'] = DatabaseMonitor(app, db.engine)
+
+
+def monitor_for(app):
+    """Return the monitor attached to an application"""
+    return app.extensions['db_monitor']
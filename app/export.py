@@ -0,0 +1,143 @@
+"""
+Streaming CSV / NDJSON exports.
+
+Rows are read with yield_per (server-side cursors where the driver has
+them) and written to the response a batch at a time, so memory stays flat
+however many rows an export covers. Filters are the same ones the listing
+pages accept.
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.inventory import apply_inventory_filters, inventory_filters
+from app.listings import (CUSTOMER_SORTS, _customer_measures, apply_sales_filters,
+                          parse_date, sales_filters)
+from app.models import Customer, DailySalesRollup, Product, Sale
+from app.rollup import day_after
+from app.timeseries import half_open
+
+EXPORT_BATCH_SIZE = 1000
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class UnknownExport(ValueError):
+    """Raised for an export dataset or format that does not exist"""
+
+
+def _sales_statement(args):
+    stmt = select(
+        Sale.id, Sale.invoice_number, Sale.sale_date, Sale.customer_id,
+        Customer.name.label('customer_name'), Sale.payment_method,
+        Sale.total_amount, Sale.discount, Sale.tax
+    ).outerjoin(Customer, Sale.customer_id == Customer.id)
+    stmt = apply_sales_filters(stmt, sales_filters(args))
+    return stmt.order_by(Sale.sale_date.desc(), Sale.id.desc())
+
+
+def _customers_statement(args):
+    sort = args.get('sort', 'name')
+    if sort not in CUSTOMER_SORTS:
+        raise ValueError(f'Unknown sort: {sort!r}')
+
+    measures = _customer_measures()
+    order_key = {m.name: m for m in measures}.get(sort, Customer.name)
+
+    return select(
+        Customer.id, Customer.name, Customer.email, Customer.phone,
+        Customer.customer_type, Customer.created_at, *measures
+    ).outerjoin(Sale, Sale.customer_id == Customer.id
+    ).group_by(Customer.id
+    ).order_by(order_key.desc() if args.get('order') == 'desc' else order_key.asc(), Customer.id)
+
+
+def _products_statement(args):
+    stmt = select(
+        Product.id, Product.name, Product.category, Product.price, Product.cost,
+        Product.stock_quantity, Product.min_stock
+    )
+    stmt = apply_inventory_filters(stmt, inventory_filters(args))
+    return stmt.order_by(Product.name, Product.id)
+
+
+def _report_statement(args):
+    stmt = select(
+        DailySalesRollup.day, DailySalesRollup.payment_method, DailySalesRollup.customer_type,
+        DailySalesRollup.sale_count, DailySalesRollup.revenue,
+        DailySalesRollup.discount, DailySalesRollup.tax
+    ).where(DailySalesRollup.sale_count != 0)
+    date_from, date_to = parse_date(args.get('date_from')), parse_date(args.get('date_to'))
+    stmt = stmt.where(*half_open(DailySalesRollup.day, date_from, day_after(date_to) if date_to else None))
+    return stmt.order_by(DailySalesRollup.day, DailySalesRollup.payment_method,
+                         DailySalesRollup.customer_type)
+
+
+DATASETS = {
+    'sales': _sales_statement,
+    'customers': _customers_statement,
+    'products': _products_statement,
+    'report': _report_statement,
+}
+
+
+def export_statement(dataset, args):
+    """Build the SELECT for an export; raises ValueError for bad input"""
+    if dataset not in DATASETS:
+        raise UnknownExport(f'Unknown export: {dataset!r}')
+    return DATASETS[dataset](args)
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_batches(stmt, batch_size=EXPORT_BATCH_SIZE):
+    """Return (column names, iterator of row batches) for a streamed result.
+
+    The column names are known even when no rows match.
+    """
+    result = db.session.execute(stmt.execution_options(yield_per=batch_size))
+    return list(result.keys()), result.partitions()
+
+
+def _csv_chunks(columns, batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The header goes out with the first batch, or alone for an empty export
+    writer.writerow(columns)
+    for rows in batches:
+        writer.writerows([_plain(v) for v in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def _ndjson_chunks(columns, batches):
+    for rows in batches:
+        yield ''.join(
+            json.dumps(dict(zip(columns, map(_plain, row))), separators=(',', ':')) + '\n'
+            for row in rows
+        )
+
+
+def stream_export(stmt, fmt, batch_size=EXPORT_BATCH_SIZE):
+    """Generate the encoded body of an export in the requested format"""
+    if fmt not in FORMATS:
+        raise UnknownExport(f'Unknown export format: {fmt!r}')
+    columns, batches = iter_batches(stmt, batch_size)
+    chunks = _csv_chunks(columns, batches) if fmt == 'csv' else _ndjson_chunks(columns, batches)
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
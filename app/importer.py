@@ -0,0 +1,459 @@
+"""
+Streaming CSV import for customers, products and sales.
+
+Files are read row by row and written in batches, one transaction per
+batch, so memory is bounded by the batch size and the lookup maps (one
+entry per existing customer / product), never by the file. Foreign keys
+are resolved against those in-memory maps instead of a query per row, and
+each batch is written with executemany inserts and updates.
+
+Upsert keys:
+    customers - email, or name when the row has no email
+    products  - name
+    sales     - invoice_number; invoices already in the database are skipped,
+                so re-importing a daily POS file is harmless
+
+Sales files have one line per sale item; consecutive lines with the same
+invoice_number make up one sale. A bad line rejects its whole invoice.
+An invoice's lines must be contiguous: a later, separate block of lines
+for an invoice already seen in the file is rejected with its line number
+(files are streamed, so the earlier block may already be written).
+"""
+
+import csv
+import io
+import itertools
+import time
+from datetime import datetime
+
+from sqlalchemy import bindparam, insert, select, update
+
+from app import db
+from app.cache import cache
+from app.models import Customer, Product, Sale, SaleItem
+from app.ledger import ledger_changes
+from app.restock import stock_transitions
+from app.rollup import WALK_IN, apply_deltas, customer_type_deltas, record_sales
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+CUSTOMER_TYPES = ('retail', 'wholesale', 'business')
+PAYMENT_METHODS = ('cash', 'card', 'mobile_money', 'bank_transfer')
+
+
+class RowError(ValueError):
+    """A row failed validation"""
+
+
+class ImportReport:
+    """Counts, rejected rows and throughput of one import"""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+        self.rows = 0
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.rejected = 0
+        self.errors = []  # (line, message), first MAX_REPORTED_ERRORS only
+        self.started = time.perf_counter()
+        self.seconds = 0.0
+
+    def reject(self, line, message):
+        self.rejected += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line, message))
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.started
+        return self
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {
+            'dataset': self.dataset,
+            'rows': self.rows,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'skipped': self.skipped,
+            'rejected': self.rejected,
+            'errors': [{'line': line, 'error': message} for line, message in self.errors],
+            'seconds': round(self.seconds, 3),
+            'rows_per_second': round(self.rows_per_second, 1),
+        }
+
+
+# Field parsers; each raises RowError with a readable message
+
+def _text(row, field, required=False, max_length=None):
+    value = (row.get(field) or '').strip()
+    if required and not value:
+        raise RowError(f'{field} is required')
+    if max_length and len(value) > max_length:
+        raise RowError(f'{field} is longer than {max_length} characters')
+    return value or None
+
+
+def _number(row, field, default=None, cast=float, minimum=0):
+    raw = (row.get(field) or '').strip().replace(',', '')
+    if not raw:
+        if default is None:
+            raise RowError(f'{field} is required')
+        return default
+    try:
+        value = cast(raw)
+    except ValueError:
+        raise RowError(f'{field} is not a number: {raw!r}') from None
+    if minimum is not None and value < minimum:
+        raise RowError(f'{field} must be at least {minimum}')
+    return value
+
+
+def _choice(row, field, choices, default):
+    value = (row.get(field) or '').strip().lower().replace(' ', '_') or default
+    if value not in choices:
+        raise RowError(f'{field} must be one of {", ".join(choices)}')
+    return value
+
+
+def _timestamp(row, field):
+    raw = (row.get(field) or '').strip()
+    if not raw:
+        raise RowError(f'{field} is required')
+    try:
+        return datetime.fromisoformat(raw)
+    except ValueError:
+        raise RowError(f'{field} is not an ISO date: {raw!r}') from None
+
+
+def _key(value):
+    return value.strip().lower() if value else None
+
+
+def _batches(rows, batch_size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _Importer:
+    """Shared driver: stream rows, validate, write batch by batch"""
+
+    dataset = None
+    namespaces = ()
+
+    def __init__(self, connection_source, batch_size):
+        self.engine = connection_source
+        self.batch_size = batch_size
+        self.report = ImportReport(self.dataset)
+
+    def run(self, reader):
+        self.load_maps()
+        for batch in self.batches(reader):
+            with self.engine.begin() as connection:
+                self.write(connection, batch)
+        return self.report
+
+    def batches(self, reader):
+        numbered = ((reader.line_num, row) for row in reader)
+        return _batches(numbered, self.batch_size)
+
+    def load_maps(self):
+        pass
+
+    def write(self, connection, batch):
+        raise NotImplementedError
+
+
+class _CustomerImporter(_Importer):
+    dataset = 'customers'
+    # Re-typing a customer moves their sales between rollup rows
+    namespaces = ('customers', 'sales')
+
+    def load_maps(self):
+        self.ids = {}
+        for customer_id, name, email in db.session.execute(
+                select(Customer.id, Customer.name, Customer.email)):
+            self.ids[self.identity(name, email)] = customer_id
+
+    @staticmethod
+    def identity(name, email):
+        return ('email', _key(email)) if email else ('name', _key(name))
+
+    def write(self, connection, batch):
+        pending = {}  # identity -> values; the last line for a key wins
+        for line, row in batch:
+            self.report.rows += 1
+            try:
+                values = {
+                    'name': _text(row, 'name', required=True, max_length=100),
+                    'email': _text(row, 'email', max_length=120),
+                    'phone': _text(row, 'phone', max_length=20),
+                    'address': _text(row, 'address', max_length=200),
+                    'customer_type': _choice(row, 'customer_type', CUSTOMER_TYPES, 'retail'),
+                }
+            except RowError as exc:
+                self.report.reject(line, str(exc))
+                continue
+            pending[self.identity(values['name'], values['email'])] = values
+
+        inserts, updates = [], []
+        for identity, values in pending.items():
+            if identity in self.ids:
+                updates.append(dict(values, b_id=self.ids[identity]))
+            else:
+                inserts.append((identity, dict(values, created_at=datetime.utcnow())))
+
+        table = Customer.__table__
+        if updates:
+            # Sales of re-typed customers move to their new rollup bucket
+            moved = customer_type_deltas(connection, {row['b_id']: row['customer_type'] for row in updates})
+            connection.execute(update(table).where(table.c.id == bindparam('b_id')), updates)
+            apply_deltas(connection, moved)
+        if inserts:
+            connection.execute(insert(table), [values for _, values in inserts])
+            # Learn the new ids so later batches update instead of duplicating
+            names = list({values['name'] for _, values in inserts})
+            for customer_id, name, email in connection.execute(
+                    select(table.c.id, table.c.name, table.c.email).where(table.c.name.in_(names))):
+                self.ids.setdefault(self.identity(name, email), customer_id)
+        self.report.inserted += len(inserts)
+        self.report.updated += len(updates)
+
+
+class _ProductImporter(_Importer):
+    dataset = 'products'
+    namespaces = ('products',)
+
+    OPTIONAL = ('description', 'category', 'stock_quantity', 'min_stock')
+
+    def load_maps(self):
+        self.ids = {_key(name): product_id for product_id, name in db.session.execute(
+            select(Product.id, Product.name))}
+
+    def write(self, connection, batch):
+        pending = {}
+        for line, row in batch:
+            self.report.rows += 1
+            try:
+                values = {
+                    'name': _text(row, 'name', required=True, max_length=100),
+                    'price': _number(row, 'price'),
+                    'cost': _number(row, 'cost'),
+                }
+                # Optional columns only overwrite existing values when present
+                if 'description' in row:
+                    values['description'] = _text(row, 'description')
+                if 'category' in row:
+                    values['category'] = _text(row, 'category', max_length=50)
+                if 'stock_quantity' in row:
+                    values['stock_quantity'] = _number(row, 'stock_quantity', 0, int)
+                if 'min_stock' in row:
+                    values['min_stock'] = _number(row, 'min_stock', 10, int)
+            except RowError as exc:
+                self.report.reject(line, str(exc))
+                continue
+            pending[_key(values['name'])] = values
+
+        now = datetime.utcnow()
+        inserts, updates = [], {}
+        for key, values in pending.items():
+            if key in self.ids:
+                # executemany needs identical keys, so group updates by column set
+                updates.setdefault(tuple(sorted(values)), []).append(
+                    dict(values, b_id=self.ids[key], updated_at=now))
+            else:
+                inserts.append(dict({'description': None, 'category': None, 'stock_quantity': 0,
+                                     'min_stock': 10}, **values, created_at=now, updated_at=now))
+
+        table = Product.__table__
+        updated_ids = [row['b_id'] for rows in updates.values() for row in rows]
+        with stock_transitions(connection, updated_ids) as product_ids, \
+                ledger_changes(connection, product_ids, 'CSV import'):
+            for rows in updates.values():
+                connection.execute(update(table).where(table.c.id == bindparam('b_id')), rows)
+            if inserts:
+                connection.execute(insert(table), inserts)
+                new_ids = {_key(name): product_id for product_id, name in connection.execute(
+                    select(table.c.id, table.c.name).where(table.c.name.in_([r['name'] for r in inserts])))}
+                product_ids.update(new_ids[_key(r['name'])] for r in inserts)
+                self.ids.update(new_ids)
+        self.report.inserted += len(inserts)
+        self.report.updated += sum(len(rows) for rows in updates.values())
+
+
+class _SaleImporter(_Importer):
+    dataset = 'sales'
+    namespaces = ('sales',)
+
+    def load_maps(self):
+        self.products = {}
+        self.product_names = {}
+        for product_id, name, price in db.session.execute(select(Product.id, Product.name, Product.price)):
+            self.products[product_id] = price
+            self.product_names[_key(name)] = product_id
+
+        self.customers = {}
+        self.customer_keys = {}
+        for customer_id, name, email, customer_type in db.session.execute(
+                select(Customer.id, Customer.name, Customer.email, Customer.customer_type)):
+            self.customers[customer_id] = customer_type or 'retail'
+            if email:
+                self.customer_keys[('email', _key(email))] = customer_id
+            self.customer_keys.setdefault(('name', _key(name)), customer_id)
+
+    def batches(self, reader):
+        # Keep each invoice's lines together; cut batches between invoices.
+        # An invoice's lines must be contiguous: a later block for an invoice
+        # already seen is tagged with the line its first block started at.
+        numbered = ((reader.line_num, row) for row in reader)
+        invoices = itertools.groupby(numbered, key=lambda item: (item[1].get('invoice_number') or '').strip())
+        first_lines = {}
+        batch, lines = [], 0
+        for invoice, group in invoices:
+            group = list(group)
+            earlier = first_lines.get(invoice) if invoice else None
+            if invoice and earlier is None:
+                first_lines[invoice] = group[0][0]
+            batch.append((invoice, group, earlier))
+            lines += len(group)
+            if lines >= self.batch_size:
+                yield batch
+                batch, lines = [], 0
+        if batch:
+            yield batch
+
+    def _customer(self, row):
+        if (row.get('customer_id') or '').strip():
+            customer_id = _number(row, 'customer_id', cast=int)
+            if customer_id not in self.customers:
+                raise RowError(f'unknown customer_id {customer_id}')
+            return customer_id
+        for field, kind in (('customer_email', 'email'), ('customer', 'name')):
+            value = _key(row.get(field))
+            if value:
+                if (kind, value) not in self.customer_keys:
+                    raise RowError(f'unknown customer {row[field].strip()!r}')
+                return self.customer_keys[(kind, value)]
+        return None
+
+    def _product(self, row):
+        if (row.get('product_id') or '').strip():
+            product_id = _number(row, 'product_id', cast=int)
+            if product_id not in self.products:
+                raise RowError(f'unknown product_id {product_id}')
+            return product_id
+        name = _key(row.get('product'))
+        if not name:
+            raise RowError('product or product_id is required')
+        if name not in self.product_names:
+            raise RowError(f'unknown product {row["product"].strip()!r}')
+        return self.product_names[name]
+
+    def _parse_invoice(self, invoice, lines):
+        if not invoice:
+            raise RowError('invoice_number is required')
+        if len(invoice) > 20:
+            raise RowError('invoice_number is longer than 20 characters')
+        first = lines[0][1]
+        sale = {
+            'invoice_number': invoice,
+            'sale_date': _timestamp(first, 'sale_date'),
+            'customer_id': self._customer(first),
+            'payment_method': _choice(first, 'payment_method', PAYMENT_METHODS, 'cash'),
+            'discount': _number(first, 'discount', 0.0),
+            'tax': _number(first, 'tax', 0.0),
+            'notes': _text(first, 'notes'),
+        }
+        items = []
+        for line, row in lines:
+            try:
+                product_id = self._product(row)
+                quantity = _number(row, 'quantity', cast=int, minimum=1)
+                unit_price = _number(row, 'unit_price', self.products[product_id])
+            except RowError as exc:
+                raise RowError(f'line {line}: {exc}') from None
+            items.append({'product_id': product_id, 'quantity': quantity,
+                          'unit_price': unit_price, 'subtotal': quantity * unit_price})
+        sale['total_amount'] = sum(item['subtotal'] for item in items) - sale['discount'] + sale['tax']
+        return sale, items
+
+    def write(self, connection, batch):
+        invoices = [invoice for invoice, _, _ in batch if invoice]
+        existing = set(connection.execute(
+            select(Sale.invoice_number).where(Sale.invoice_number.in_(invoices))).scalars()) if invoices else set()
+
+        sales, items_by_invoice = [], {}
+        for invoice, lines, earlier in batch:
+            self.report.rows += len(lines)
+            if earlier is not None:
+                self.report.reject(lines[0][0], f'invoice {invoice}: lines must be contiguous, '
+                                                f'but this invoice already started at line {earlier}')
+                continue
+            if invoice in existing:
+                self.report.skipped += 1
+                continue
+            try:
+                sale, items = self._parse_invoice(invoice, lines)
+            except RowError as exc:
+                self.report.reject(lines[0][0], f'invoice {invoice or "?"}: {exc}')
+                continue
+            sales.append(sale)
+            items_by_invoice[invoice] = items
+
+        if not sales:
+            return
+        connection.execute(insert(Sale.__table__), sales)
+        ids = dict(connection.execute(select(Sale.invoice_number, Sale.id).where(
+            Sale.invoice_number.in_(list(items_by_invoice)))).all())
+        connection.execute(insert(SaleItem.__table__), [
+            dict(item, sale_id=ids[invoice])
+            for invoice, items in items_by_invoice.items() for item in items
+        ])
+
+        # Bulk inserts bypass the session listeners that maintain the rollup
+        record_sales(connection, [dict(sale, customer_type=self.customers.get(sale['customer_id'], WALK_IN)
+                                       if sale['customer_id'] else WALK_IN) for sale in sales])
+        self.report.inserted += len(sales)
+
+
+IMPORTERS = {
+    'customers': _CustomerImporter,
+    'products': _ProductImporter,
+    'sales': _SaleImporter,
+}
+
+
+def import_csv(dataset, stream, batch_size=IMPORT_BATCH_SIZE):
+    """Import a CSV text or binary stream; returns an ImportReport.
+
+    Raises ValueError for an unknown dataset or a file without a header.
+    """
+    if dataset not in IMPORTERS:
+        raise ValueError(f'Unknown import: {dataset!r}')
+    if isinstance(stream.read(0), bytes):
+        stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+
+    reader = csv.DictReader(stream)
+    if not reader.fieldnames:
+        raise ValueError('The file has no header row')
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+
+    # Rows go through the engine; release the session's connection first
+    db.session.commit()
+    importer = IMPORTERS[dataset](db.engine, batch_size)
+    try:
+        report = importer.run(reader)
+    finally:
+        if importer.report.inserted or importer.report.updated:
+            cache.invalidate(*importer.namespaces)
+    return report.finish()
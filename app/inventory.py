@@ -0,0 +1,148 @@
+"""
+Inventory summary and the paginated product listing.
+
+The inventory KPIs come from one aggregate SELECT over product, and the
+product table is served a page at a time by /api/inventory with the
+category, stock-status and text filters applied in SQL, so neither grows
+with the size of the catalogue in Python.
+"""
+
+from collections import namedtuple
+
+from sqlalchemy import and_, case, func, select
+
+from app import db
+from app.models import Product
+from app.pagination import DEFAULT_PAGE_SIZE
+from app.restock import IS_LOW_STOCK
+
+InventorySummary = namedtuple('InventorySummary', [
+    'total_products', 'total_stock_value', 'low_stock_count', 'out_of_stock_count'])
+ProductPage = namedtuple('ProductPage', ['products', 'page', 'per_page', 'total'])
+
+# Sort keys accepted by the inventory listing
+INVENTORY_SORTS = {
+    'name': Product.name,
+    'category': Product.category,
+    'price': Product.price,
+    'cost': Product.cost,
+    'stock_quantity': Product.stock_quantity,
+    'min_stock': Product.min_stock,
+}
+
+STOCK_STATUSES = ('low', 'out', 'good')
+
+
+def _stock():
+    return func.coalesce(Product.stock_quantity, 0)
+
+
+def stock_condition(status):
+    """Predicate for a stock status: low (below minimum but some left), out (none left) or good.
+
+    The statuses are disjoint and match the table badges (stock_status).
+    """
+    if status == 'low':
+        return and_(IS_LOW_STOCK, _stock() > 0)
+    if status == 'out':
+        return _stock() == 0
+    if status == 'good':
+        return and_(~IS_LOW_STOCK, _stock() > 0)
+    raise ValueError(f'Unknown stock status: {status!r}')
+
+
+def _count_where(condition):
+    return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+
+def inventory_summary():
+    """Product count, stock value at cost, low-stock and out-of-stock counts in one query"""
+    row = db.session.execute(select(
+        func.count(Product.id),
+        func.coalesce(func.sum(_stock() * func.coalesce(Product.cost, 0)), 0),
+        _count_where(stock_condition('low')),
+        _count_where(stock_condition('out')),
+    )).one()
+    return InventorySummary(int(row[0]), float(row[1]), int(row[2]), int(row[3]))
+
+
+def product_categories():
+    """Distinct product categories, for the filter list"""
+    rows = db.session.execute(
+        select(Product.category).where(Product.category.isnot(None)).distinct().order_by(Product.category)
+    )
+    return [category for category, in rows]
+
+
+def inventory_filters(args):
+    """Read the inventory listing filters from request arguments.
+
+    Raises ValueError for an unknown stock status.
+    """
+    stock = args.get('stock') or None
+    if stock is not None and stock not in STOCK_STATUSES:
+        raise ValueError(f'Unknown stock status: {stock!r}')
+    return {
+        'category': args.get('category') or None,
+        'stock': stock,
+        'q': (args.get('q') or '').strip() or None,
+    }
+
+
+def apply_inventory_filters(query, filters):
+    """Restrict a Product query by category, stock status and name/description text"""
+    filters = filters or {}
+    if filters.get('category'):
+        query = query.filter(Product.category == filters['category'])
+    if filters.get('stock'):
+        query = query.filter(stock_condition(filters['stock']))
+    if filters.get('q'):
+        pattern = '%' + filters['q'].replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        query = query.filter(Product.name.ilike(pattern, escape='\\') |
+                             Product.description.ilike(pattern, escape='\\'))
+    return query
+
+
+def list_products(filters=None, sort='name', descending=False, page=1, per_page=DEFAULT_PAGE_SIZE):
+    """Return one page of products matching the filters.
+
+    Costs two queries: the filtered count and the page itself, ordered with
+    the id as a tie-breaker so pages never overlap.
+    """
+    if sort not in INVENTORY_SORTS:
+        raise ValueError(f'Unknown sort: {sort!r}')
+
+    page = max(1, page)
+    query = apply_inventory_filters(Product.query, filters)
+    total = query.order_by(None).count()
+
+    column = INVENTORY_SORTS[sort]
+    products = query.order_by(column.desc() if descending else column.asc(), Product.id
+                              ).offset((page - 1) * per_page).limit(per_page).all()
+    return ProductPage(products, page, per_page, total)
+
+
+def stock_status(product):
+    """The status badge shown for a product"""
+    stock = product.stock_quantity or 0
+    if stock == 0:
+        return 'out'
+    if stock < (product.min_stock or 0):
+        return 'low'
+    return 'good'
+
+
+def product_to_dict(product):
+    """Serialise a listed product for the JSON API"""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'description': product.description,
+        'category': product.category,
+        'price': product.price,
+        'cost': product.cost,
+        'stock_quantity': product.stock_quantity,
+        'min_stock': product.min_stock,
+        'profit_margin': round(product.profit_margin(), 2),
+        'stock_status': stock_status(product),
+    }
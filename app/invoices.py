@@ -0,0 +1,229 @@
+"""
+Sale detail and printable invoices.
+
+A sale is loaded with its customer, items and their products through
+selectinload, so a detail view costs the same four queries (sale, items,
+customer, products) however many items the sale has.
+
+Posted sales do not change, so the detail and each format's invoice
+digest are cached by sale id rather than under the sales/customers/products
+namespaces, which every till sale bumps. A detail keeps the customer and
+product names it had when first loaded, as a printed invoice would. The
+rare ORM correction of a sale or its items drops that sale's entries
+(forget_sale) once it commits.
+
+Rendered invoices (HTML for the browser's print dialog, or PDF) are
+content addressed: the cache key is a hash of the sale detail, the format
+and the layout version, so a reprint finds its render in the result cache
+and is served without a query or a render. The hash doubles as the ETag,
+so a browser that already holds the invoice gets a 304.
+"""
+
+import hashlib
+import json
+
+from flask import current_app, render_template
+from sqlalchemy import event, select
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.cache import cache
+from app.models import Sale, SaleItem
+
+# Bump when the invoice template or PDF layout changes
+INVOICE_LAYOUT_VERSION = 1
+
+INVOICE_FORMATS = {
+    'html': 'text/html; charset=utf-8',
+    'pdf': 'application/pdf',
+}
+
+
+def load_sale(sale_id):
+    """Load a sale with its customer, items and products, or None"""
+    return db.session.execute(
+        select(Sale).where(Sale.id == sale_id).options(
+            selectinload(Sale.customer),
+            selectinload(Sale.items).selectinload(SaleItem.product),
+        )
+    ).scalar_one_or_none()
+
+
+def sale_detail(sale):
+    """Serialise a loaded sale and its items for the detail API and invoices"""
+    items = [{
+        'product_id': item.product_id,
+        'product_name': item.product.name,
+        'quantity': item.quantity,
+        'unit_price': item.unit_price,
+        'subtotal': item.subtotal,
+    } for item in sorted(sale.items, key=lambda item: item.id)]
+    return {
+        'id': sale.id,
+        'invoice_number': sale.invoice_number,
+        'sale_date': sale.sale_date.isoformat(),
+        'customer_id': sale.customer_id,
+        'customer_name': sale.customer.name if sale.customer else None,
+        'payment_method': sale.payment_method,
+        'subtotal': sum(item['subtotal'] for item in items),
+        'discount': sale.discount or 0.0,
+        'tax': sale.tax or 0.0,
+        'total_amount': sale.total_amount,
+        'notes': sale.notes,
+        'items': items,
+    }
+
+
+def _timeout():
+    return current_app.config.get('INVOICE_CACHE_TIMEOUT', 604800)
+
+
+def cached_sale_detail(sale_id):
+    """Sale detail by id, loaded once and then served from the result cache; None if no such sale"""
+    key = f'sale-detail:{sale_id}'
+    detail = cache.backend.get(key)
+    if detail is None:
+        sale = load_sale(sale_id)
+        if sale is None:
+            return None
+        detail = sale_detail(sale)
+        cache.backend.set(key, detail, _timeout())
+    return detail
+
+
+def sale_invoice_digest(sale_id, fmt):
+    """Content address of a sale's invoice in `fmt`, cached by sale id; None if no such sale"""
+    key = f'invoice-digest:{sale_id}:{fmt}'
+    digest = cache.backend.get(key)
+    if digest is None:
+        detail = cached_sale_detail(sale_id)
+        if detail is None:
+            return None
+        digest = invoice_digest(detail, fmt)
+        cache.backend.set(key, digest, _timeout())
+    return digest
+
+
+def forget_sale(sale_id):
+    """Drop the cached detail and invoice digests of a corrected sale"""
+    backend = cache.backend
+    backend.delete(f'sale-detail:{sale_id}')
+    for fmt in INVOICE_FORMATS:
+        backend.delete(f'invoice-digest:{sale_id}:{fmt}')
+
+
+def invoice_digest(detail, fmt):
+    """Content address of a rendered invoice"""
+    raw = json.dumps([INVOICE_LAYOUT_VERSION, fmt, current_app.config.get('CURRENCY', ''), detail],
+                     sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def rendered_invoice(detail, fmt, digest=None):
+    """Return the invoice for a sale detail in `fmt`, rendering it only on a cache miss"""
+    if fmt not in INVOICE_FORMATS:
+        raise ValueError(f'Unknown invoice format: {fmt!r}')
+    key = f'invoice:{digest or invoice_digest(detail, fmt)}'
+    body = cache.backend.get(key)
+    if body is None:
+        body = render_pdf(detail) if fmt == 'pdf' else render_html(detail)
+        cache.backend.set(key, body, _timeout())
+    return body
+
+
+def render_html(detail):
+    """Printable HTML invoice"""
+    return render_template('invoice.html', sale=detail,
+                           currency=current_app.config.get('CURRENCY', '')).encode('utf-8')
+
+
+def invoice_lines(detail):
+    """Invoice as fixed-width text lines, for the PDF"""
+    currency = current_app.config.get('CURRENCY', '')
+    rule = '-' * 72
+    lines = [
+        f'INVOICE {detail["invoice_number"]}',
+        '',
+        f'Date:     {detail["sale_date"].replace("T", " ")[:16]}',
+        f'Customer: {detail["customer_name"] or "Walk-in"}',
+        f'Payment:  {detail["payment_method"] or "cash"}',
+        '',
+        f'{"Product":<36}{"Qty":>6}{"Unit price":>14}{"Subtotal":>16}',
+        rule,
+    ]
+    for item in detail['items']:
+        lines.append(f'{item["product_name"][:35]:<36}{item["quantity"]:>6}'
+                     f'{item["unit_price"]:>14,.2f}{item["subtotal"]:>16,.2f}')
+    lines.append(rule)
+    for label, value in (('Subtotal', detail['subtotal']), ('Discount', -detail['discount']),
+                         ('Tax', detail['tax'])):
+        lines.append(f'{label:>56}{value:>16,.2f}')
+    lines.append(f'{"Total " + currency:>56}{detail["total_amount"]:>16,.2f}')
+    if detail['notes']:
+        lines += ['', f'Notes: {detail["notes"]}']
+    return lines
+
+
+def _pdf_text(line):
+    text = line.encode('latin-1', 'replace')
+    return text.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+
+def render_pdf(detail, lines_per_page=60):
+    """Plain A4 PDF invoice in Courier, built without third-party libraries"""
+    lines = invoice_lines(detail)
+    pages = [lines[i:i + lines_per_page] for i in range(0, len(lines), lines_per_page)]
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % (4 + 2 * n) for n in range(len(pages))), len(pages)),
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Courier /Encoding /WinAnsiEncoding >>',
+    ]
+    for n, page in enumerate(pages):
+        stream = b'BT /F1 10 Tf 12 TL 50 790 Td\n' + b''.join(
+            b'(%s) Tj T*\n' % _pdf_text(line) for line in page) + b'ET'
+        objects.append(b'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] '
+                       b'/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>' % (5 + 2 * n))
+        objects.append(b'<< /Length %d >>\nstream\n%s\nendstream' % (len(stream), stream))
+
+    out = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+    xref = len(out)
+    out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _corrected_sales(session):
+    sale_ids = set()
+    for obj in list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Sale) and obj.id is not None:
+            sale_ids.add(obj.id)
+        elif isinstance(obj, SaleItem) and obj.sale_id is not None:
+            sale_ids.add(obj.sale_id)
+    for obj in session.new:
+        if isinstance(obj, SaleItem) and obj.sale_id is not None:
+            sale_ids.add(obj.sale_id)
+    return sale_ids
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_corrected_sales(session, flush_context, instances):
+    sale_ids = _corrected_sales(session)
+    if sale_ids:
+        session.info.setdefault('corrected_sales', set()).update(sale_ids)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _forget_after_commit(session):
+    for sale_id in sorted(session.info.pop('corrected_sales', ())):
+        forget_sale(sale_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_corrected_sales(session):
+    session.info.pop('corrected_sales', None)
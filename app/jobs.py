@@ -0,0 +1,261 @@
+"""
+Background report jobs for the Reports page.
+
+Report requests run on a small bounded thread pool so a slow report never
+holds a request worker. Finished results are stored in the result cache
+under (report type, period, params) together with the current data
+versions, so an identical request is answered straight from the cache and
+any write to the underlying data retires stale results automatically.
+
+Job state is also published to the result cache, so with the shared
+sqlite cache backend any worker process can answer a status poll for a
+job another worker accepted (the job still runs where it was submitted).
+The memory backend is per process: with it, run a single worker.
+
+With REPORT_WORKERS = 0 jobs run inline in the submitting request (used by
+the tests, whose in-memory database is a single connection).
+"""
+
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from app import db
+from app.listings import parse_date
+
+REPORT_NAMESPACES = ('sales', 'products', 'customers')
+
+PENDING, RUNNING, FINISHED, FAILED = 'pending', 'running', 'finished', 'failed'
+
+# Fields of a Job shared with other processes; the result stays under Job.key
+JOB_FIELDS = ('id', 'type', 'params', 'key', 'status', 'error', 'cached', 'submitted', 'finished')
+
+
+class QueueFull(Exception):
+    """Raised when too many report jobs are already waiting"""
+
+
+def _sales_report(params):
+    from app.utils import generate_sales_report
+    return generate_sales_report(params['date_from'], params['date_to'])
+
+
+def _customer_report(params):
+    from app.utils import get_customer_analytics
+    return [{
+        'name': row.name,
+        'purchase_count': int(row.purchase_count),
+        'total_spent': float(row.total_spent or 0),
+        'last_purchase': row.last_purchase.isoformat() if row.last_purchase else None,
+    } for row in get_customer_analytics()]
+
+
+# report type -> (builder, whether it takes a period)
+REPORT_TYPES = {
+    'sales': (_sales_report, True),
+    'customers': (_customer_report, False),
+}
+
+
+def report_params(report_type, args):
+    """Validate a report request; raises ValueError for bad input"""
+    if report_type not in REPORT_TYPES:
+        raise ValueError(f'Unknown report type: {report_type!r}')
+    if not REPORT_TYPES[report_type][1]:
+        return {}
+    date_from, date_to = parse_date(args.get('date_from')), parse_date(args.get('date_to'))
+    if not date_from or not date_to or date_from > date_to:
+        raise ValueError('A report period needs date_from <= date_to')
+    return {'date_from': date_from, 'date_to': date_to}
+
+
+class Job:
+    """State of one submitted report"""
+
+    def __init__(self, report_type, params, key):
+        self.id = uuid.uuid4().hex
+        self.type = report_type
+        self.params = params
+        self.key = key
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.cached = False
+        self.submitted = time.time()
+        self.finished = None
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a job published by another process (without its result)"""
+        job = cls.__new__(cls)
+        for name in JOB_FIELDS:
+            setattr(job, name, state[name])
+        job.result = None
+        return job
+
+    def state(self):
+        return {name: getattr(self, name) for name in JOB_FIELDS}
+
+    @property
+    def done(self):
+        return self.status in (FINISHED, FAILED)
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'type': self.type,
+            'params': {name: str(value) for name, value in self.params.items()},
+            'status': self.status,
+            'cached': self.cached,
+        }
+        if self.status == FINISHED:
+            data['result'] = self.result
+            data['duration'] = round(self.finished - self.submitted, 3)
+        elif self.status == FAILED:
+            data['error'] = self.error
+        return data
+
+
+class ReportJobs:
+    """Bounded report executor with a registry of recent jobs"""
+
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config.get('REPORT_WORKERS', 2)
+        self.max_pending = app.config.get('REPORT_MAX_PENDING', 16)
+        self.max_jobs = app.config.get('REPORT_MAX_JOBS', 256)
+        self.cache_timeout = app.config.get('REPORT_CACHE_TIMEOUT', 3600)
+
+        self._jobs = OrderedDict()
+        self._running = {}  # cache key -> job still in flight
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        if self.workers:
+            self._executor = ThreadPoolExecutor(self.workers, thread_name_prefix='report')
+
+    def cache_key(self, report_type, params):
+        """Result cache key for a report at the current data versions"""
+        from app.cache import cache
+        versions = cache.backend.versions(REPORT_NAMESPACES)
+        raw = repr((report_type, sorted((k, str(v)) for k, v in params.items()), versions))
+        return 'report:' + hashlib.sha1(raw.encode()).hexdigest()
+
+    def get(self, job_id):
+        """Look a job up here, or in the state other workers published"""
+        from app.cache import cache
+
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None:
+            return job
+
+        state = cache.backend.get(f'report-job:{job_id}')
+        if state is None:
+            return None
+        job = Job.from_state(state)
+        if job.status == FINISHED:
+            job.result = cache.backend.get(job.key)
+            if job.result is None:
+                job.status, job.error = FAILED, 'Report result expired; submit it again'
+        return job
+
+    def _publish(self, job):
+        # Called from pool threads too, which have no app context
+        self.app.extensions['result_cache'].set(f'report-job:{job.id}', job.state(), self.cache_timeout)
+
+    def _remember(self, job):
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.max_jobs:
+            oldest = next(iter(self._jobs.values()))
+            if not oldest.done:
+                break
+            self._jobs.popitem(last=False)
+
+    def submit(self, report_type, params):
+        """Queue a report, reusing a cached result or an identical job in flight.
+
+        Raises QueueFull when REPORT_MAX_PENDING jobs are already waiting.
+        """
+        from app.cache import cache
+
+        key = self.cache_key(report_type, params)
+        result = cache.backend.get(key)
+
+        with self._lock:
+            if result is None and key in self._running:
+                return self._running[key]
+
+            job = Job(report_type, params, key)
+            if result is not None:
+                job.status, job.result, job.cached = FINISHED, result, True
+                job.finished = time.time()
+                self._remember(job)
+                self._publish(job)
+                return job
+
+            if self._executor is not None:
+                if self._pending >= self.max_pending:
+                    raise QueueFull(f'{self._pending} report jobs already queued')
+                self._pending += 1
+            self._running[key] = job
+            self._remember(job)
+        self._publish(job)
+
+        if self._executor is None:
+            self._run(job, inline=True)
+        else:
+            self._executor.submit(self._run, job)
+        return job
+
+    def _build(self, job):
+        from app.cache import cache
+
+        result = REPORT_TYPES[job.type][0](job.params)
+        cache.backend.set(job.key, result, self.cache_timeout)
+        return result
+
+    def _run(self, job, inline=False):
+        with self._lock:
+            if not inline:
+                self._pending -= 1
+            job.status = RUNNING
+        self._publish(job)
+
+        try:
+            if inline:
+                result = self._build(job)
+            else:
+                with self.app.app_context():
+                    try:
+                        result = self._build(job)
+                    finally:
+                        db.session.remove()
+        except Exception as exc:
+            self.app.logger.exception('Report job %s failed', job.id)
+            job.error, status = str(exc), FAILED
+        else:
+            job.result, status = result, FINISHED
+
+        with self._lock:
+            job.finished = time.time()
+            job.status = status
+            self._running.pop(job.key, None)
+        self._publish(job)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+def init_app(app):
+    """Attach a report job executor to the application"""
+    app.extensions['report_jobs'] = ReportJobs(app)
+
+
+def jobs_for(app):
+    """Return the report job executor attached to an application"""
+    return app.extensions['report_jobs']
@@ -0,0 +1,314 @@
+"""
+Stock ledger and point-in-time stock on hand.
+
+Every change to product.stock_quantity is recorded as a stock_adjustment
+row holding the signed change:
+    record_movements()  the ledger API; a batch is one transaction with one
+                        executemany UPDATE and one executemany INSERT
+    ledger_changes()    for bulk writers that set stock directly (imports)
+    session listeners   ORM edits and new products with opening stock
+
+take_snapshot() copies every product's stock into stock_snapshot with one
+INSERT ... SELECT. Snapshots are taken by `flask snapshot-stock` and,
+when STOCK_SNAPSHOT_INTERVAL_HOURS has passed since the last one, after a
+ledger batch or a batch of till sales. Stock as of an instant X is then
+the nearest snapshot at or before X plus the adjustments between the
+two, so the delta scan is bounded by the snapshot interval instead of
+replaying the whole ledger. Before the first snapshot, stock is replayed
+backwards from the next snapshot or current stock (database/setup.sql
+takes a baseline snapshot when upgrading).
+"""
+
+from collections import defaultdict, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+from flask import current_app, has_app_context, has_request_context
+from flask_login import current_user
+from sqlalchemy import and_, bindparam, event, func, insert, literal, or_, select, update
+
+from app import db
+from app.cache import cache
+from app.models import Product, StockAdjustment, StockSnapshot
+from app.pagination import DEFAULT_PAGE_SIZE, after_key, decode_cursor, encode_cursor
+from app.restock import stock_transitions
+from app.timeseries import half_open
+
+MOVEMENT_TYPES = ('in', 'out', 'correction')
+MAX_BATCH = 1000
+
+AdjustmentPage = namedtuple('AdjustmentPage', ['adjustments', 'next_cursor'])
+
+
+class InsufficientStock(ValueError):
+    """Raised when a movement would take stock on hand below zero"""
+
+    def __init__(self, product_ids):
+        self.product_ids = sorted(product_ids)
+        super().__init__(f'Not enough stock for products {self.product_ids}')
+
+
+def parse_movement(data):
+    """Validate one movement; returns (product_id, adjustment_type, signed quantity, reason).
+
+    'in' and 'out' take a positive quantity, 'correction' a signed one.
+    Raises ValueError for bad input.
+    """
+    if not isinstance(data, dict):
+        raise ValueError('movement must be an object')
+    adjustment_type = data.get('type')
+    if adjustment_type not in MOVEMENT_TYPES:
+        raise ValueError(f'type must be one of {", ".join(MOVEMENT_TYPES)}')
+    product_id, quantity = data.get('product_id'), data.get('quantity')
+    if not isinstance(product_id, int) or isinstance(product_id, bool):
+        raise ValueError('product_id must be an integer')
+    if not isinstance(quantity, int) or isinstance(quantity, bool):
+        raise ValueError('quantity must be an integer')
+    if adjustment_type == 'correction':
+        if quantity == 0:
+            raise ValueError('a correction must change the stock')
+    elif quantity <= 0:
+        raise ValueError('quantity must be positive')
+    reason = data.get('reason')
+    if reason is not None and (not isinstance(reason, str) or len(reason) > 200):
+        raise ValueError('reason must be text of at most 200 characters')
+    return product_id, adjustment_type, -quantity if adjustment_type == 'out' else quantity, reason
+
+
+def record_movements(movements, user_id=None, at=None):
+    """Apply and record a batch of stock movements atomically.
+
+    Raises ValueError (with the position of the bad movement) for invalid
+    input or unknown products, and InsufficientStock when the batch would
+    leave any product below zero; nothing is written in either case.
+    Returns the number of movements recorded.
+    """
+    if not movements:
+        return 0
+    if len(movements) > MAX_BATCH:
+        raise ValueError(f'at most {MAX_BATCH} movements per batch')
+    parsed = []
+    for index, data in enumerate(movements):
+        try:
+            parsed.append(parse_movement(data))
+        except ValueError as exc:
+            raise ValueError(f'movement {index}: {exc}') from None
+
+    at = at or datetime.utcnow()
+    deltas = defaultdict(int)
+    for product_id, _, quantity, _ in parsed:
+        deltas[product_id] += quantity
+
+    table = Product.__table__
+    try:
+        connection = db.session.connection()
+        known = set(connection.execute(select(table.c.id).where(table.c.id.in_(list(deltas)))).scalars())
+        unknown = sorted(set(deltas) - known)
+        if unknown:
+            raise ValueError(f'unknown products {unknown}')
+
+        changes = [{'b_id': product_id, 'b_delta': delta} for product_id, delta in deltas.items() if delta]
+        with stock_transitions(connection, deltas):
+            if changes:
+                connection.execute(
+                    update(table).where(table.c.id == bindparam('b_id')).values(
+                        stock_quantity=func.coalesce(table.c.stock_quantity, 0) + bindparam('b_delta'),
+                        updated_at=at),
+                    changes)
+            short = connection.execute(
+                select(table.c.id).where(table.c.id.in_(list(deltas)), table.c.stock_quantity < 0)).scalars().all()
+            if short:
+                raise InsufficientStock(short)
+        connection.execute(insert(StockAdjustment.__table__), [
+            {'product_id': product_id, 'adjustment_type': adjustment_type, 'quantity': quantity,
+             'reason': reason, 'adjusted_by': user_id, 'adjustment_date': at}
+            for product_id, adjustment_type, quantity, reason in parsed
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    cache.invalidate('products')
+    maybe_snapshot()
+    return len(parsed)
+
+
+def _stock_levels(connection, product_ids):
+    if not product_ids:
+        return {}
+    table = Product.__table__
+    return {product_id: stock or 0 for product_id, stock in connection.execute(
+        select(table.c.id, table.c.stock_quantity).where(table.c.id.in_(list(product_ids))))}
+
+
+def _record_differences(connection, before, after, reason, user_id=None, at=None):
+    """Insert a ledger row for each product whose stock differs between two readings.
+
+    Products missing from `before` are new, and their stock is recorded as opening stock.
+    """
+    at = at or datetime.utcnow()
+    rows = [
+        {'product_id': product_id, 'adjustment_type': 'correction' if product_id in before else 'in',
+         'quantity': stock - before.get(product_id, 0),
+         'reason': reason if product_id in before else 'Opening stock',
+         'adjusted_by': user_id, 'adjustment_date': at}
+        for product_id, stock in after.items() if stock != before.get(product_id, 0)
+    ]
+    if rows:
+        connection.execute(insert(StockAdjustment.__table__), rows)
+    return len(rows)
+
+
+@contextmanager
+def ledger_changes(connection, product_ids, reason, user_id=None):
+    """Record the stock changes a bulk writer makes inside the block.
+
+    Products inserted inside the block are added to the yielded set by the
+    caller and recorded as opening stock.
+    """
+    product_ids = product_ids if isinstance(product_ids, set) else set(product_ids)
+    before = _stock_levels(connection, product_ids)
+    yield product_ids
+    _record_differences(connection, before, _stock_levels(connection, product_ids), reason, user_id)
+
+
+def take_snapshot(at=None):
+    """Copy every product's stock on hand into stock_snapshot; returns the snapshot time"""
+    at = at or datetime.utcnow()
+    db.session.execute(insert(StockSnapshot.__table__).from_select(
+        ['taken_at', 'product_id', 'stock_quantity'],
+        select(literal(at, StockSnapshot.taken_at.type), Product.id, func.coalesce(Product.stock_quantity, 0))
+    ))
+    db.session.commit()
+    return at
+
+
+def nearest_snapshot(when):
+    """Time of the latest snapshot taken at or before `when`, or None"""
+    return db.session.execute(
+        select(func.max(StockSnapshot.taken_at)).where(StockSnapshot.taken_at <= when)
+    ).scalar()
+
+
+def next_snapshot(when):
+    """Time of the earliest snapshot taken after `when`, or None"""
+    return db.session.execute(
+        select(func.min(StockSnapshot.taken_at)).where(StockSnapshot.taken_at > when)
+    ).scalar()
+
+
+def maybe_snapshot(now=None):
+    """Take a snapshot if the configured interval has passed since the last one"""
+    hours = current_app.config.get('STOCK_SNAPSHOT_INTERVAL_HOURS', 24) if has_app_context() else 0
+    if not hours:
+        return None
+    now = now or datetime.utcnow()
+    latest = nearest_snapshot(now)
+    if latest is not None and now - latest < timedelta(hours=hours):
+        return None
+    return take_snapshot(now)
+
+
+def stock_as_of(when, product_ids=None):
+    """Stock on hand of each product at `when`.
+
+    Starts from the nearest snapshot at or before `when` and adds the
+    movements since. With no such snapshot (e.g. a database upgraded
+    without a baseline snapshot, whose stock predates the ledger) it starts
+    from the next snapshot after `when`, or from current stock, and takes
+    back the movements between `when` and that point instead of assuming
+    zero opening stock.
+
+    Products created after `when` are left out. Returns {product_id: quantity}.
+    """
+    taken_at = nearest_snapshot(when)
+    if taken_at is not None:
+        start, end, sign = taken_at, when, 1
+    else:
+        taken_at = next_snapshot(when)
+        start, end, sign = when, taken_at, -1
+
+    delta_query = select(
+        StockAdjustment.product_id, (sign * func.sum(StockAdjustment.quantity)).label('delta')
+    ).where(*half_open(StockAdjustment.adjustment_date, start, end)).group_by(StockAdjustment.product_id)
+    if product_ids is not None:
+        delta_query = delta_query.where(StockAdjustment.product_id.in_(list(product_ids)))
+    deltas = delta_query.subquery()
+
+    if taken_at is not None:
+        base = StockSnapshot.stock_quantity
+        stmt = select(Product.id, func.coalesce(base, 0) + func.coalesce(deltas.c.delta, 0)).outerjoin(
+            StockSnapshot, and_(StockSnapshot.product_id == Product.id, StockSnapshot.taken_at == taken_at))
+    else:
+        stmt = select(Product.id, func.coalesce(Product.stock_quantity, 0) + func.coalesce(deltas.c.delta, 0))
+    stmt = stmt.outerjoin(deltas, deltas.c.product_id == Product.id).where(
+        or_(Product.created_at.is_(None), Product.created_at < when))
+    if product_ids is not None:
+        stmt = stmt.where(Product.id.in_(list(product_ids)))
+
+    return {product_id: int(quantity) for product_id, quantity in db.session.execute(stmt)}
+
+
+def list_adjustments(product_id=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """One page of ledger entries, newest first, keyed on (adjustment_date, id)"""
+    query = StockAdjustment.query
+    if product_id is not None:
+        query = query.filter(StockAdjustment.product_id == product_id)
+    if cursor:
+        query = query.filter(after_key([StockAdjustment.adjustment_date, StockAdjustment.id],
+                                       decode_cursor(cursor, 2)))
+    rows = query.order_by(StockAdjustment.adjustment_date.desc(), StockAdjustment.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor((rows[-1].adjustment_date, rows[-1].id))
+    return AdjustmentPage(rows, next_cursor)
+
+
+def adjustment_to_dict(adjustment):
+    """Serialise a ledger entry for the JSON API"""
+    return {
+        'id': adjustment.id,
+        'product_id': adjustment.product_id,
+        'type': adjustment.adjustment_type,
+        'quantity': adjustment.quantity,
+        'reason': adjustment.reason,
+        'adjusted_by': adjustment.adjusted_by,
+        'adjustment_date': adjustment.adjustment_date.isoformat(),
+    }
+
+
+def _acting_user_id():
+    if has_request_context() and current_user and current_user.is_authenticated:
+        return current_user.id
+    return None
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_ledger_changes(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, Product)]
+    changed = [obj.id for obj in session.dirty if isinstance(obj, Product) and obj.id is not None
+               and db.inspect(obj).attrs.stock_quantity.history.has_changes()]
+    if not new and not changed:
+        return
+    # The database still holds the pre-flush stock of changed products
+    with session.no_autoflush:
+        before = _stock_levels(session.connection(), changed)
+        user_id = _acting_user_id()
+    session.info.setdefault('ledger_pending', []).append((before, changed, new, user_id))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _record_ledger_changes(session, flush_context):
+    for before, changed, new, user_id in session.info.pop('ledger_pending', []):
+        product_ids = set(changed) | {obj.id for obj in new if obj.id is not None}
+        connection = session.connection()
+        _record_differences(connection, before, _stock_levels(connection, product_ids),
+                            'Stock edited', user_id)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_ledger_changes(session):
+    session.info.pop('ledger_pending', None)
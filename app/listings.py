@@ -0,0 +1,186 @@
+"""
+Listing queries behind the paginated pages and their JSON APIs.
+
+Each listing returns one page plus the cursor for the next one, and loads
+related data in a fixed number of queries regardless of page contents.
+"""
+
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import func
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Customer, Sale, SaleItem
+from app.pagination import DEFAULT_PAGE_SIZE, after_key, decode_cursor, encode_cursor
+
+SalesPage = namedtuple('SalesPage', ['sales', 'item_counts', 'next_cursor'])
+CustomerStats = namedtuple('CustomerStats', ['total_spent', 'order_count', 'last_purchase'])
+CustomerPage = namedtuple('CustomerPage', ['customers', 'stats', 'page', 'per_page', 'total'])
+
+NO_PURCHASES = CustomerStats(0.0, 0, None)
+
+# Sort keys accepted by the customers page
+CUSTOMER_SORTS = ('name', 'total_spent', 'order_count', 'last_purchase')
+
+
+def parse_date(value):
+    """Parse a YYYY-MM-DD query parameter, returning None when empty"""
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(value)
+
+
+def parse_int(value):
+    """Parse an integer query parameter, returning None when empty"""
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def sales_filters(args):
+    """Read the sales listing filters from request arguments.
+
+    Raises ValueError for malformed dates or ids.
+    """
+    return {
+        'date_from': parse_date(args.get('date_from')),
+        'date_to': parse_date(args.get('date_to')),
+        'customer_id': parse_int(args.get('customer_id')),
+        'payment_method': args.get('payment_method') or None,
+    }
+
+
+def apply_sales_filters(query, filters):
+    """Restrict a Sale query with sargable predicates.
+
+    The date filter is inclusive of date_to and expressed as the half-open
+    range [date_from 00:00, date_to + 1 day 00:00) on sale_date.
+    """
+    filters = filters or {}
+    if filters.get('date_from'):
+        query = query.filter(Sale.sale_date >= datetime.combine(filters['date_from'], time.min))
+    if filters.get('date_to'):
+        end = filters['date_to'] + timedelta(days=1)
+        query = query.filter(Sale.sale_date < datetime.combine(end, time.min))
+    if filters.get('customer_id') is not None:
+        query = query.filter(Sale.customer_id == filters['customer_id'])
+    if filters.get('payment_method'):
+        query = query.filter(Sale.payment_method == filters['payment_method'])
+    return query
+
+
+def sale_item_counts(sale_ids):
+    """Count items for a set of sales with one grouped query"""
+    if not sale_ids:
+        return {}
+    rows = db.session.query(
+        SaleItem.sale_id,
+        func.count(SaleItem.id)
+    ).filter(SaleItem.sale_id.in_(sale_ids)
+    ).group_by(SaleItem.sale_id).all()
+    return {sale_id: count for sale_id, count in rows}
+
+
+def list_sales(filters=None, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    """Return one page of sales, newest first, keyed on (sale_date, id).
+
+    Costs two queries: the page with customers joined in, and the item
+    counts for the sales on it. Raises InvalidCursor for a bad cursor.
+    """
+    query = apply_sales_filters(Sale.query.options(joinedload(Sale.customer)), filters)
+
+    if cursor:
+        query = query.filter(after_key([Sale.sale_date, Sale.id], decode_cursor(cursor, 2)))
+
+    rows = query.order_by(Sale.sale_date.desc(), Sale.id.desc()).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor((rows[-1].sale_date, rows[-1].id))
+
+    return SalesPage(rows, sale_item_counts([sale.id for sale in rows]), next_cursor)
+
+
+def sale_to_dict(sale, item_count):
+    """Serialise a listed sale for the JSON API"""
+    return {
+        'id': sale.id,
+        'invoice_number': sale.invoice_number,
+        'sale_date': sale.sale_date.isoformat(),
+        'customer_id': sale.customer_id,
+        'customer_name': sale.customer.name if sale.customer else None,
+        'total_amount': sale.total_amount,
+        'discount': sale.discount,
+        'tax': sale.tax,
+        'payment_method': sale.payment_method,
+        'item_count': item_count,
+    }
+
+
+def _customer_measures():
+    """Aggregate expressions over a customer's sales (outer-joined)"""
+    return (
+        func.coalesce(func.sum(Sale.total_amount), 0).label('total_spent'),
+        func.count(Sale.id).label('order_count'),
+        func.max(Sale.sale_date).label('last_purchase'),
+    )
+
+
+def _as_stats(total_spent, order_count, last_purchase):
+    if isinstance(last_purchase, str):
+        last_purchase = datetime.fromisoformat(last_purchase)
+    return CustomerStats(float(total_spent or 0), int(order_count or 0), last_purchase)
+
+
+def customer_stats(customer_ids):
+    """Total spent, order count and last purchase for customers in one grouped query"""
+    if not customer_ids:
+        return {}
+    rows = db.session.query(
+        Sale.customer_id, *_customer_measures()
+    ).filter(Sale.customer_id.in_(customer_ids)
+    ).group_by(Sale.customer_id).all()
+
+    stats = {customer_id: NO_PURCHASES for customer_id in customer_ids}
+    for customer_id, total_spent, order_count, last_purchase in rows:
+        stats[customer_id] = _as_stats(total_spent, order_count, last_purchase)
+    return stats
+
+
+def list_customers(sort='name', descending=False, page=1, per_page=DEFAULT_PAGE_SIZE):
+    """Return one page of customers with their purchase aggregates.
+
+    Sorting by name pages the customer table and then loads aggregates for
+    that page; sorting by a measure pages the grouped query directly. Either
+    way the page costs a count plus at most two queries.
+    """
+    if sort not in CUSTOMER_SORTS:
+        raise ValueError(f'Unknown sort: {sort!r}')
+
+    page = max(1, page)
+    offset = (page - 1) * per_page
+    total = db.session.query(func.count(Customer.id)).scalar()
+
+    if sort == 'name':
+        order = Customer.name.desc() if descending else Customer.name.asc()
+        customers = Customer.query.order_by(order, Customer.id).offset(offset).limit(per_page).all()
+        stats = customer_stats([customer.id for customer in customers])
+        return CustomerPage(customers, stats, page, per_page, total)
+
+    measures = _customer_measures()
+    measure = {m.name: m for m in measures}[sort]
+    rows = db.session.query(
+        Customer, *measures
+    ).outerjoin(Sale, Sale.customer_id == Customer.id
+    ).group_by(Customer.id
+    ).order_by(measure.desc() if descending else measure.asc(), Customer.id
+    ).offset(offset).limit(per_page).all()
+
+    customers = [row[0] for row in rows]
+    stats = {row[0].id: _as_stats(*row[1:]) for row in rows}
+    return CustomerPage(customers, stats, page, per_page, total)
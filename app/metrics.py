@@ -0,0 +1,258 @@
+"""
+Prometheus metrics for capacity planning.
+
+/metrics serves, in the Prometheus text format:
+    http_requests_total, http_request_duration_seconds  per endpoint
+    http_requests_active                                 in flight now
+    db_query_duration_seconds                            per operation and table
+    db_pool_*                                            from app.dbmonitor
+    cache_hits_total, cache_misses_total, cache_hit_ratio
+
+The hot path takes no locks: every thread counts into its own shard, so
+each counter has a single writer, and a scrape merges the shards. Copying
+a dict or list is atomic under the GIL, so a scrape reads whole values (at
+worst a bucket count whose sum lands a moment later). When a thread
+exits, its shard is folded into a retired total so thread-per-request
+servers don't grow the list.
+
+Metrics are per process; with several workers scrape each one (or sum
+them on the Prometheus side). The production config sets
+METRICS_REQUIRE_TOKEN, so there metrics stay off until METRICS_TOKEN is
+set rather than being served to anyone.
+"""
+
+import re
+import threading
+import time
+import weakref
+
+from flask import g, request
+from sqlalchemy import event
+
+from app import db
+from app.cache import cache
+from app.dbmonitor import monitor_for
+from app.stream import broadcaster_for
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|JOIN|TABLE)\s+[`"]?(\w+)', re.IGNORECASE)
+
+
+def query_labels(statement):
+    """(operation, table) of a statement, e.g. ('select', 'sale')"""
+    words = statement.split(None, 1)
+    operation = words[0].lower() if words else 'unknown'
+    match = _TABLE.search(statement)
+    return operation, match.group(1).lower() if match else ''
+
+
+def _observe(histograms, key, buckets, seconds):
+    # Slots: one per bucket (non-cumulative), +Inf, then the sum
+    row = histograms.get(key)
+    if row is None:
+        row = histograms[key] = [0] * (len(buckets) + 1) + [0.0]
+    for index, bound in enumerate(buckets):
+        if seconds <= bound:
+            break
+    else:
+        index = len(buckets)
+    row[index] += 1
+    row[-1] += seconds
+
+
+class _Shard:
+    """Counters written by one thread"""
+
+    def __init__(self):
+        self.active = 0
+        self.requests = {}  # (endpoint, method, status) -> count
+        self.latency = {}  # endpoint -> histogram row
+        self.queries = {}  # (operation, table) -> histogram row
+
+    def merge(self, other):
+        """Add a consistent copy of another shard's counters into this one"""
+        self.active += other.active
+        for key, count in other.requests.copy().items():
+            self.requests[key] = self.requests.get(key, 0) + count
+        for mine, theirs in ((self.latency, other.latency), (self.queries, other.queries)):
+            for key, row in theirs.copy().items():
+                row = list(row)
+                if key in mine:
+                    mine[key] = [a + b for a, b in zip(mine[key], row)]
+                else:
+                    mine[key] = row
+
+
+class Metrics:
+    """Request and query instrumentation with per-thread shards"""
+
+    def __init__(self, app):
+        self.app = app
+        self.enabled = app.config.get('METRICS_ENABLED', True)
+        self.token = app.config.get('METRICS_TOKEN')
+        if self.enabled and not self.token and app.config.get('METRICS_REQUIRE_TOKEN'):
+            app.logger.warning('Metrics disabled: METRICS_TOKEN is required in this configuration')
+            self.enabled = False
+        self._local = threading.local()
+        self._shards = []
+        self._retired = _Shard()
+        self._scrape_lock = threading.Lock()  # scrapes and thread exits only
+
+        if self.enabled:
+            app.before_request(self._start)
+            app.after_request(self._status)
+            app.teardown_request(self._finish)
+            with app.app_context():
+                event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+                event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+                event.listen(db.engine, 'handle_error', self._on_error)
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._scrape_lock:
+                self._shards.append(shard)
+            weakref.finalize(threading.current_thread(), self._retire, shard)
+        return shard
+
+    def _retire(self, shard):
+        with self._scrape_lock:
+            self._retired.merge(shard)
+            self._shards.remove(shard)
+
+    # Request hooks
+
+    def _start(self):
+        g.metrics_started = time.perf_counter()
+        self._shard().active += 1
+
+    @staticmethod
+    def _status(response):
+        g.metrics_status = response.status_code
+        return response
+
+    def _finish(self, exc):
+        started = g.pop('metrics_started', None)
+        if started is None:
+            return
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or 'unmatched'
+        status = g.pop('metrics_status', 500)
+
+        shard = self._shard()
+        shard.active -= 1
+        key = (endpoint, request.method, status)
+        shard.requests[key] = shard.requests.get(key, 0) + 1
+        _observe(shard.latency, endpoint, LATENCY_BUCKETS, elapsed)
+
+    # Engine hooks
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('metrics_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info['metrics_started'].pop()
+        _observe(self._shard().queries, query_labels(statement), QUERY_BUCKETS, elapsed)
+
+    @staticmethod
+    def _on_error(context):
+        started = context.connection.info.get('metrics_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+    def collect(self):
+        """Merge every thread's counters into one shard"""
+        total = _Shard()
+        with self._scrape_lock:
+            total.merge(self._retired)
+            for shard in list(self._shards):
+                total.merge(shard)
+        return total
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        totals = self.collect()
+        lines = []
+
+        _family(lines, 'http_requests_total', 'counter', 'Requests handled, by endpoint, method and status')
+        for (endpoint, method, status), count in sorted(totals.requests.items()):
+            lines.append(f'http_requests_total{_labels(endpoint=endpoint, method=method, status=status)} {count}')
+
+        _family(lines, 'http_request_duration_seconds', 'histogram', 'Request latency by endpoint')
+        for endpoint, row in sorted(totals.latency.items()):
+            _histogram(lines, 'http_request_duration_seconds', {'endpoint': endpoint}, LATENCY_BUCKETS, row)
+
+        _family(lines, 'http_requests_active', 'gauge', 'Requests being handled')
+        lines.append(f'http_requests_active {totals.active}')
+
+        _family(lines, 'db_query_duration_seconds', 'histogram', 'SQL statement time by operation and table')
+        for (operation, table), row in sorted(totals.queries.items()):
+            _histogram(lines, 'db_query_duration_seconds', {'operation': operation, 'table': table},
+                       QUERY_BUCKETS, row)
+
+        pool = monitor_for(self.app).snapshot()
+        _family(lines, 'db_pool_size', 'gauge', 'Configured pool size')
+        lines.append(f"db_pool_size {pool['pool'].get('size', 1)}")
+        _family(lines, 'db_pool_checked_out', 'gauge', 'Connections checked out of the pool')
+        lines.append(f"db_pool_checked_out {pool['active']}")
+        _family(lines, 'db_pool_overflow', 'gauge', 'Connections open beyond the pool size')
+        lines.append(f"db_pool_overflow {max(pool['pool'].get('overflow', 0), 0)}")
+        _family(lines, 'db_pool_checkout_timeouts_total', 'counter', 'Checkouts that timed out')
+        lines.append(f"db_pool_checkout_timeouts_total {pool['timeouts']}")
+        _family(lines, 'db_slow_queries_total', 'counter', 'Statements slower than SLOW_QUERY_MS')
+        lines.append(f"db_slow_queries_total {pool['slow_queries']}")
+        wait = monitor_for(self.app).checkout_wait
+        _family(lines, 'db_pool_checkout_wait_seconds', 'histogram', 'Time waiting for a pooled connection')
+        _histogram(lines, 'db_pool_checkout_wait_seconds', {}, wait.buckets, list(wait.counts) + [wait.total])
+
+        backend = cache.backend
+        lookups = backend.hits + backend.misses
+        _family(lines, 'cache_hits_total', 'counter', 'Result cache hits')
+        lines.append(f'cache_hits_total {backend.hits}')
+        _family(lines, 'cache_misses_total', 'counter', 'Result cache misses')
+        lines.append(f'cache_misses_total {backend.misses}')
+        _family(lines, 'cache_hit_ratio', 'gauge', 'Result cache hits over lookups since start')
+        lines.append(f'cache_hit_ratio {backend.hits / lookups if lookups else 0.0:.6g}')
+
+        _family(lines, 'dashboard_stream_subscribers', 'gauge', 'Open dashboard event streams')
+        lines.append(f'dashboard_stream_subscribers {broadcaster_for(self.app).subscribers}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(**labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + '}'
+
+
+def _family(lines, name, kind, help_text):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {kind}')
+
+
+def _histogram(lines, name, labels, buckets, row):
+    cumulative = 0
+    for bound, count in zip(buckets + ('+Inf',), row):
+        cumulative += count
+        lines.append(f'{name}_bucket{_labels(**labels, le=bound)} {cumulative}')
+    lines.append(f'{name}_sum{_labels(**labels)} {row[-1]:.6f}')
+    lines.append(f'{name}_count{_labels(**labels)} {cumulative}')
+
+
+def init_app(app):
+    """Attach the metrics registry to the application"""
+    app.extensions['metrics'] = Metrics(app)
+
+
+def metrics_for(app):
+    """Return the metrics registry attached to an application"""
+    return app.extensions['metrics']
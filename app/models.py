@@ -1,11 +1,7 @@
 from datetime import datetime
-from app import db, login_manager
+from app import db
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
-
-@login_manager.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
+from app.passwords import hash_password, verify_password
 
 class User(UserMixin, db.Model):
     """User model for authentication"""
@@ -18,10 +14,10 @@ class User(UserMixin, db.Model):
     last_login = db.Column(db.DateTime)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
     
     def is_admin(self):
         return self.role == 'admin'
@@ -50,6 +46,12 @@ class Customer(db.Model):
 
 class Product(db.Model):
     """Product inventory"""
+    __table_args__ = (
+        db.Index('idx_product_name', 'name'),
+        db.Index('idx_product_category', 'category'),
+        db.Index('idx_product_low_stock', 'low_stock', 'name'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
@@ -58,6 +60,9 @@ class Product(db.Model):
     cost = db.Column(db.Float, nullable=False)  # Cost price
     stock_quantity = db.Column(db.Integer, default=0)
     min_stock = db.Column(db.Integer, default=10)  # Alert when below this
+    # Kept by the database so every write path, ORM or bulk, updates it
+    low_stock = db.Column(db.Boolean, db.Computed('coalesce(stock_quantity, 0) < coalesce(min_stock, 0)',
+                                                  persisted=True))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -79,6 +84,11 @@ class Product(db.Model):
 
 class Sale(db.Model):
     """Sales transactions"""
+    __table_args__ = (
+        db.Index('idx_sale_date', 'sale_date'),
+        db.Index('idx_customer', 'customer_id'),
+    )
+    
     id = db.Column(db.Integer, primary_key=True)
     invoice_number = db.Column(db.String(20), unique=True, nullable=False)
     customer_id = db.Column(db.Integer, db.ForeignKey('customer.id'))
@@ -112,6 +122,86 @@ class SaleItem(db.Model):
     def __repr__(self):
         return f'<SaleItem {self.id}>'
 
+class DailySalesRollup(db.Model):
+    """Daily sales totals per payment method and customer type.
+
+    Maintained incrementally by the session listeners in app/rollup.py so
+    that dashboard and report queries scan days instead of sales.
+    """
+    __tablename__ = 'daily_sales_rollup'
+
+    day = db.Column(db.Date, primary_key=True)
+    payment_method = db.Column(db.String(20), primary_key=True)
+    customer_type = db.Column(db.String(20), primary_key=True)
+    sale_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    discount = db.Column(db.Float, nullable=False, default=0)
+    tax = db.Column(db.Float, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<DailySalesRollup {self.day} {self.payment_method} {self.customer_type}>'
+
+class RestockAlert(db.Model):
+    """Queued notice that a product went below, or back above, its minimum stock.
+
+    Written by app/restock.py only when the low-stock flag changes; sent_at
+    stays empty until the alert has been delivered.
+    """
+    __table_args__ = (
+        db.Index('idx_restock_alert_pending', 'sent_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
+    event = db.Column(db.String(10), nullable=False)  # low, restocked
+    stock_quantity = db.Column(db.Integer, nullable=False)
+    min_stock = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+
+    product = db.relationship('Product')
+
+    def __repr__(self):
+        return f'<RestockAlert {self.product_id} {self.event}>'
+
+class StockAdjustment(db.Model):
+    """One stock movement. quantity is the signed change to stock on hand."""
+    __tablename__ = 'stock_adjustments'
+    __table_args__ = (
+        db.Index('idx_stock_adjustment_product', 'product_id', 'adjustment_date'),
+        db.Index('idx_stock_adjustment_date', 'adjustment_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
+    adjustment_type = db.Column(db.String(20), nullable=False)  # in, out, correction
+    quantity = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(200))
+    adjusted_by = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'))
+    adjustment_date = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    product = db.relationship('Product')
+
+    def __repr__(self):
+        return f'<StockAdjustment {self.product_id} {self.quantity:+d}>'
+
+class StockSnapshot(db.Model):
+    """Stock on hand of every product at one instant, taken periodically by app/ledger.py"""
+    taken_at = db.Column(db.DateTime, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    stock_quantity = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<StockSnapshot {self.taken_at} {self.product_id}>'
+
+class SequenceCounter(db.Model):
+    """Next unleased value of a named number sequence (see app/sequence.py)"""
+    name = db.Column(db.String(50), primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
+
+    def __repr__(self):
+        return f'<SequenceCounter {self.name} {self.next_value}>'
+
 class Expense(db.Model):
     """Business expenses"""
     id = db.Column(db.Integer, primary_key=True)
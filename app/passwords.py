@@ -0,0 +1,102 @@
+"""
+Bounded password hashing.
+
+PBKDF2 and scrypt are deliberately expensive, and a burst of logins at
+shift start used to hash in every request thread at once, starving the
+dashboards. Hashing and verification now run on a small thread pool
+(PASSWORD_HASH_WORKERS; hashlib releases the GIL, so they really run in
+parallel) while the request thread waits. At most PASSWORD_HASH_MAX_PENDING
+more may queue behind them; beyond that HasherBusy is raised at once and
+the login answers 503 with Retry-After instead of piling up.
+
+PASSWORD_HASH_METHOD is a full Werkzeug method string such as
+'pbkdf2:sha256:600000' or 'scrypt:32768:8:1'. Stored hashes made with any
+other method still verify, and are re-hashed with the configured one on
+the next successful login.
+
+With PASSWORD_HASH_WORKERS = 0 hashing runs inline in the request thread.
+"""
+
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = f'pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}'
+
+
+class HasherBusy(Exception):
+    """Raised when too many password hashes are already waiting"""
+
+
+class PasswordHasher:
+    """Runs password hashing on a bounded pool with a bounded queue"""
+
+    def __init__(self, app):
+        self.method = app.config.get('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        self.salt_length = app.config.get('PASSWORD_SALT_LENGTH', 16)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 10)
+        workers = app.config.get('PASSWORD_HASH_WORKERS', 2)
+        max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', 32)
+
+        self.busy = 0  # hashes that were turned away
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = (ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+                          if workers > 0 else None)
+
+    def _run(self, func, *args):
+        if self._executor is None:
+            return func(*args)
+        if not self._slots.acquire(blocking=False):
+            self.busy += 1
+            raise HasherBusy('Too many password checks in progress')
+        try:
+            future = self._executor.submit(func, *args)
+        except RuntimeError:
+            self._slots.release()
+            raise
+        # The slot is held until the hash finishes, even if we stop waiting
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            self.busy += 1
+            raise HasherBusy('Password check timed out in the queue') from None
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, pwhash, password):
+        return self._run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True when a stored hash was made with other parameters"""
+        return pwhash.split('$', 1)[0] != self.method
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+
+
+def init_app(app):
+    """Attach a password hasher to the application"""
+    app.extensions['password_hasher'] = PasswordHasher(app)
+
+
+def hasher_for(app):
+    """Return the password hasher attached to an application"""
+    return app.extensions['password_hasher']
+
+
+def hash_password(password):
+    """Hash with the app's settings, or Werkzeug's defaults outside an app"""
+    if has_app_context() and 'password_hasher' in current_app.extensions:
+        return hasher_for(current_app).hash(password)
+    return generate_password_hash(password, DEFAULT_METHOD)
+
+
+def verify_password(pwhash, password):
+    if has_app_context() and 'password_hasher' in current_app.extensions:
+        return hasher_for(current_app).verify(pwhash, password)
+    return check_password_hash(pwhash, password)
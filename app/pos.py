@@ -0,0 +1,284 @@
+"""
+Point-of-sale sale ingestion.
+
+POST /api/sales takes one sale or a batch from a till. Everything that
+can be checked without locks (shape, products, prices, customers,
+duplicate invoices) is checked before the transaction opens. The
+transaction then writes the sales and items with executemany inserts
+and ends with the statements that touch shared rows:
+
+    one conditional UPDATE decrementing every product in the batch,
+        UPDATE product SET stock_quantity = stock_quantity - CASE id ...
+        WHERE id IN (...) AND stock_quantity >= CASE id ...
+    the daily rollup upsert, then COMMIT.
+
+If the UPDATE matches fewer products than the batch needs, some product
+is short and the whole batch is rolled back, so an oversell is never
+half-applied. Hot product and rollup rows are locked only for those last
+statements, always in primary key order, so tills selling the same
+products queue briefly instead of convoying or deadlocking.
+
+A batch is all or nothing; invoices that already exist are skipped, so a
+till can safely resend a batch after a timeout. A resend that arrives
+while the first request is still writing passes the duplicate check and
+then hits the unique constraint on invoice_number; the batch is then
+rolled back and checked once more, so the invoices the other request
+wrote are skipped. If they clash a second time the batch is refused with
+DuplicateInvoices.
+
+Sales sent without an invoice_number are numbered by the server
+(app/sequence.py); those are not deduplicated, so a till that resends
+them must send the returned numbers. A client number in the server's
+format is only accepted as such a resend: one the server has not issued
+could collide with a number it issues later, so it is rejected.
+"""
+
+import re
+from collections import defaultdict
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.cache import cache
+from app.importer import PAYMENT_METHODS
+from app.ledger import InsufficientStock, maybe_snapshot
+from app.models import Customer, Product, Sale, SaleItem, StockAdjustment
+from app.restock import stock_transitions
+from app.rollup import WALK_IN, record_sales
+from app.sequence import sequence_for
+
+MAX_BATCH = 500
+MAX_ITEMS = 200
+
+
+class SaleRejected(ValueError):
+    """Raised for a malformed sale; `index` is its position in the batch"""
+
+    def __init__(self, index, message):
+        self.index = index
+        super().__init__(f'sale {index}: {message}')
+
+
+class DuplicateInvoices(ValueError):
+    """Raised when invoices in a batch keep clashing with sales written concurrently"""
+
+    def __init__(self, invoice_numbers):
+        self.invoice_numbers = sorted(invoice_numbers)
+        super().__init__(f'Invoices written by another request: {", ".join(self.invoice_numbers)}')
+
+
+def _integer(data, field, minimum=None, required=True):
+    value = data.get(field)
+    if value is None and not required:
+        return None
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ValueError(f'{field} must be an integer')
+    if minimum is not None and value < minimum:
+        raise ValueError(f'{field} must be at least {minimum}')
+    return value
+
+
+def _amount(data, field, default=None):
+    value = data.get(field, default)
+    if value is None:
+        return None
+    if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+        raise ValueError(f'{field} must be a non-negative number')
+    return float(value)
+
+
+def parse_sale(data):
+    """Validate the shape of one sale; returns (sale values, [(product_id, quantity, unit_price)])"""
+    if not isinstance(data, dict):
+        raise ValueError('sale must be an object')
+    invoice = data.get('invoice_number')
+    if invoice is not None and (not isinstance(invoice, str) or not invoice.strip() or len(invoice.strip()) > 20):
+        raise ValueError('invoice_number must be text of 1 to 20 characters')
+    payment_method = data.get('payment_method') or 'cash'
+    if payment_method not in PAYMENT_METHODS:
+        raise ValueError(f'payment_method must be one of {", ".join(PAYMENT_METHODS)}')
+    sale_date = data.get('sale_date')
+    if sale_date is not None:
+        if not isinstance(sale_date, str):
+            raise ValueError('sale_date must be an ISO date and time')
+        sale_date = datetime.fromisoformat(sale_date)
+    notes = data.get('notes')
+    if notes is not None and not isinstance(notes, str):
+        raise ValueError('notes must be text')
+
+    lines = data.get('items')
+    if not isinstance(lines, list) or not lines:
+        raise ValueError('items must be a non-empty list')
+    if len(lines) > MAX_ITEMS:
+        raise ValueError(f'at most {MAX_ITEMS} items per sale')
+    items = []
+    for line in lines:
+        if not isinstance(line, dict):
+            raise ValueError('each item must be an object')
+        items.append((_integer(line, 'product_id'), _integer(line, 'quantity', minimum=1),
+                      _amount(line, 'unit_price')))
+
+    sale = {
+        'invoice_number': invoice.strip() if invoice is not None else None,
+        'customer_id': _integer(data, 'customer_id', required=False),
+        'sale_date': sale_date,
+        'payment_method': payment_method,
+        'discount': _amount(data, 'discount', 0.0),
+        'tax': _amount(data, 'tax', 0.0),
+        'notes': notes,
+    }
+    return sale, items
+
+
+def existing_invoices(invoices):
+    """The invoice numbers among `invoices` that are already recorded"""
+    if not invoices:
+        return set()
+    return set(db.session.execute(
+        select(Sale.invoice_number).where(Sale.invoice_number.in_(list(invoices)))).scalars())
+
+
+def _lookup(column_id, columns, ids):
+    if not ids:
+        return {}
+    return {row[0]: row[1:] for row in db.session.execute(select(column_id, *columns).where(column_id.in_(ids)))}
+
+
+def decrement_stock(connection, needed, at):
+    """Take `needed` ({product_id: quantity}) off stock in one conditional UPDATE.
+
+    Raises InsufficientStock, naming the short products, when any product
+    lacks the stock; the caller must then roll back.
+    """
+    table = Product.__table__
+    quantity = case(needed, value=table.c.id)
+    result = connection.execute(
+        update(table)
+        .where(table.c.id.in_(sorted(needed)), table.c.stock_quantity >= quantity)
+        .values(stock_quantity=table.c.stock_quantity - quantity, updated_at=at)
+    )
+    if result.rowcount != len(needed):
+        # Rows the UPDATE skipped still hold their old stock
+        stock = dict(connection.execute(
+            select(table.c.id, table.c.stock_quantity).where(table.c.id.in_(sorted(needed)))).all())
+        raise InsufficientStock([product_id for product_id, count in needed.items()
+                                 if (stock.get(product_id) or 0) < count])
+
+
+def record_pos_sales(payloads, user_id=None):
+    """Validate and write a batch of till sales in one transaction.
+
+    Raises SaleRejected for malformed sales or unknown products/customers
+    and InsufficientStock when the batch would oversell; nothing is
+    written in either case. Raises DuplicateInvoices if the batch clashes
+    twice with invoices another request is writing. Returns (created,
+    duplicates): created is a list of {invoice_number, id, total_amount},
+    duplicates the invoice numbers that already existed and were skipped.
+    """
+    if not isinstance(payloads, list) or not payloads:
+        raise ValueError('no sales given')
+    if len(payloads) > MAX_BATCH:
+        raise ValueError(f'at most {MAX_BATCH} sales per batch')
+
+    parsed = []
+    for index, data in enumerate(payloads):
+        try:
+            parsed.append(parse_sale(data))
+        except ValueError as exc:
+            raise SaleRejected(index, str(exc)) from None
+
+    product_ids = {product_id for _, items in parsed for product_id, _, _ in items}
+    customer_ids = {sale['customer_id'] for sale, _ in parsed if sale['customer_id'] is not None}
+    prices = {product_id: row[0] for product_id, row in _lookup(Product.id, [Product.price], product_ids).items()}
+    customers = {customer_id: row[0] or 'retail' for customer_id, row in
+                 _lookup(Customer.id, [Customer.customer_type], customer_ids).items()}
+    invoices = {sale['invoice_number'] for sale, _ in parsed if sale['invoice_number'] is not None}
+
+    for _ in range(2):
+        try:
+            return _write_sales(parsed, prices, customers, existing_invoices(invoices), user_id)
+        except IntegrityError:
+            # Another request wrote some of these invoices after the check
+            clashing = existing_invoices(invoices)
+            if not clashing:
+                raise
+    raise DuplicateInvoices(clashing)
+
+
+def _write_sales(parsed, prices, customers, existing, user_id):
+    """Number, price and write the sales whose invoices are not in `existing`"""
+    sequence = sequence_for(current_app)
+    server_number = re.compile(rf'{re.escape(sequence.prefix)}-\d{{8}}-\d{{6,}}')
+    for index, (sale, _) in enumerate(parsed):
+        invoice = sale['invoice_number']
+        if invoice is not None and invoice not in existing and server_number.fullmatch(invoice):
+            raise SaleRejected(index, f'invoice_number {invoice} is in the server numbering format '
+                                      'but was not issued by the server')
+
+    parsed = [(dict(sale), items) for sale, items in parsed]
+    unnumbered = [sale for sale, _ in parsed if sale['invoice_number'] is None]
+    if unnumbered:
+        for sale, number in zip(unnumbered, sequence.allocate(len(unnumbered))):
+            sale['invoice_number'] = number
+
+    now = datetime.utcnow()
+    sales, items_by_invoice, duplicates = [], {}, []
+    needed = defaultdict(int)
+    for index, (sale, items) in enumerate(parsed):
+        invoice = sale['invoice_number']
+        if invoice in existing or invoice in items_by_invoice:
+            duplicates.append(invoice)
+            continue
+        if sale['customer_id'] is not None and sale['customer_id'] not in customers:
+            raise SaleRejected(index, f'unknown customer_id {sale["customer_id"]}')
+        rows = []
+        for product_id, quantity, unit_price in items:
+            if product_id not in prices:
+                raise SaleRejected(index, f'unknown product_id {product_id}')
+            unit_price = prices[product_id] if unit_price is None else unit_price
+            rows.append({'product_id': product_id, 'quantity': quantity,
+                         'unit_price': unit_price, 'subtotal': quantity * unit_price})
+            needed[product_id] += quantity
+        subtotal = sum(row['subtotal'] for row in rows)
+        if sale['discount'] > subtotal:
+            raise SaleRejected(index, 'discount exceeds the sale subtotal')
+        sale = dict(sale, sale_date=sale['sale_date'] or now)
+        sale['total_amount'] = subtotal - sale['discount'] + sale['tax']
+        sales.append(sale)
+        items_by_invoice[invoice] = rows
+
+    if not sales:
+        return [], duplicates
+
+    try:
+        connection = db.session.connection()
+        connection.execute(insert(Sale.__table__), sales)
+        ids = dict(connection.execute(select(Sale.invoice_number, Sale.id).where(
+            Sale.invoice_number.in_(list(items_by_invoice)))).all())
+        connection.execute(insert(SaleItem.__table__), [
+            dict(row, sale_id=ids[invoice]) for invoice, rows in items_by_invoice.items() for row in rows
+        ])
+        connection.execute(insert(StockAdjustment.__table__), [
+            {'product_id': row['product_id'], 'adjustment_type': 'out', 'quantity': -row['quantity'],
+             'reason': f'Sale {invoice}', 'adjusted_by': user_id, 'adjustment_date': now}
+            for invoice, rows in items_by_invoice.items() for row in rows
+        ])
+
+        # Shared rows last, so their locks are held only until the commit
+        with stock_transitions(connection, needed):
+            decrement_stock(connection, dict(needed), now)
+        record_sales(connection, [dict(sale, customer_type=customers.get(sale['customer_id'], WALK_IN))
+                                  for sale in sales])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    cache.invalidate('sales', 'products')
+    maybe_snapshot()
+    created = [{'invoice_number': sale['invoice_number'], 'id': ids[sale['invoice_number']],
+                'total_amount': sale['total_amount']} for sale in sales]
+    return created, duplicates
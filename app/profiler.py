@@ -0,0 +1,161 @@
+"""
+Opt-in per-request performance profiler.
+
+With PROFILER_ENABLED set, every request records the SQL it runs: the
+statement count, the DB time and a breakdown by statement shape (the SQL
+with literals and IN lists collapsed). A shape repeated PROFILER_N_PLUS_ONE
+times or more in one request is flagged as a likely N+1. Each response
+carries a Server-Timing header (db, app and total) that browser devtools
+show in the network panel.
+
+Requests slower than PROFILER_SLOW_MS, or with an N+1, are kept in a ring
+buffer of the last PROFILER_RING_SIZE entries for the admin-only
+/debug/perf page. When disabled no hooks are installed, so it costs nothing.
+"""
+
+import re
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+from app import db
+
+MAX_SHAPES = 10  # largest shapes kept per recorded request
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Reduce a statement to its shape: literals and IN lists become ?"""
+    shape = _STRING.sub('?', statement)
+    shape = _NUMBER.sub('?', shape)
+    shape = _SPACE.sub(' ', shape).strip()
+    return _IN_LIST.sub('(?)', shape)
+
+
+class RequestProfile:
+    """SQL statements run while handling one request"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.shapes = {}  # shape -> [count, seconds]
+
+    def record(self, statement, seconds):
+        self.queries += 1
+        self.db_time += seconds
+        entry = self.shapes.setdefault(statement_shape(statement), [0, 0.0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def repeated(self, threshold):
+        """Shapes run at least threshold times, most frequent first"""
+        return sorted(((shape, count, seconds) for shape, (count, seconds) in self.shapes.items()
+                       if count >= threshold), key=lambda item: -item[1])
+
+    def breakdown(self, limit=MAX_SHAPES):
+        """The shapes that took the most DB time"""
+        return sorted(((shape, count, seconds) for shape, (count, seconds) in self.shapes.items()),
+                      key=lambda item: -item[2])[:limit]
+
+
+def _shape_dict(shape, count, seconds):
+    return {'sql': shape, 'count': count, 'ms': round(seconds * 1000, 2)}
+
+
+class RequestProfiler:
+    """Installs the request and engine hooks and keeps recent slow requests"""
+
+    def __init__(self, app):
+        self.enabled = app.config.get('PROFILER_ENABLED', False)
+        self.slow_seconds = app.config.get('PROFILER_SLOW_MS', 200) / 1000
+        self.n_plus_one = app.config.get('PROFILER_N_PLUS_ONE', 5)
+        self.recent = deque(maxlen=app.config.get('PROFILER_RING_SIZE', 50))
+        self.app = app
+
+        if self.enabled:
+            app.before_request(self._start)
+            app.after_request(self._finish)
+            with app.app_context():
+                event.listen(db.engine, 'before_cursor_execute', self._before_execute)
+                event.listen(db.engine, 'after_cursor_execute', self._after_execute)
+                event.listen(db.engine, 'handle_error', self._on_error)
+
+    # Engine hooks; statements outside a profiled request are ignored
+
+    @staticmethod
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context() and 'perf_profile' in g:
+            conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+    @staticmethod
+    def _after_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('profile_started')
+        if started and has_request_context() and 'perf_profile' in g:
+            g.perf_profile.record(statement, time.perf_counter() - started.pop())
+
+    @staticmethod
+    def _on_error(context):
+        started = context.connection.info.get('profile_started') if context.connection is not None else None
+        if started:
+            started.pop()
+
+    # Request hooks
+
+    def _start(self):
+        g.perf_profile = RequestProfile()
+
+    def _finish(self, response):
+        profile = g.pop('perf_profile', None)
+        if profile is None:
+            return response
+        total = time.perf_counter() - profile.started
+        response.headers['Server-Timing'] = ', '.join([
+            f'db;dur={profile.db_time * 1000:.2f};desc="{profile.queries} queries"',
+            f'app;dur={(total - profile.db_time) * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+        repeated = profile.repeated(self.n_plus_one)
+        if repeated:
+            shape, count, _ = repeated[0]
+            self.app.logger.warning('Possible N+1 on %s %s: %d x %s', request.method, request.path,
+                                    count, shape[:200])
+        if total >= self.slow_seconds or repeated:
+            self.recent.append({
+                'at': datetime.now().isoformat(timespec='seconds'),
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(total * 1000, 2),
+                'db_ms': round(profile.db_time * 1000, 2),
+                'queries': profile.queries,
+                'n_plus_one': [_shape_dict(*entry) for entry in repeated],
+                'shapes': [_shape_dict(*entry) for entry in profile.breakdown()],
+            })
+        return response
+
+    def entries(self):
+        """Recorded requests, newest first"""
+        return list(reversed(self.recent))
+
+    def clear(self):
+        self.recent.clear()
+
+
+def init_app(app):
+    """Attach the (possibly disabled) profiler to the application"""
+    app.extensions['profiler'] = RequestProfiler(app)
+
+
+def profiler_for(app):
+    """Return the profiler attached to an application"""
+    return app.extensions['profiler']
@@ -0,0 +1,120 @@
+"""
+Vectorised sales report engine.
+
+The period's facts are streamed from the database in fixed-size chunks and
+each chunk is reduced with pandas group-bys into small running totals, so
+memory is bounded by the chunk size and the number of groups (days x
+payment methods x customer types, products) rather than by the number of
+sales in the period.
+"""
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select
+
+from app import db
+from app.models import Customer, Product, Sale, SaleItem
+from app.rollup import UNKNOWN_PAYMENT, WALK_IN
+from app.timeseries import buckets, half_open, period_range
+
+REPORT_CHUNK_SIZE = 10000
+TOP_PRODUCTS = 5
+
+_SALE_MEASURES = ['total_amount', 'discount', 'tax']
+
+
+def period_bounds(start, end):
+    """Sargable predicates on sale_date for a report period (see period_range)"""
+    return half_open(Sale.sale_date, *period_range(start, end))
+
+
+def iter_frames(stmt, chunk_size=REPORT_CHUNK_SIZE):
+    """Stream a SELECT as DataFrames of at most chunk_size rows.
+
+    Runs on the session's connection so rows skip ORM result processing.
+    """
+    result = db.session.connection().execute(stmt.execution_options(yield_per=chunk_size))
+    columns = list(result.keys())
+    for rows in result.partitions():
+        yield pd.DataFrame.from_records(rows, columns=columns)
+
+
+def _accumulate(total, chunk):
+    return chunk if total is None else total.add(chunk, fill_value=0)
+
+
+def _sale_groups(start, end, chunk_size):
+    """Count and measure sums per (day, payment_method, customer_type)"""
+    stmt = select(
+        Sale.sale_date, Sale.payment_method, Customer.customer_type,
+        Sale.total_amount, Sale.discount, Sale.tax
+    ).outerjoin(Customer, Sale.customer_id == Customer.id).where(*period_bounds(start, end))
+
+    groups = None
+    for frame in iter_frames(stmt, chunk_size):
+        frame['day'] = pd.to_datetime(frame['sale_date']).dt.normalize()
+        frame['payment_method'] = frame['payment_method'].fillna(UNKNOWN_PAYMENT)
+        frame['customer_type'] = frame['customer_type'].fillna(WALK_IN)
+        frame[_SALE_MEASURES] = frame[_SALE_MEASURES].astype(np.float64).fillna(0.0)
+        frame['count'] = 1
+        chunk = frame.groupby(['day', 'payment_method', 'customer_type'])[['count'] + _SALE_MEASURES].sum()
+        groups = _accumulate(groups, chunk)
+
+    if groups is None:
+        index = pd.MultiIndex.from_arrays([[], [], []], names=['day', 'payment_method', 'customer_type'])
+        groups = pd.DataFrame(columns=['count'] + _SALE_MEASURES, index=index, dtype=np.float64)
+    return groups
+
+
+def _product_totals(start, end, chunk_size):
+    """Quantity and revenue per product"""
+    stmt = select(
+        SaleItem.product_id, SaleItem.quantity, SaleItem.subtotal
+    ).join(Sale, SaleItem.sale_id == Sale.id).where(*period_bounds(start, end))
+
+    totals = None
+    for frame in iter_frames(stmt, chunk_size):
+        frame[['quantity', 'subtotal']] = frame[['quantity', 'subtotal']].astype(np.float64).fillna(0.0)
+        totals = _accumulate(totals, frame.groupby('product_id')[['quantity', 'subtotal']].sum())
+    return totals
+
+
+def _split(groups, level):
+    summary = groups.groupby(level=level)[['count', 'total_amount']].sum()
+    return {key: {'count': int(row['count']), 'total': float(row['total_amount'])}
+            for key, row in summary.iterrows()}
+
+
+def _top_products(totals, limit):
+    if totals is None or totals.empty:
+        return []
+    top = totals.sort_values('subtotal', ascending=False).head(limit)
+    names = dict(db.session.query(Product.id, Product.name).filter(Product.id.in_(top.index.tolist())))
+    return [{
+        'name': names.get(product_id),
+        'quantity': int(row['quantity']),
+        'revenue': float(row['subtotal'])
+    } for product_id, row in top.iterrows()]
+
+
+def sales_report(start, end, chunk_size=REPORT_CHUNK_SIZE, top=TOP_PRODUCTS):
+    """Totals, daily series, top products and payment / customer splits for a period"""
+    groups = _sale_groups(start, end, chunk_size)
+
+    count = int(groups['count'].sum())
+    total = float(groups['total_amount'].sum())
+    daily = groups.groupby(level='day')['total_amount'].sum()
+    daily_totals = {day.date(): float(value) for day, value in daily.items()}
+
+    return {
+        'total_sales': total,
+        'total_transactions': count,
+        'average_transaction': total / count if count else 0,
+        'total_discount': float(groups['discount'].sum()),
+        'total_tax': float(groups['tax'].sum()),
+        'sales_by_day': [{'date': str(day), 'total': daily_totals.get(day, 0.0)}
+                         for day in buckets(*period_range(start, end), 'day')],
+        'sales_by_payment_method': _split(groups, 'payment_method'),
+        'sales_by_customer_type': _split(groups, 'customer_type'),
+        'top_products': _top_products(_product_totals(start, end, chunk_size), top),
+    }
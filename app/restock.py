@@ -0,0 +1,178 @@
+"""
+Low-stock transitions and the restock alert queue.
+
+product.low_stock is a stored generated column (stock below min_stock),
+indexed with the name, so "which products are low" is an index range read
+rather than a scan comparing two columns on every row.
+
+An alert is queued in restock_alert only when a product's flag flips: a
+'low' alert when it drops below its minimum, a 'restocked' one when it
+recovers. Flushes that touch stock_quantity or min_stock are tracked by
+the session listeners below; Core and bulk writers wrap their statements
+in stock_transitions() with the product ids they touch.
+"""
+
+from contextlib import contextmanager
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import event, insert, select, update
+from sqlalchemy.orm import joinedload
+
+from app import db
+from app.models import Product, RestockAlert
+
+# Product columns whose change can flip the low-stock flag
+TRACKED_ATTRIBUTES = ('stock_quantity', 'min_stock')
+
+# Spelled as a comparison so MySQL and SQLite both use idx_product_low_stock
+IS_LOW_STOCK = Product.low_stock == True  # noqa: E712
+
+
+def low_stock_products(limit=None):
+    """Products below their minimum stock, by name, read from the index"""
+    query = Product.query.filter(IS_LOW_STOCK).order_by(Product.name)
+    if limit:
+        query = query.limit(limit)
+    return query.all()
+
+
+def low_stock_flags(connection, product_ids):
+    """Map product id to (low_stock, stock_quantity, min_stock) as stored"""
+    if not product_ids:
+        return {}
+    table = Product.__table__
+    rows = connection.execute(
+        select(table.c.id, table.c.low_stock, table.c.stock_quantity, table.c.min_stock)
+        .where(table.c.id.in_(list(product_ids)))
+    )
+    return {product_id: (bool(low), stock or 0, minimum or 0) for product_id, low, stock, minimum in rows}
+
+
+def queue_transitions(connection, before, after):
+    """Queue an alert for every product whose flag differs between two snapshots.
+
+    Products missing from `before` were just created and count as not low.
+    Returns the number of alerts queued.
+    """
+    now = datetime.utcnow()
+    alerts = [
+        {'product_id': product_id, 'event': 'low' if low else 'restocked',
+         'stock_quantity': stock, 'min_stock': minimum, 'created_at': now}
+        for product_id, (low, stock, minimum) in after.items()
+        if low != before.get(product_id, (False,))[0]
+    ]
+    if alerts:
+        connection.execute(insert(RestockAlert.__table__), alerts)
+    return len(alerts)
+
+
+@contextmanager
+def stock_transitions(connection, product_ids):
+    """Queue alerts for products whose flag changes inside the block.
+
+    For Core and bulk writers; the ids may be extended inside the block
+    (e.g. with newly inserted products) before it exits.
+    """
+    product_ids = set(product_ids)
+    before = low_stock_flags(connection, product_ids)
+    yield product_ids
+    queue_transitions(connection, before, low_stock_flags(connection, product_ids))
+
+
+def pending_alerts(limit=100):
+    """Undelivered alerts, oldest first, with their products loaded"""
+    return (RestockAlert.query.options(joinedload(RestockAlert.product))
+            .filter(RestockAlert.sent_at.is_(None))
+            .order_by(RestockAlert.id).limit(limit).all())
+
+
+def mark_sent(alert_ids):
+    """Record alerts as delivered; returns how many were still pending"""
+    if not alert_ids:
+        return 0
+    result = db.session.execute(
+        update(RestockAlert)
+        .where(RestockAlert.id.in_(list(alert_ids)), RestockAlert.sent_at.is_(None))
+        .values(sent_at=datetime.utcnow())
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def dispatch_alerts(send, batch_size=100):
+    """Hand pending alerts to `send` a batch at a time, marking each batch sent.
+
+    The batch is locked with SKIP LOCKED where the database supports it, so
+    several dispatchers can drain the queue without sending an alert twice.
+    Returns the number of alerts sent.
+    """
+    sent = 0
+    while True:
+        alerts = (RestockAlert.query.options(joinedload(RestockAlert.product))
+                  .filter(RestockAlert.sent_at.is_(None))
+                  .order_by(RestockAlert.id).limit(batch_size)
+                  .with_for_update(skip_locked=True, of=RestockAlert).all())
+        if not alerts:
+            return sent
+        send(alerts)
+        now = datetime.utcnow()
+        for alert in alerts:
+            alert.sent_at = now
+        db.session.commit()
+        sent += len(alerts)
+
+
+def log_alerts(alerts):
+    """Default sender: one log line per alert"""
+    for alert in alerts:
+        current_app.logger.warning(
+            'Restock alert: %s is %s (stock %d, minimum %d)',
+            alert.product.name if alert.product else f'product {alert.product_id}',
+            'below its minimum' if alert.event == 'low' else 'back in stock',
+            alert.stock_quantity, alert.min_stock)
+
+
+def alert_to_dict(alert):
+    """Serialise an alert for the JSON API"""
+    return {
+        'id': alert.id,
+        'product_id': alert.product_id,
+        'product_name': alert.product.name if alert.product else None,
+        'event': alert.event,
+        'stock_quantity': alert.stock_quantity,
+        'min_stock': alert.min_stock,
+        'created_at': alert.created_at.isoformat(),
+    }
+
+
+def _has_tracked_changes(product):
+    state = db.inspect(product)
+    return any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_stock_changes(session, flush_context, instances):
+    new = [obj for obj in session.new if isinstance(obj, Product)]
+    changed = [obj.id for obj in session.dirty
+               if isinstance(obj, Product) and obj.id is not None and _has_tracked_changes(obj)]
+    if not new and not changed:
+        return
+    # The database still holds the pre-flush flags of changed products
+    with session.no_autoflush:
+        before = low_stock_flags(session.connection(), changed)
+    pending = session.info.setdefault('restock_pending', [])
+    pending.append((before, changed, new))
+
+
+@event.listens_for(db.session, 'after_flush')
+def _queue_stock_alerts(session, flush_context):
+    for before, changed, new in session.info.pop('restock_pending', []):
+        product_ids = set(changed) | {obj.id for obj in new if obj.id is not None}
+        connection = session.connection()
+        queue_transitions(connection, before, low_stock_flags(connection, product_ids))
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_stock_changes(session):
+    session.info.pop('restock_pending', None)
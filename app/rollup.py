@@ -0,0 +1,305 @@
+"""
+Incremental maintenance of the daily sales rollup.
+
+Every flush that inserts, changes or deletes a Sale adjusts the matching
+daily_sales_rollup rows in the same transaction, so readers can sum a few
+rows per day instead of scanning the sale table.
+
+Sales are bucketed by their customer's current type, the same meaning
+`flask rebuild-sales-rollup` uses: changing a customer's type (or deleting
+the customer, which makes their sales walk-in) moves that customer's
+existing sales to the new bucket in the same transaction.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from sqlalchemy import case, event, func, insert, select
+
+from app import db
+from app.models import Customer, DailySalesRollup, Sale
+from app.timeseries import as_bucket, bucket_expression, half_open
+
+WALK_IN = 'walk_in'
+UNKNOWN_PAYMENT = 'unknown'
+
+# Sale columns whose change moves money between rollup rows
+TRACKED_ATTRIBUTES = ('sale_date', 'payment_method', 'customer_id', 'customer',
+                      'total_amount', 'discount', 'tax')
+
+MEASURES = ('sale_count', 'revenue', 'discount', 'tax')
+
+
+def as_date(value):
+    """Return the calendar day of a date or datetime"""
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def rollup_key(sale_date, payment_method, customer_type):
+    """Build the (day, payment_method, customer_type) key for a sale"""
+    return (as_date(sale_date), payment_method or UNKNOWN_PAYMENT, customer_type or WALK_IN)
+
+
+def _customer_type(session, sale):
+    """Resolve the customer type of an in-memory sale"""
+    if db.inspect(sale).attrs.customer.history.has_changes():
+        customer = sale.customer
+    elif sale.customer_id is not None:
+        customer = session.get(Customer, sale.customer_id)
+    else:
+        customer = None
+    if customer is None:
+        return WALK_IN
+    return customer.customer_type or 'retail'
+
+
+def _add(deltas, key, count, revenue, discount, tax, sign=1):
+    row = deltas[key]
+    row[0] += sign * count
+    row[1] += sign * (revenue or 0)
+    row[2] += sign * (discount or 0)
+    row[3] += sign * (tax or 0)
+
+
+def _stored_contributions(session, sale_ids):
+    """Load what the given sales currently contribute in the database"""
+    customer_type = case(
+        (Customer.id.is_(None), WALK_IN),
+        else_=func.coalesce(Customer.customer_type, 'retail')
+    )
+    rows = session.execute(
+        select(Sale.sale_date, Sale.payment_method, customer_type,
+               Sale.total_amount, Sale.discount, Sale.tax)
+        .outerjoin(Customer, Sale.customer_id == Customer.id)
+        .where(Sale.id.in_(sale_ids))
+    ).all()
+    return [(rollup_key(r[0], r[1], r[2]), r[3], r[4], r[5]) for r in rows]
+
+
+def customer_type_deltas(connection, new_types, exclude_sale_ids=()):
+    """Deltas moving customers' stored sales to new customer types.
+
+    new_types maps customer id -> the type their sales should now count
+    under (WALK_IN for a deleted customer). The old type is read from the
+    database, so call this before the customer rows are written.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    if not new_types:
+        return deltas
+    day = bucket_expression(Sale.sale_date, 'day', connection.dialect.name)
+    payment_method = func.coalesce(Sale.payment_method, UNKNOWN_PAYMENT)
+    old_type = func.coalesce(Customer.customer_type, 'retail')
+    stmt = (
+        select(Sale.customer_id, day, payment_method, old_type, func.count(Sale.id),
+               func.sum(Sale.total_amount), func.sum(Sale.discount), func.sum(Sale.tax))
+        .join(Customer, Sale.customer_id == Customer.id)
+        .where(Sale.customer_id.in_(sorted(new_types)))
+        .group_by(Sale.customer_id, day, payment_method, old_type)
+    )
+    if exclude_sale_ids:
+        stmt = stmt.where(Sale.id.not_in(list(exclude_sale_ids)))
+    for customer_id, sale_day, method, stored_type, count, revenue, discount, tax in connection.execute(stmt):
+        new_type = new_types[customer_id] or 'retail'
+        if new_type == stored_type:
+            continue
+        _add(deltas, rollup_key(as_bucket(sale_day), method, stored_type), count, revenue, discount, tax, sign=-1)
+        _add(deltas, rollup_key(as_bucket(sale_day), method, new_type), count, revenue, discount, tax)
+    return deltas
+
+
+def _customer_type_changes(session):
+    """{customer id: new type} for customers re-typed or deleted in a session"""
+    changes = {}
+    for obj in session.dirty:
+        if (isinstance(obj, Customer) and obj.id is not None
+                and db.inspect(obj).attrs.customer_type.history.has_changes()):
+            changes[obj.id] = obj.customer_type or 'retail'
+    for obj in session.deleted:
+        if isinstance(obj, Customer) and obj.id is not None:
+            changes[obj.id] = WALK_IN
+    return changes
+
+
+def _has_tracked_changes(sale):
+    state = db.inspect(sale)
+    return any(state.attrs[name].history.has_changes() for name in TRACKED_ATTRIBUTES)
+
+
+def collect_deltas(session):
+    """Compute rollup deltas for the pending changes of a session"""
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    stale_ids = []
+
+    with session.no_autoflush:
+        for obj in session.new:
+            if isinstance(obj, Sale):
+                if obj.sale_date is None:
+                    # Pin the column default now so the rollup day matches the row
+                    obj.sale_date = datetime.utcnow()
+                key = rollup_key(obj.sale_date, obj.payment_method, _customer_type(session, obj))
+                _add(deltas, key, 1, obj.total_amount, obj.discount, obj.tax)
+
+        for obj in session.deleted:
+            if isinstance(obj, Sale) and obj.id is not None:
+                stale_ids.append(obj.id)
+
+        for obj in session.dirty:
+            if isinstance(obj, Sale) and obj.id is not None and _has_tracked_changes(obj):
+                stale_ids.append(obj.id)
+                key = rollup_key(obj.sale_date, obj.payment_method, _customer_type(session, obj))
+                _add(deltas, key, 1, obj.total_amount, obj.discount, obj.tax)
+
+        # The database still holds the pre-flush values of changed and
+        # deleted sales, so one query tells us what to subtract
+        if stale_ids:
+            for key, revenue, discount, tax in _stored_contributions(session, stale_ids):
+                _add(deltas, key, 1, revenue, discount, tax, sign=-1)
+
+        # Re-typed customers take their other sales along; sales changed in
+        # this flush were already re-added under the new type above
+        moved = customer_type_deltas(session.connection(), _customer_type_changes(session), stale_ids)
+        for key, values in moved.items():
+            _add(deltas, key, *values)
+
+    return {
+        key: values for key, values in deltas.items()
+        if values[0] != 0 or any(abs(v) > 1e-9 for v in values[1:])
+    }
+
+
+def _upsert_statement(dialect_name):
+    """Return an INSERT that adds to existing rollup rows on key conflict"""
+    table = DailySalesRollup.__table__
+
+    if dialect_name == 'mysql':
+        from sqlalchemy.dialects.mysql import insert as mysql_insert
+        stmt = mysql_insert(table)
+        return stmt.on_duplicate_key_update(
+            {name: table.c[name] + stmt.inserted[name] for name in MEASURES}
+        )
+
+    if dialect_name in ('sqlite', 'postgresql'):
+        if dialect_name == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(table)
+        return stmt.on_conflict_do_update(
+            index_elements=['day', 'payment_method', 'customer_type'],
+            set_={name: table.c[name] + stmt.excluded[name] for name in MEASURES}
+        )
+
+    return None
+
+
+def apply_deltas(connection, deltas):
+    """Add a {key: [count, revenue, discount, tax]} mapping to the rollup"""
+    if not deltas:
+        return
+
+    rows = [
+        {'day': day, 'payment_method': payment_method, 'customer_type': customer_type,
+         'sale_count': values[0], 'revenue': values[1],
+         'discount': values[2], 'tax': values[3]}
+        for (day, payment_method, customer_type), values in sorted(deltas.items())
+    ]
+
+    stmt = _upsert_statement(connection.dialect.name)
+    if stmt is not None:
+        connection.execute(stmt, rows)
+        return
+
+    # Portable fallback: update in place, insert the keys that were missing
+    table = DailySalesRollup.__table__
+    for row in rows:
+        result = connection.execute(
+            table.update()
+            .where(table.c.day == row['day'],
+                   table.c.payment_method == row['payment_method'],
+                   table.c.customer_type == row['customer_type'])
+            .values({name: table.c[name] + row[name] for name in MEASURES})
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert(), row)
+
+
+def record_sales(connection, sales):
+    """Add bulk-inserted sales to the rollup.
+
+    Core and bulk inserts bypass the session listeners, so bulk writers pass
+    the rows they wrote here. Each row is a mapping with sale_date,
+    payment_method, customer_type, total_amount, discount and tax.
+    """
+    deltas = defaultdict(lambda: [0, 0.0, 0.0, 0.0])
+    for sale in sales:
+        key = rollup_key(sale['sale_date'], sale.get('payment_method'), sale.get('customer_type'))
+        _add(deltas, key, 1, sale.get('total_amount'), sale.get('discount'), sale.get('tax'))
+    apply_deltas(connection, deltas)
+
+
+def rebuild_rollup(session=None):
+    """Recompute the whole rollup from the sale table.
+
+    Customer types are taken from the current customer records.
+    Returns the number of rollup rows written.
+    """
+    session = session or db.session
+    table = DailySalesRollup.__table__
+
+    day = bucket_expression(Sale.sale_date, 'day', session.get_bind().dialect.name)
+    payment_method = func.coalesce(Sale.payment_method, UNKNOWN_PAYMENT)
+    customer_type = case(
+        (Customer.id.is_(None), WALK_IN),
+        else_=func.coalesce(Customer.customer_type, 'retail')
+    )
+    source = (
+        select(day, payment_method, customer_type,
+               func.count(Sale.id),
+               func.coalesce(func.sum(Sale.total_amount), 0),
+               func.coalesce(func.sum(Sale.discount), 0),
+               func.coalesce(func.sum(Sale.tax), 0))
+        .outerjoin(Customer, Sale.customer_id == Customer.id)
+        .group_by(day, payment_method, customer_type)
+    )
+
+    session.execute(table.delete())
+    session.execute(
+        insert(table).from_select(
+            ['day', 'payment_method', 'customer_type'] + list(MEASURES), source
+        )
+    )
+    session.commit()
+    return session.query(func.count()).select_from(table).scalar()
+
+
+def revenue_between(start_day, end_day):
+    """Total revenue for start_day <= day < end_day"""
+    total = db.session.query(func.sum(DailySalesRollup.revenue)).filter(
+        *half_open(DailySalesRollup.day, start_day, end_day)
+    ).scalar()
+    return float(total or 0)
+
+
+def day_after(value):
+    """Exclusive upper bound for a range that includes the given day"""
+    return as_date(value) + timedelta(days=1)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_rollup_deltas(session, flush_context, instances):
+    deltas = collect_deltas(session)
+    if deltas:
+        session.info.setdefault('rollup_deltas', []).append(deltas)
+
+
+@event.listens_for(db.session, 'after_flush')
+def _apply_rollup_deltas(session, flush_context):
+    for deltas in session.info.pop('rollup_deltas', []):
+        apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_rollup_deltas(session):
+    session.info.pop('rollup_deltas', None)
@@ -1,10 +1,30 @@
-from flask import Blueprint, render_template, jsonify, request, flash, redirect, url_for
+from flask import Blueprint, Response, render_template, jsonify, request, flash, redirect, url_for, abort, current_app, stream_with_context
 from flask_login import login_required, current_user
+from sqlalchemy.orm import joinedload
 from app import db
-from app.models import Sale, Product, Customer, Expense
-from datetime import datetime, timedelta
-import pandas as pd
-import json
+from app.models import Sale, Customer, Expense, DailySalesRollup
+from app.rollup import day_after, revenue_between
+from app.cache import cached_json
+from app.dbmonitor import monitor_for
+from app.export import FORMATS, UnknownExport, export_statement, stream_export
+from app.importer import IMPORTERS, import_csv
+from app.invoices import INVOICE_FORMATS, cached_sale_detail, rendered_invoice, sale_invoice_digest
+from app.inventory import inventory_filters, inventory_summary, list_products, product_categories, product_to_dict
+from app.jobs import QueueFull, jobs_for, report_params
+from app.metrics import metrics_for
+from app.ledger import (InsufficientStock, adjustment_to_dict, list_adjustments, nearest_snapshot,
+                        record_movements, stock_as_of)
+from app.listings import list_customers, list_sales, parse_date, parse_int, sale_to_dict, sales_filters
+from app.pagination import clamp_page_size
+from app.pos import DuplicateInvoices, SaleRejected, record_pos_sales
+from app.profiler import profiler_for
+from app.restock import alert_to_dict, low_stock_products, mark_sent, pending_alerts
+from app.stats import dashboard_kpis, sales_summary
+from app.stream import broadcaster_for
+from app.timeseries import shift_months, time_series
+from werkzeug.utils import secure_filename
+from datetime import datetime
+import io
 
 main_bp = Blueprint('main', __name__)
 
@@ -19,15 +39,14 @@ def index():
 def dashboard():
     """Main dashboard page"""
     # Get recent sales
-    recent_sales = Sale.query.order_by(Sale.sale_date.desc()).limit(10).all()
+    recent_sales = Sale.query.options(joinedload(Sale.customer)).order_by(Sale.sale_date.desc()).limit(10).all()
     
     # Get low stock products
-    low_stock = Product.query.filter(Product.stock_quantity < Product.min_stock).all()
+    low_stock = low_stock_products()
     
     # Calculate today's sales
     today = datetime.now().date()
-    today_sales = Sale.query.filter(db.func.date(Sale.sale_date) == today).all()
-    today_total = sum(sale.total_amount for sale in today_sales)
+    today_total = revenue_between(today, day_after(today))
     
     # Get monthly sales for chart
     monthly_data = get_monthly_sales_data()
@@ -42,32 +61,61 @@ def dashboard():
 @login_required
 def sales():
     """Sales page"""
-    sales_list = Sale.query.order_by(Sale.sale_date.desc()).all()
-    return render_template('sales.html', sales=sales_list)
+    try:
+        filters = sales_filters(request.args)
+        page = list_sales(filters, request.args.get('cursor'),
+                          clamp_page_size(request.args.get('per_page')))
+    except ValueError:
+        abort(400)
+    
+    # Only id and name are needed for the filter dropdown
+    customers_list = db.session.query(Customer.id, Customer.name).order_by(Customer.name).all()
+    
+    return render_template('sales.html',
+                           sales=page.sales,
+                           item_counts=page.item_counts,
+                           next_cursor=page.next_cursor,
+                           filters=filters,
+                           customers=customers_list,
+                           **sales_summary())
 
 @main_bp.route('/inventory')
 @login_required
 def inventory():
-    """Inventory management page"""
-    products = Product.query.order_by(Product.name).all()
-
-    # Summary values for the inventory dashboard
-    total_stock_value = sum((p.stock_quantity or 0) * (p.cost or 0) for p in products)
-    low_stock_count = sum(1 for p in products if (p.stock_quantity or 0) < (p.min_stock or 0))
-    out_of_stock_count = sum(1 for p in products if (p.stock_quantity or 0) == 0)
-
+    """Inventory management page; the product table is loaded from /api/inventory"""
+    summary = inventory_summary()
     return render_template('inventory.html',
-                           products=products,
-                           total_stock_value=total_stock_value,
-                           low_stock_count=low_stock_count,
-                           out_of_stock_count=out_of_stock_count)
+                           categories=product_categories(),
+                           total_products=summary.total_products,
+                           total_stock_value=summary.total_stock_value,
+                           low_stock_count=summary.low_stock_count,
+                           out_of_stock_count=summary.out_of_stock_count)
 
 @main_bp.route('/customers')
 @login_required
 def customers():
     """Customers page"""
-    customers_list = Customer.query.order_by(Customer.name).all()
-    return render_template('customers.html', customers=customers_list)
+    sort = request.args.get('sort', 'name')
+    order = request.args.get('order', 'asc')
+    try:
+        page = list_customers(sort, order == 'desc',
+                              int(request.args.get('page', 1)),
+                              clamp_page_size(request.args.get('per_page')))
+    except ValueError:
+        abort(400)
+    
+    month_start = datetime.combine(datetime.now().date().replace(day=1), datetime.min.time())
+    new_this_month = Customer.query.filter(Customer.created_at >= month_start).count()
+    
+    return render_template('customers.html',
+                           customers=page.customers,
+                           customer_stats=page.stats,
+                           page=page.page,
+                           per_page=page.per_page,
+                           total_customers=page.total,
+                           sort=sort,
+                           order=order,
+                           new_this_month=new_this_month)
 
 @main_bp.route('/reports')
 @login_required
@@ -75,80 +123,293 @@ def reports():
     """Reports page"""
     return render_template('reports.html')
 
+@main_bp.route('/export/<dataset>.<fmt>')
+@login_required
+def export(dataset, fmt):
+    """Stream a dataset as CSV or NDJSON, honouring the listing filters"""
+    try:
+        stmt = export_statement(dataset, request.args)
+        if fmt not in FORMATS:
+            raise UnknownExport(fmt)
+    except UnknownExport:
+        abort(404)
+    except ValueError:
+        abort(400)
+    
+    filename = f"{dataset}-{datetime.now():%Y%m%d}.{fmt}"
+    return Response(stream_with_context(stream_export(stmt, fmt)), mimetype=FORMATS[fmt], headers={
+        'Content-Disposition': f'attachment; filename="{filename}"',
+        'X-Accel-Buffering': 'no'
+    })
+
 @main_bp.route('/api/sales-data')
 @login_required
+@cached_json('sales')
 def sales_data():
     """API endpoint for sales chart data"""
     data = get_monthly_sales_data()
     return jsonify(data)
 
+@main_bp.route('/api/sales')
+@login_required
+@cached_json('sales', 'customers')
+def sales_api():
+    """API endpoint for cursor-paginated sales"""
+    try:
+        page = list_sales(sales_filters(request.args), request.args.get('cursor'),
+                          clamp_page_size(request.args.get('per_page')))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    return jsonify({
+        'sales': [sale_to_dict(sale, page.item_counts.get(sale.id, 0)) for sale in page.sales],
+        'next_cursor': page.next_cursor
+    })
+
+@main_bp.route('/api/sales', methods=['POST'])
+@login_required
+def create_sales():
+    """Record one sale, or a batch under "sales", decrementing stock atomically"""
+    data = request.get_json(silent=True)
+    payloads = data.get('sales') if isinstance(data, dict) and 'sales' in data else [data]
+    try:
+        created, duplicates = record_pos_sales(payloads, user_id=current_user.id)
+    except InsufficientStock as exc:
+        return jsonify({'error': str(exc), 'product_ids': exc.product_ids}), 409
+    except DuplicateInvoices as exc:
+        return jsonify({'error': str(exc), 'invoice_numbers': exc.invoice_numbers}), 409
+    except SaleRejected as exc:
+        return jsonify({'error': str(exc), 'index': exc.index}), 400
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({'created': created, 'duplicates': duplicates}), 201 if created else 200
+
+@main_bp.route('/api/sale/<int:sale_id>')
+@login_required
+def sale_detail_api(sale_id):
+    """API endpoint for one sale with its customer and items"""
+    detail = cached_sale_detail(sale_id)
+    if detail is None:
+        return jsonify({'error': 'Sale not found'}), 404
+    return jsonify(detail)
+
+@main_bp.route('/invoice/<int:sale_id>/print', defaults={'fmt': 'html'})
+@main_bp.route('/invoice/<int:sale_id>.pdf', defaults={'fmt': 'pdf'})
+@login_required
+def print_invoice(sale_id, fmt):
+    """Printable invoice (HTML or PDF), rendered once per sale content"""
+    digest = sale_invoice_digest(sale_id, fmt)
+    if digest is None:
+        abort(404)
+    if request.if_none_match.contains(digest):
+        response = current_app.response_class(status=304)
+    else:
+        detail = cached_sale_detail(sale_id)
+        response = current_app.response_class(rendered_invoice(detail, fmt, digest),
+                                              mimetype=INVOICE_FORMATS[fmt])
+        if fmt == 'pdf':
+            filename = secure_filename(f'{detail["invoice_number"]}.pdf') or f'invoice-{sale_id}.pdf'
+            response.headers['Content-Disposition'] = f'inline; filename="{filename}"'
+    response.set_etag(digest)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+@main_bp.route('/api/inventory')
+@login_required
+@cached_json('products')
+def inventory_api():
+    """API endpoint for the filtered, sorted and paginated product table"""
+    try:
+        page = list_products(inventory_filters(request.args),
+                             request.args.get('sort', 'name'),
+                             request.args.get('order') == 'desc',
+                             int(request.args.get('page', 1)),
+                             clamp_page_size(request.args.get('per_page')))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    
+    return jsonify({
+        'products': [product_to_dict(product) for product in page.products],
+        'page': page.page,
+        'per_page': page.per_page,
+        'total': page.total
+    })
+
+@main_bp.route('/api/reports', methods=['POST'])
+@login_required
+def submit_report():
+    """Queue a report job; cached results come back finished"""
+    data = request.get_json(silent=True) or request.form
+    report_type = data.get('type', 'sales')
+    try:
+        job = jobs_for(current_app).submit(report_type, report_params(report_type, data))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except QueueFull as exc:
+        return jsonify({'error': str(exc)}), 503, {'Retry-After': '5'}
+    
+    body = job.to_dict()
+    body['url'] = url_for('main.report_status', job_id=job.id)
+    return jsonify(body), 200 if job.done else 202
+
+@main_bp.route('/api/reports/<job_id>')
+@login_required
+def report_status(job_id):
+    """Status, and once finished the result, of a report job"""
+    job = jobs_for(current_app).get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown report job'}), 404
+    return jsonify(job.to_dict())
+
+@main_bp.route('/api/import/<dataset>', methods=['POST'])
+@login_required
+def import_data(dataset):
+    """Bulk import an uploaded CSV file of customers, products or sales"""
+    if not current_user.is_manager():
+        abort(403)
+    if dataset not in IMPORTERS:
+        abort(404)
+    upload = request.files.get('file')
+    if upload is None or not upload.filename:
+        return jsonify({'error': 'No file uploaded'}), 400
+    
+    # Read the upload in place: the upload folder is under the public static folder
+    try:
+        report = import_csv(dataset, io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline=''))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify(report.to_dict())
+
 @main_bp.route('/api/dashboard-stats')
 @login_required
+@cached_json('sales', 'products', 'customers')
 def dashboard_stats():
     """API endpoint for dashboard statistics"""
-    # Today's date
-    today = datetime.now().date()
+    return jsonify(dashboard_kpis())
+
+@main_bp.route('/api/stock/adjustments')
+@login_required
+@cached_json('products')
+def stock_adjustments():
+    """Cursor-paginated stock ledger, newest first"""
+    try:
+        page = list_adjustments(parse_int(request.args.get('product_id')), request.args.get('cursor'),
+                                clamp_page_size(request.args.get('per_page')))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     
-    # Calculate statistics
-    today_sales = Sale.query.filter(db.func.date(Sale.sale_date) == today).all()
-    today_total = sum(sale.total_amount for sale in today_sales)
-    
-    # Yesterday
-    yesterday = today - timedelta(days=1)
-    yesterday_sales = Sale.query.filter(db.func.date(Sale.sale_date) == yesterday).all()
-    yesterday_total = sum(sale.total_amount for sale in yesterday_sales)
-    
-    # This month
-    month_start = today.replace(day=1)
-    month_sales = Sale.query.filter(Sale.sale_date >= month_start).all()
-    month_total = sum(sale.total_amount for sale in month_sales)
-    
-    # Low stock count
-    low_stock_count = Product.query.filter(Product.stock_quantity < Product.min_stock).count()
-    
-    # Total customers
-    total_customers = Customer.query.count()
-    
-    stats = {
-        'today_sales': today_total,
-        'yesterday_sales': yesterday_total,
-        'month_sales': month_total,
-        'low_stock_count': low_stock_count,
-        'total_customers': total_customers,
-        'sales_change': calculate_percentage_change(today_total, yesterday_total)
-    }
+    return jsonify({
+        'adjustments': [adjustment_to_dict(adjustment) for adjustment in page.adjustments],
+        'next_cursor': page.next_cursor
+    })
+
+@main_bp.route('/api/stock/adjustments', methods=['POST'])
+@login_required
+def record_stock_adjustments():
+    """Record a batch of stock movements in one transaction"""
+    if not current_user.is_manager():
+        abort(403)
+    movements = (request.get_json(silent=True) or {}).get('movements')
+    if not isinstance(movements, list):
+        return jsonify({'error': 'movements must be a list'}), 400
+    try:
+        recorded = record_movements(movements, user_id=current_user.id)
+    except InsufficientStock as exc:
+        return jsonify({'error': str(exc), 'product_ids': exc.product_ids}), 409
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    return jsonify({'recorded': recorded}), 201
+
+@main_bp.route('/api/stock/as-of')
+@login_required
+@cached_json('products')
+def stock_on_hand_as_of():
+    """Stock on hand per product at ?at=<ISO datetime> or at the end of ?date=YYYY-MM-DD"""
+    try:
+        if request.args.get('at'):
+            when = datetime.fromisoformat(request.args['at'])
+        else:
+            when = datetime.combine(day_after(parse_date(request.args.get('date')) or datetime.now().date()),
+                                    datetime.min.time())
+        product_id = parse_int(request.args.get('product_id'))
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
     
-    return jsonify(stats)
+    snapshot = nearest_snapshot(when)
+    stock = stock_as_of(when, None if product_id is None else [product_id])
+    return jsonify({
+        'as_of': when.isoformat(),
+        'snapshot': snapshot.isoformat() if snapshot else None,
+        'stock': {str(product_id): quantity for product_id, quantity in stock.items()}
+    })
+
+@main_bp.route('/api/restock-alerts')
+@login_required
+def restock_alerts():
+    """Undelivered restock alerts, oldest first"""
+    limit = clamp_page_size(request.args.get('limit'))
+    return jsonify({'alerts': [alert_to_dict(alert) for alert in pending_alerts(limit)]})
+
+@main_bp.route('/api/restock-alerts/ack', methods=['POST'])
+@login_required
+def ack_restock_alerts():
+    """Mark restock alerts as handled"""
+    if not current_user.is_manager():
+        abort(403)
+    ids = (request.get_json(silent=True) or {}).get('ids')
+    if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+        return jsonify({'error': 'ids must be a list of alert ids'}), 400
+    return jsonify({'acknowledged': mark_sent(ids)})
+
+@main_bp.route('/api/db-stats')
+@login_required
+def db_stats():
+    """Connection pool usage, checkout wait and query timings"""
+    if not current_user.is_admin():
+        abort(403)
+    return jsonify(monitor_for(current_app).snapshot())
+
+@main_bp.route('/metrics')
+def metrics():
+    """Prometheus metrics for this process"""
+    registry = metrics_for(current_app)
+    if not registry.enabled:
+        abort(404)
+    if registry.token and request.headers.get('Authorization') != f'Bearer {registry.token}':
+        abort(401)
+    return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+@main_bp.route('/debug/perf')
+@login_required
+def debug_perf():
+    """Recent slow or N+1 requests recorded by the profiler"""
+    if not current_user.is_admin():
+        abort(403)
+    profiler = profiler_for(current_app)
+    if request.args.get('format') == 'json':
+        return jsonify({'enabled': profiler.enabled, 'requests': profiler.entries()})
+    return render_template('debug_perf.html', profiler=profiler, entries=profiler.entries())
+
+@main_bp.route('/api/stream/dashboard')
+@login_required
+def dashboard_stream():
+    """Server-Sent Events stream of dashboard statistics"""
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    events = broadcaster_for(current_app).events(last_event_id)
+    return Response(events, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
 
 def get_monthly_sales_data():
     """Get sales data for the last 6 months"""
-    end_date = datetime.now()
-    start_date = end_date - timedelta(days=180)  # 6 months
-    
-    # Query sales grouped by month
-    sales_by_month = db.session.query(
-        db.func.date_format(Sale.sale_date, '%Y-%m').label('month'),
-        db.func.sum(Sale.total_amount).label('total')
-    ).filter(
-        Sale.sale_date >= start_date,
-        Sale.sale_date <= end_date
-    ).group_by('month').order_by('month').all()
-    
-    # Format data for chart
-    months = []
-    totals = []
-    
-    for row in sales_by_month:
-        months.append(row.month)
-        totals.append(float(row.total) if row.total else 0)
+    today = datetime.now().date()
+    start_month = shift_months(today, -5)
+    
+    series = time_series({'total': db.func.sum(DailySalesRollup.revenue)},
+                         DailySalesRollup.day, start_month, day_after(today), 'month')
     
     return {
-        'months': months,
-        'totals': totals
+        'months': [point['bucket'].strftime('%Y-%m') for point in series],
+        'totals': [point['total'] for point in series]
     }
-
-def calculate_percentage_change(current, previous):
-    """Calculate percentage change"""
-    if previous == 0:
-        return 100 if current > 0 else 0
-    return round(((current - previous) / previous) * 100, 2)
\ No newline at end of file
@@ -0,0 +1,305 @@
+"""
+Deterministic bulk sample-data generator.
+
+Sales are laid out day by day from seasonal weights (weekday, month and a
+gentle growth trend), then generated in fixed blocks of days. Each block
+draws from its own RNG stream seeded with (seed, block index) and is
+written with plain executemany batches, so the output depends only on the
+seed and the options - never on how many worker processes wrote it.
+
+Workers split the blocks between processes with their own engine. They
+pay off on a server database; SQLite serialises writers.
+"""
+
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, time, timedelta
+from functools import partial
+
+import numpy as np
+from sqlalchemy import create_engine, func, select
+
+from app.models import Customer, Expense, Product, Sale, SaleItem
+
+# name, description, category, price, cost, relative popularity
+CATALOG = [
+    ('Laptop Dell', '15-inch laptop', 'Electronics', 850000, 650000, 2),
+    ('Wireless Mouse', 'Bluetooth mouse', 'Electronics', 15000, 8000, 30),
+    ('Keyboard', 'Mechanical keyboard', 'Electronics', 45000, 25000, 12),
+    ('Monitor 24-inch', 'Full HD monitor', 'Electronics', 180000, 120000, 4),
+    ('USB Flash Drive 64GB', 'USB 3.0 flash drive', 'Electronics', 12000, 7000, 25),
+    ('Printer Ink', 'Black ink cartridge', 'Electronics', 28000, 17000, 10),
+    ('Office Chair', 'Ergonomic chair', 'Furniture', 85000, 50000, 3),
+    ('Office Desk', 'Two-drawer desk', 'Furniture', 150000, 95000, 1),
+    ('Desk Lamp', 'LED lamp', 'Home', 12000, 6000, 9),
+    ('Extension Cable', '4-way surge protected', 'Home', 9000, 5000, 14),
+    ('Notebook', 'Premium notebook', 'Stationery', 8000, 3500, 45),
+    ('Pen Set', 'Executive pen set', 'Stationery', 15000, 7000, 20),
+    ('Printing Paper', 'A4 ream, 500 sheets', 'Stationery', 7500, 5200, 35),
+    ('Stapler', 'Heavy duty stapler', 'Stationery', 6500, 3000, 8),
+]
+
+FIRST_NAMES = ['John', 'Mary', 'Robert', 'Linda', 'Michael', 'Sarah', 'David', 'Karen', 'James',
+               'Jennifer', 'Chikondi', 'Thoko', 'Kondwani', 'Tamanda', 'Mphatso', 'Chisomo']
+LAST_NAMES = ['Smith', 'Johnson', 'Banda', 'Phiri', 'Mwale', 'Chirwa', 'Moore', 'Taylor',
+              'Kachingwe', 'Nyirenda', 'Gondwe', 'Thomas']
+
+PAYMENT_METHODS = ['cash', 'card', 'mobile_money', 'bank_transfer']
+PAYMENT_WEIGHTS = [0.42, 0.18, 0.32, 0.08]
+CUSTOMER_TYPES = ['retail', 'wholesale', 'business']
+CUSTOMER_TYPE_WEIGHTS = [0.75, 0.15, 0.10]
+WALK_IN_SHARE = 0.25
+
+# Seasonality: Monday..Sunday, January..December, and opening hours 8..19
+WEEKDAY_WEIGHTS = [0.95, 0.9, 1.0, 1.0, 1.15, 1.4, 0.6]
+MONTH_WEIGHTS = [0.8, 0.85, 0.95, 1.0, 1.0, 0.95, 0.95, 1.0, 1.05, 1.05, 1.15, 1.5]
+HOUR_WEIGHTS = [2, 5, 8, 9, 10, 9, 7, 8, 9, 8, 6, 3]
+GROWTH_PER_YEAR = 0.15
+
+TAX_RATE = 0.165
+BLOCK_DAYS = 7
+
+EXPENSES = [('Rent', 350000), ('Salaries', 1200000), ('Utilities', 85000), ('Internet', 45000)]
+OCCASIONAL_EXPENSES = ['Marketing', 'Supplies', 'Transport', 'Repairs']
+
+Block = namedtuple('Block', ['index', 'first_day', 'day_counts', 'first_sale_id'])
+
+
+def day_weights(first_day, days):
+    """Relative sales volume for each day of the period"""
+    offsets = np.arange(days)
+    dates = [first_day + timedelta(days=int(i)) for i in offsets]
+    weekday = np.array([WEEKDAY_WEIGHTS[d.weekday()] for d in dates])
+    month = np.array([MONTH_WEIGHTS[d.month - 1] for d in dates])
+    trend = 1 + GROWTH_PER_YEAR * offsets / 365.0
+    return weekday * month * trend
+
+
+def allocate(total, weights):
+    """Split total into integers proportional to weights (largest remainder)"""
+    share = total * weights / weights.sum()
+    counts = np.floor(share).astype(np.int64)
+    remainder = total - counts.sum()
+    if remainder:
+        # Stable sort keeps ties in day order, so the split is deterministic
+        counts[np.argsort(-(share - counts), kind='stable')[:remainder]] += 1
+    return counts
+
+
+def plan_blocks(sales, first_day, days, first_sale_id=1, block_days=BLOCK_DAYS):
+    """Lay the period's sales out in blocks of block_days days"""
+    counts = allocate(sales, day_weights(first_day, days))
+    blocks, sale_id = [], first_sale_id
+    for index, start in enumerate(range(0, days, block_days)):
+        block_counts = counts[start:start + block_days]
+        blocks.append(Block(index, first_day + timedelta(days=start), block_counts.tolist(), sale_id))
+        sale_id += int(block_counts.sum())
+    return blocks
+
+
+def _customer_rows(rng, count, first_id, first_day):
+    types = rng.choice(len(CUSTOMER_TYPES), size=count, p=CUSTOMER_TYPE_WEIGHTS)
+    created = datetime.combine(first_day, time(9)) - timedelta(days=30)
+    rows = []
+    for offset in range(count):
+        customer_id = first_id + offset
+        name = (f'{FIRST_NAMES[customer_id % len(FIRST_NAMES)]} '
+                f'{LAST_NAMES[(customer_id // len(FIRST_NAMES)) % len(LAST_NAMES)]} {customer_id}')
+        rows.append((customer_id, name, f'customer{customer_id}@example.com',
+                     f'+265 {880 + customer_id % 120} {100000 + customer_id % 900000}',
+                     f'Address {customer_id % 100 + 1}, City',
+                     CUSTOMER_TYPES[types[offset]], created))
+    return rows
+
+
+def _product_rows(rng, count, first_id, now):
+    rows = []
+    for offset in range(count):
+        name, description, category, price, cost, _ = CATALOG[offset % len(CATALOG)]
+        variant = offset // len(CATALOG)
+        if variant:
+            # Extra products are priced variants of the catalogue lines
+            factor = float(rng.uniform(0.8, 1.3))
+            name, price, cost = f'{name} #{variant + 1}', round(price * factor, -2), round(cost * factor, -2)
+        min_stock = int(rng.integers(5, 30))
+        rows.append((first_id + offset, name, description, category, price, cost,
+                     int(rng.integers(0, min_stock * 4)), min_stock, now, now))
+    return rows
+
+
+def _expense_rows(rng, first_day, days):
+    rows, day, end = [], first_day.replace(day=1), first_day + timedelta(days=days)
+    while day < end:
+        for category, amount in EXPENSES:
+            rows.append((category, f'{category} {day:%B %Y}', float(amount), max(day, first_day), 'bank_transfer'))
+        for category in rng.choice(OCCASIONAL_EXPENSES, size=int(rng.integers(1, 5))):
+            spent = first_day + timedelta(days=int(rng.integers(0, days)))
+            rows.append((str(category), f'{category} expense', float(rng.integers(10, 300) * 1000), spent,
+                         str(rng.choice(['cash', 'bank_transfer', 'card']))))
+        day = (day + timedelta(days=32)).replace(day=1)
+    return [row for row in rows if row[3] < end]
+
+
+def block_rows(block, seed, customers, products, max_items=5):
+    """Generate one block's (sale rows, item rows) as tuples.
+
+    customers is an array of (id, is_wholesale) pairs and products an array
+    of (id, price, popularity) triples.
+    """
+    rng = np.random.default_rng([seed, block.index])
+    counts = np.array(block.day_counts)
+    n = int(counts.sum())
+    if n == 0:
+        return [], []
+
+    hours = np.array(HOUR_WEIGHTS, dtype=float)
+    day_offsets = np.repeat(np.arange(len(counts)), counts)
+    seconds = (8 + rng.choice(len(hours), size=n, p=hours / hours.sum())) * 3600 + rng.integers(0, 3600, n)
+    start = datetime.combine(block.first_day, time.min)
+    # Sales within a day in time order, so ids follow sale_date
+    order = np.lexsort((seconds, day_offsets))
+    seconds, day_offsets = seconds[order], day_offsets[order]
+
+    if len(customers):
+        walk_in = rng.random(n) < WALK_IN_SHARE
+        # Repeat business follows a long tail: the first customers buy most
+        customer_index = np.minimum(rng.zipf(1.3, n) - 1, len(customers) - 1)
+        wholesale = ~walk_in & customers[customer_index, 1].astype(bool)
+    else:
+        walk_in = np.ones(n, dtype=bool)
+        customer_index = np.zeros(n, dtype=np.int64)
+        wholesale = np.zeros(n, dtype=bool)
+    payment = rng.choice(len(PAYMENT_METHODS), size=n, p=PAYMENT_WEIGHTS)
+
+    item_counts = 1 + rng.binomial(max_items - 1, 0.3, n)
+    item_sale = np.repeat(np.arange(n), item_counts)
+    popularity = products[:, 2] / products[:, 2].sum()
+    product_index = rng.choice(len(products), size=item_sale.size, p=popularity)
+    quantity = 1 + rng.poisson(0.5, item_sale.size)
+    quantity = np.where(wholesale[item_sale], quantity * rng.integers(3, 10, item_sale.size), quantity)
+    unit_price = products[product_index, 1]
+    subtotal = quantity * unit_price
+
+    gross = np.bincount(item_sale, weights=subtotal, minlength=n)
+    discount = np.where(rng.random(n) < 0.15, np.round(gross * rng.choice([0.05, 0.1], n), -2), 0.0)
+    tax = np.round((gross - discount) * TAX_RATE, 2)
+    total = gross - discount + tax
+
+    sale_ids = block.first_sale_id + np.arange(n)
+    sale_rows = []
+    for i, sale_id in enumerate(sale_ids.tolist()):
+        sale_date = start + timedelta(days=int(day_offsets[i]), seconds=int(seconds[i]))
+        sale_rows.append((
+            sale_id, f'S{sale_date:%Y%m%d}-{sale_id:09d}',
+            None if walk_in[i] else int(customers[customer_index[i], 0]),
+            sale_date, float(total[i]), float(discount[i]), float(tax[i]), PAYMENT_METHODS[payment[i]]
+        ))
+
+    item_rows = list(zip(
+        (sale_ids[item_sale]).tolist(), products[product_index, 0].astype(np.int64).tolist(),
+        quantity.tolist(), unit_price.tolist(), subtotal.tolist()
+    ))
+    return sale_rows, item_rows
+
+
+SALE_COLUMNS = ['id', 'invoice_number', 'customer_id', 'sale_date', 'total_amount', 'discount', 'tax',
+                'payment_method']
+ITEM_COLUMNS = ['sale_id', 'product_id', 'quantity', 'unit_price', 'subtotal']
+CUSTOMER_COLUMNS = ['id', 'name', 'email', 'phone', 'address', 'customer_type', 'created_at']
+PRODUCT_COLUMNS = ['id', 'name', 'description', 'category', 'price', 'cost', 'stock_quantity', 'min_stock',
+                   'created_at', 'updated_at']
+EXPENSE_COLUMNS = ['category', 'description', 'amount', 'expense_date', 'payment_method']
+
+
+def insert_rows(connection, table, columns, rows, batch_size=10000):
+    """executemany plain INSERTs of row tuples, batch_size rows at a time"""
+    if not rows:
+        return
+    dialect = connection.dialect
+    placeholder = '?' if dialect.paramstyle == 'qmark' else '%s'
+    quote = dialect.identifier_preparer.quote
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(table.name), ', '.join(quote(c) for c in columns), ', '.join([placeholder] * len(columns)))
+    processors = [table.c[c].type.bind_processor(dialect) for c in columns]
+    if any(processors):
+        rows = [tuple(p(v) if p else v for p, v in zip(processors, row)) for row in rows]
+    for start in range(0, len(rows), batch_size):
+        connection.exec_driver_sql(sql, rows[start:start + batch_size])
+
+
+def write_block(engine, block, seed, customers, products, max_items, batch_size):
+    """Generate and write one block in its own transaction"""
+    sale_rows, item_rows = block_rows(block, seed, customers, products, max_items)
+    with engine.begin() as connection:
+        insert_rows(connection, Sale.__table__, SALE_COLUMNS, sale_rows, batch_size)
+        insert_rows(connection, SaleItem.__table__, ITEM_COLUMNS, item_rows, batch_size)
+    return len(sale_rows), len(item_rows)
+
+
+_worker_engines = {}
+
+
+def _write_block_in_worker(url, args, block):
+    engine = _worker_engines.get(url)
+    if engine is None:
+        engine = _worker_engines[url] = create_engine(url, connect_args=(
+            {'timeout': 60} if url.startswith('sqlite') else {}))
+    return write_block(engine, block, *args)
+
+
+def _next_id(connection, column):
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+
+def generate(engine, sales=50, customers=10, products=8, days=30, seed=42, end=None,
+             workers=1, batch_size=10000, max_items=5, progress=None):
+    """Append customers, products, expenses and `sales` sales ending at `end`.
+
+    Returns a dict of row counts. Rollups and caches are not touched; see
+    the generate-sample-data command.
+    """
+    end = end or date.today()
+    first_day = end - timedelta(days=days - 1)
+    rng = np.random.default_rng([seed, 2 ** 31])
+    now = datetime.now()
+
+    with engine.begin() as connection:
+        first_customer = _next_id(connection, Customer.id)
+        first_product = _next_id(connection, Product.id)
+        first_sale = _next_id(connection, Sale.id)
+
+        customer_rows = _customer_rows(rng, customers, first_customer, first_day)
+        product_rows = _product_rows(rng, products, first_product, now)
+        expense_rows = _expense_rows(rng, first_day, days)
+        insert_rows(connection, Customer.__table__, CUSTOMER_COLUMNS, customer_rows, batch_size)
+        insert_rows(connection, Product.__table__, PRODUCT_COLUMNS, product_rows, batch_size)
+        insert_rows(connection, Expense.__table__, EXPENSE_COLUMNS, expense_rows, batch_size)
+
+    customer_table = np.array([(row[0], row[5] == 'wholesale') for row in customer_rows],
+                              dtype=np.int64).reshape(-1, 2)
+    product_table = np.array([(row[0], row[4], CATALOG[i % len(CATALOG)][5])
+                              for i, row in enumerate(product_rows)], dtype=np.float64)
+
+    blocks = plan_blocks(sales, first_day, days, first_sale)
+    args = (seed, customer_table, product_table, max_items, batch_size)
+    written = {'customers': len(customer_rows), 'products': len(product_rows),
+               'expenses': len(expense_rows), 'sales': 0, 'items': 0}
+
+    in_memory = engine.url.get_backend_name() == 'sqlite' and engine.url.database in (None, '', ':memory:')
+    if workers > 1 and not in_memory:
+        url = engine.url.render_as_string(hide_password=False)
+        with ProcessPoolExecutor(workers) as pool:
+            results = pool.map(partial(_write_block_in_worker, url, args), blocks)
+            for block, (sale_count, item_count) in zip(blocks, results):
+                written['sales'] += sale_count
+                written['items'] += item_count
+                if progress:
+                    progress(block, written)
+    else:
+        for block in blocks:
+            sale_count, item_count = write_block(engine, block, *args)
+            written['sales'] += sale_count
+            written['items'] += item_count
+            if progress:
+                progress(block, written)
+    return written
@@ -0,0 +1,92 @@
+"""
+Invoice number allocation.
+
+Invoice numbers look like INV-20240301-000042: a per-day counter kept in
+the sequence_counter table (one row per day). Instead of a round trip per
+invoice, each process leases a block of INVOICE_BLOCK_SIZE numbers with
+one short UPDATE of that row in its own transaction, then hands them out
+from memory under a thread lock. Leases from different processes never
+overlap, so numbers are unique without retries on the unique constraint.
+
+Numbers are increasing within a process but not across processes, and
+numbers left in a block when a process stops or the day ends are never
+used, so there are gaps. Past 999,999 invoices in a day the counter
+simply grows a seventh digit. Sale.invoice_number holds 20 characters, so
+the prefix is limited to MAX_PREFIX_LENGTH to leave room for that digit.
+"""
+
+import threading
+from datetime import datetime
+
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models import SequenceCounter
+
+LEASE_ATTEMPTS = 3
+
+# 20 characters less "-YYYYMMDD-" and a seven-digit counter
+MAX_PREFIX_LENGTH = 3
+
+
+class InvoiceSequence:
+    """Hands out invoice numbers from per-process leased blocks"""
+
+    def __init__(self, app):
+        self.prefix = app.config.get('INVOICE_PREFIX', 'INV')
+        if not 1 <= len(self.prefix) <= MAX_PREFIX_LENGTH:
+            raise ValueError(f'INVOICE_PREFIX must be 1 to {MAX_PREFIX_LENGTH} characters, got {self.prefix!r}')
+        self.block_size = max(1, app.config.get('INVOICE_BLOCK_SIZE', 100))
+        self.leases = 0
+        self._lock = threading.Lock()
+        self._day = None
+        self._next = self._end = 0
+
+    def _lease(self, name, size):
+        """Reserve [start, start + size) of a counter; returns start"""
+        table = SequenceCounter.__table__
+        for _ in range(LEASE_ATTEMPTS):
+            with db.engine.begin() as connection:
+                result = connection.execute(
+                    update(table).where(table.c.name == name).values(next_value=table.c.next_value + size))
+                if result.rowcount:
+                    end = connection.execute(select(table.c.next_value).where(table.c.name == name)).scalar()
+                    return end - size
+            try:
+                with db.engine.begin() as connection:
+                    connection.execute(insert(table).values(name=name, next_value=1 + size))
+                return 1
+            except IntegrityError:
+                continue  # another process created the day's row first
+        raise RuntimeError(f'Could not lease numbers from sequence {name!r}')
+
+    def allocate(self, count=1, day=None):
+        """Return `count` new invoice numbers for `day` (default today)"""
+        day = day or datetime.now().date()
+        stamp = day.strftime('%Y%m%d')
+        numbers = []
+        with self._lock:
+            if day != self._day:
+                self._day, self._next, self._end = day, 0, 0
+            while len(numbers) < count:
+                if self._next >= self._end:
+                    # One lease covers the rest of a large request
+                    size = max(self.block_size, count - len(numbers))
+                    self._next = self._lease(f'invoice:{stamp}', size)
+                    self._end = self._next + size
+                    self.leases += 1
+                take = min(count - len(numbers), self._end - self._next)
+                numbers.extend(f'{self.prefix}-{stamp}-{n:06d}' for n in range(self._next, self._next + take))
+                self._next += take
+        return numbers
+
+
+def init_app(app):
+    """Attach the invoice number sequence to the application"""
+    app.extensions['invoice_sequence'] = InvoiceSequence(app)
+
+
+def sequence_for(app):
+    """Return the invoice number sequence attached to an application"""
+    return app.extensions['invoice_sequence']
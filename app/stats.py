@@ -0,0 +1,99 @@
+"""
+Dashboard KPI service.
+
+All dashboard figures come from one SELECT: conditional SUM/COUNT over the
+daily sales rollup restricted to a half-open day range, plus scalar
+subqueries for the product and customer counts.
+"""
+
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, case, func, select
+
+from app import db
+from app.models import Customer, DailySalesRollup, Product
+from app.restock import IS_LOW_STOCK
+
+
+def calculate_percentage_change(current, previous):
+    """Calculate percentage change"""
+    if previous == 0:
+        return 100 if current > 0 else 0
+    return round(((current - previous) / previous) * 100, 2)
+
+
+def _between(column, start, end):
+    """Half-open range predicate start <= column < end"""
+    return and_(column >= start, column < end)
+
+
+def _conditional_sum(condition, column):
+    return func.coalesce(func.sum(case((condition, column), else_=0)), 0)
+
+
+def kpi_query(today):
+    """Build the single statement that returns every dashboard KPI"""
+    tomorrow = today + timedelta(days=1)
+    yesterday = today - timedelta(days=1)
+    month_start = today.replace(day=1)
+    range_start = min(yesterday, month_start)
+
+    day = DailySalesRollup.day
+    revenue = DailySalesRollup.revenue
+
+    low_stock = (
+        select(func.count(Product.id))
+        .where(IS_LOW_STOCK)
+        .scalar_subquery()
+    )
+    customers = select(func.count(Customer.id)).scalar_subquery()
+
+    return select(
+        _conditional_sum(_between(day, today, tomorrow), revenue).label('today_sales'),
+        _conditional_sum(_between(day, yesterday, today), revenue).label('yesterday_sales'),
+        _conditional_sum(_between(day, month_start, tomorrow), revenue).label('month_sales'),
+        low_stock.label('low_stock_count'),
+        customers.label('total_customers'),
+    ).select_from(DailySalesRollup).where(_between(day, range_start, tomorrow))
+
+
+def dashboard_kpis(today=None):
+    """Return the dashboard statistics payload in one database round trip"""
+    today = today or datetime.now().date()
+    row = db.session.execute(kpi_query(today)).one()
+
+    today_total = float(row.today_sales)
+    yesterday_total = float(row.yesterday_sales)
+
+    return {
+        'today_sales': today_total,
+        'yesterday_sales': yesterday_total,
+        'month_sales': float(row.month_sales),
+        'low_stock_count': int(row.low_stock_count or 0),
+        'total_customers': int(row.total_customers or 0),
+        'sales_change': calculate_percentage_change(today_total, yesterday_total)
+    }
+
+
+def sales_summary(today=None):
+    """All-time and today's totals for the sales page, from the rollup"""
+    today = today or datetime.now().date()
+    day = DailySalesRollup.day
+
+    row = db.session.execute(select(
+        func.coalesce(func.sum(DailySalesRollup.revenue), 0).label('total_sales'),
+        func.coalesce(func.sum(DailySalesRollup.sale_count), 0).label('total_transactions'),
+        _conditional_sum(_between(day, today, today + timedelta(days=1)),
+                         DailySalesRollup.revenue).label('today_total'),
+    )).one()
+
+    total_sales = float(row.total_sales)
+    total_transactions = int(row.total_transactions)
+
+    return {
+        'total_sales': total_sales,
+        'total_transactions': total_transactions,
+        'avg_transaction': total_sales / total_transactions if total_transactions else 0,
+        'today_total': float(row.today_total),
+        'today_date': today.strftime('%Y-%m-%d')
+    }
@@ -0,0 +1,170 @@
+"""
+Server-Sent Events channel for live dashboard KPIs.
+
+One publisher thread per process computes the KPI snapshot when the data
+behind it changes (or the day rolls over) and hands the same serialised
+snapshot to every connected client. N open dashboards therefore cost one
+computation per change instead of N polls.
+
+Changes are detected from a fingerprint read from the database itself
+(latest ids, rollup totals, product and customer counts) with one cheap
+query per poll, so sales committed by other worker processes are picked
+up too; local commits just wake the publisher early.
+
+SSE connections are long-lived, so run the app with threaded or async
+workers when this endpoint is in use.
+"""
+
+import json
+import threading
+import uuid
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, func, select
+
+from app import db
+from app.models import Customer, DailySalesRollup, Product, Sale, StockAdjustment
+
+
+def data_fingerprint():
+    """One-row summary of the data behind the KPIs; changes whenever they may"""
+    def scalar(*columns):
+        return select(*columns).scalar_subquery()
+
+    return tuple(db.session.execute(select(
+        scalar(func.max(Sale.id)),
+        scalar(func.sum(DailySalesRollup.sale_count)),
+        scalar(func.sum(DailySalesRollup.revenue)),
+        scalar(func.max(StockAdjustment.id)),
+        scalar(func.count(Product.id)),
+        scalar(func.max(Product.updated_at)),
+        scalar(func.count(Customer.id)),
+        scalar(func.max(Customer.id)),
+    )).one())
+
+
+class DashboardBroadcaster:
+    """Holds the latest KPI snapshot and wakes subscribers when it changes"""
+
+    def __init__(self, app):
+        self.app = app
+        self.poll_interval = app.config.get('SSE_POLL_INTERVAL', 2)
+        self.heartbeat_interval = app.config.get('SSE_HEARTBEAT_INTERVAL', 15)
+        self.use_thread = app.config.get('SSE_PUBLISHER_THREAD', True)
+
+        self._prefix = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self._latest = None  # (event_id, payload)
+        self._fingerprint = None
+        self._subscribers = 0
+        self._cond = threading.Condition()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def subscribers(self):
+        return self._subscribers
+
+    @property
+    def latest(self):
+        return self._latest
+
+    def notify(self):
+        """Ask the publisher to check for changes now"""
+        self._wake.set()
+
+    def _current_fingerprint(self):
+        return (datetime.now().date(), data_fingerprint())
+
+    def refresh(self, force=False):
+        """Recompute and publish the snapshot if the underlying data changed"""
+        from app.stats import dashboard_kpis
+
+        with self.app.app_context():
+            try:
+                fingerprint = self._current_fingerprint()
+                if not force and fingerprint == self._fingerprint and self._latest is not None:
+                    return False
+                payload = json.dumps(dashboard_kpis())
+            finally:
+                db.session.remove()
+
+        with self._cond:
+            self._sequence += 1
+            self._latest = (f'{self._prefix}-{self._sequence}', payload)
+            self._fingerprint = fingerprint
+            self._cond.notify_all()
+        return True
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._cond:
+                if self._subscribers == 0:
+                    self._thread = None
+                    return
+            try:
+                self.refresh()
+            except Exception:
+                self.app.logger.exception('Dashboard stream refresh failed')
+
+    def subscribe(self):
+        with self._cond:
+            self._subscribers += 1
+            if self.use_thread and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dashboard-sse', daemon=True)
+                self._thread.start()
+
+    def unsubscribe(self):
+        with self._cond:
+            self._subscribers -= 1
+
+    def wait_for_update(self, last_event_id, timeout):
+        """Block until a snapshot newer than last_event_id exists or timeout"""
+        with self._cond:
+            if self._latest is None or self._latest[0] == last_event_id:
+                self._cond.wait(timeout)
+            if self._latest is not None and self._latest[0] != last_event_id:
+                return self._latest
+            return None
+
+    def events(self, last_event_id=None, max_events=None):
+        """Generate the SSE byte stream for one client"""
+        self.subscribe()
+        try:
+            if self._latest is None:
+                self.refresh()
+
+            yield f'retry: {int(self.heartbeat_interval * 1000)}\n\n'
+            sent = 0
+            while max_events is None or sent < max_events:
+                if not self.use_thread:
+                    # No publisher thread: each client checks on its own tick
+                    self.refresh()
+                update = self.wait_for_update(last_event_id, self.heartbeat_interval)
+                if update is None:
+                    yield ': heartbeat\n\n'
+                    continue
+                last_event_id, payload = update
+                yield f'id: {last_event_id}\nevent: stats\ndata: {payload}\n\n'
+                sent += 1
+        finally:
+            self.unsubscribe()
+
+
+def init_app(app):
+    """Attach a broadcaster to the application"""
+    app.extensions['dashboard_stream'] = DashboardBroadcaster(app)
+
+
+def broadcaster_for(app):
+    """Return the broadcaster attached to an application"""
+    return app.extensions['dashboard_stream']
+
+
+@event.listens_for(db.session, 'after_commit')
+def _wake_publishers(session):
+    if has_app_context() and 'dashboard_stream' in current_app.extensions:
+        current_app.extensions['dashboard_stream'].notify()
@@ -0,0 +1,111 @@
+"""
+Cached Flask-Login user loader.
+
+Every authenticated request, including each dashboard poll, asks
+Flask-Login for the current user. Instead of a query per request the
+loader keeps a small detached snapshot (id, username, role) per user id
+in an in-process LRU with a TTL (USER_CACHE_TTL seconds).
+
+Commits that change a user's role or password, or delete the user, evict
+that entry and bump the 'users' version in the result cache. Snapshots
+record the version they were loaded at, so with the shared sqlite result
+cache backend the other worker processes drop stale entries too; with
+the per-process memory backend they expire within the TTL.
+"""
+
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event, inspect
+
+from app import db, login_manager
+from app.cache import LRUCache, cache
+from app.models import User
+
+USER_NAMESPACE = ('users',)
+# Changes to these columns must not be served from the cache
+SECURITY_COLUMNS = ('role', 'password_hash', 'username')
+
+
+class UserSnapshot(UserMixin):
+    """Read-only stand-in for User holding what requests need"""
+
+    def __init__(self, id, username, role):
+        self.id = id
+        self.username = username
+        self.role = role
+
+    def is_admin(self):
+        return self.role == 'admin'
+
+    def is_manager(self):
+        return self.role in ['admin', 'manager']
+
+    def __repr__(self):
+        return f'<UserSnapshot {self.username}>'
+
+
+class UserCache:
+    """Per-process user snapshots keyed by id"""
+
+    def __init__(self, app):
+        self.ttl = app.config.get('USER_CACHE_TTL', 300)
+        self.entries = LRUCache(app.config.get('USER_CACHE_MAX_ENTRIES', 10000), self.ttl or 1)
+
+    def load(self, user_id):
+        version = cache.backend.versions(USER_NAMESPACE)
+        if self.ttl:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+
+        row = db.session.query(User.id, User.username, User.role).filter(User.id == user_id).first()
+        if row is None:
+            return None
+        snapshot = UserSnapshot(*row)
+        if self.ttl:
+            self.entries.set(user_id, (version, snapshot))
+        return snapshot
+
+    def evict(self, user_ids):
+        for user_id in user_ids:
+            self.entries.delete(user_id)
+
+
+def load_user(user_id):
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return None
+    return current_app.extensions['user_cache'].load(user_id)
+
+
+def init_app(app):
+    """Attach the user cache and make it Flask-Login's user loader"""
+    app.extensions['user_cache'] = UserCache(app)
+    login_manager.user_loader(load_user)
+
+
+@event.listens_for(db.session, 'before_flush')
+def _collect_user_changes(session, flush_context, instances):
+    changed = set()
+    for user in session.dirty:
+        if isinstance(user, User):
+            state = inspect(user)
+            if any(state.attrs[name].history.has_changes() for name in SECURITY_COLUMNS):
+                changed.add(user.id)
+    changed.update(user.id for user in session.deleted if isinstance(user, User))
+    if changed:
+        session.info.setdefault('user_cache_evict', set()).update(changed)
+
+
+@event.listens_for(db.session, 'after_commit')
+def _evict_after_commit(session):
+    changed = session.info.pop('user_cache_evict', None)
+    if changed and has_app_context() and 'user_cache' in current_app.extensions:
+        current_app.extensions['user_cache'].evict(changed)
+        cache.invalidate(*USER_NAMESPACE)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_user_changes(session):
+    session.info.pop('user_cache_evict', None)
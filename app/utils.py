@@ -1,12 +1,10 @@
-import pandas as pd
-import numpy as np
 from datetime import datetime, timedelta
 from flask import current_app
 
 def generate_invoice_number():
-    """Generate unique invoice number"""
-    timestamp = datetime.now().strftime('%Y%m%d%H%M%S')
-    return f'INV-{timestamp}'
+    """Generate unique invoice number (INV-YYYYMMDD-NNNNNN)"""
+    from app.sequence import sequence_for
+    return sequence_for(current_app).allocate()[0]
 
 def calculate_profit(sale):
     """Calculate profit for a sale"""
@@ -22,6 +20,8 @@ def get_top_selling_products(days=30):
     from app.models import Sale, SaleItem, Product
     from app import db
     
+    from app.timeseries import half_open
+    
     start_date = datetime.now() - timedelta(days=days)
     
     top_products = db.session.query(
@@ -30,7 +30,7 @@ def get_top_selling_products(days=30):
         db.func.sum(SaleItem.subtotal).label('total_sales')
     ).join(SaleItem, Product.id == SaleItem.product_id
     ).join(Sale, SaleItem.sale_id == Sale.id
-    ).filter(Sale.sale_date >= start_date
+    ).filter(*half_open(Sale.sale_date, start_date)
     ).group_by(Product.id
     ).order_by(db.desc('total_sales')
     ).limit(10).all()
@@ -55,43 +55,27 @@ def get_customer_analytics():
 
 def generate_sales_report(start_date, end_date):
     """Generate sales report for given period"""
-    from app.models import Sale, SaleItem, Product
-    from app import db
-    
-    sales = Sale.query.filter(
-        Sale.sale_date >= start_date,
-        Sale.sale_date <= end_date
-    ).all()
-    
-    report_data = {
-        'total_sales': sum(sale.total_amount for sale in sales),
-        'total_transactions': len(sales),
-        'average_transaction': sum(sale.total_amount for sale in sales) / len(sales) if sales else 0,
-        'sales_by_day': get_sales_by_day(start_date, end_date),
-        'top_products': get_top_selling_products_in_period(start_date, end_date)
-    }
+    # Imported here so pandas only loads when a report actually runs
+    from app.reports import sales_report
     
-    return report_data
+    return sales_report(start_date, end_date)
 
 def get_sales_by_day(start_date, end_date):
-    """Get sales grouped by day"""
-    from app.models import Sale
+    """Get sales grouped by day, including days without sales"""
+    from app.models import DailySalesRollup
+    from app.rollup import as_date, day_after
+    from app.timeseries import time_series
     from app import db
     
-    sales_by_day = db.session.query(
-        db.func.date(Sale.sale_date).label('date'),
-        db.func.sum(Sale.total_amount).label('daily_total')
-    ).filter(
-        Sale.sale_date >= start_date,
-        Sale.sale_date <= end_date
-    ).group_by(db.func.date(Sale.sale_date)
-    ).order_by('date').all()
+    series = time_series({'total': db.func.sum(DailySalesRollup.revenue)},
+                         DailySalesRollup.day, as_date(start_date), day_after(end_date))
     
-    return [{'date': str(row.date), 'total': float(row.daily_total)} for row in sales_by_day]
+    return [{'date': str(point['bucket']), 'total': point['total']} for point in series]
 
 def get_top_selling_products_in_period(start_date, end_date):
     """Get top selling products in specific period"""
     from app.models import Sale, SaleItem, Product
+    from app.timeseries import half_open, period_range
     from app import db
     
     top_products = db.session.query(
@@ -100,9 +84,7 @@ def get_top_selling_products_in_period(start_date, end_date):
         db.func.sum(SaleItem.subtotal).label('revenue')
     ).join(SaleItem, Product.id == SaleItem.product_id
     ).join(Sale, SaleItem.sale_id == Sale.id
-    ).filter(
-        Sale.sale_date >= start_date,
-        Sale.sale_date <= end_date
+    ).filter(*half_open(Sale.sale_date, *period_range(start_date, end_date))
     ).group_by(Product.id
     ).order_by(db.desc('revenue')
     ).limit(5).all()
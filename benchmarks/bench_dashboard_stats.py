@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Benchmark /api/dashboard-stats as the sale table grows.
+
+Compares the one-statement KPI service with the previous implementation
+that loaded every matching Sale and summed in Python.
+
+    python benchmarks/bench_dashboard_stats.py --sizes 10000 50000 200000
+"""
+
+import argparse
+from datetime import datetime, timedelta
+
+from common import db, make_app, seed_sales, time_call
+
+
+def legacy_dashboard_stats():
+    """The pre-rollup implementation, kept here for comparison"""
+    from app.models import Customer, Product, Sale
+
+    today = datetime.now().date()
+    yesterday = today - timedelta(days=1)
+    month_start = today.replace(day=1)
+
+    today_total = sum(s.total_amount for s in Sale.query.filter(db.func.date(Sale.sale_date) == today).all())
+    yesterday_total = sum(s.total_amount for s in Sale.query.filter(db.func.date(Sale.sale_date) == yesterday).all())
+    month_total = sum(s.total_amount for s in Sale.query.filter(Sale.sale_date >= month_start).all())
+    Product.query.filter(Product.stock_quantity < Product.min_stock).count()
+    Customer.query.count()
+    return today_total, yesterday_total, month_total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 50000, 200000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    from app.stats import dashboard_kpis
+
+    print(f"{'sales':>10} {'kpi median ms':>14} {'legacy median ms':>17}")
+    for size in args.sizes:
+        app, ctx = make_app()
+        seed_sales(size)
+
+        kpi_ms, _ = time_call(dashboard_kpis, args.repeat)
+        legacy_ms, _ = time_call(legacy_dashboard_stats, args.repeat)
+        print(f"{size:>10} {kpi_ms:>14.2f} {legacy_ms:>17.2f}")
+
+        db.session.remove()
+        ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark a login storm: logins per second versus dashboard latency.
+
+Serves the app on a local threaded server, then runs --clients threads
+posting logins back to back while one logged-in client polls
+/api/dashboard-stats. Each --hash-workers setting is run in turn; 0 hashes
+inline in the request threads (the old behaviour), so every login competes
+with the dashboard for the CPU.
+
+    python benchmarks/bench_login.py --clients 32 --duration 10 --hash-workers 0 2 4
+"""
+
+import argparse
+import http.client
+import statistics
+import threading
+import time
+from urllib.parse import urlencode
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from common import db, make_app
+
+STORM_USER = ('storm', 'storm@example.com', 'storm-password')
+VIEWER_USER = ('viewer', 'viewer@example.com', 'viewer-password')
+
+
+class QuietHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+def ensure_user(username, email, password):
+    from app.models import User
+
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        user = User(username=username, email=email, role='admin')
+        db.session.add(user)
+    user.set_password(password)
+    db.session.commit()
+
+
+def request(port, method, path, body=None, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        conn.request(method, path, body, headers or {})
+        response = conn.getresponse()
+        response.read()
+        return response
+    finally:
+        conn.close()
+
+
+def login(port, username, password):
+    return request(port, 'POST', '/auth/login', urlencode({'username': username, 'password': password}),
+                   {'Content-Type': 'application/x-www-form-urlencoded'})
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] if ordered else 0.0
+
+
+def poll_dashboard(port, cookie, stop, latencies):
+    while not stop.is_set():
+        start = time.perf_counter()
+        request(port, 'GET', '/api/dashboard-stats', headers={'Cookie': cookie})
+        latencies.append((time.perf_counter() - start) * 1000)
+        stop.wait(0.05)
+
+
+def storm(port, stop, counts, lock):
+    username, _, password = STORM_USER
+    while not stop.is_set():
+        status = login(port, username, password).status
+        with lock:
+            counts[status] = counts.get(status, 0) + 1
+
+
+def run(port, clients, duration):
+    """Dashboard latencies alone, then during the storm, plus login counts"""
+    _, _, password = VIEWER_USER
+    cookie = login(port, VIEWER_USER[0], password).getheader('Set-Cookie').split(';', 1)[0]
+
+    quiet, loaded, counts, lock = [], [], {}, threading.Lock()
+    stop = threading.Event()
+    poller = threading.Thread(target=poll_dashboard, args=(port, cookie, stop, quiet))
+    poller.start()
+    time.sleep(min(duration / 2, 2))
+    stop.set()
+    poller.join()
+
+    stop = threading.Event()
+    threads = [threading.Thread(target=storm, args=(port, stop, counts, lock)) for _ in range(clients)]
+    threads.append(threading.Thread(target=poll_dashboard, args=(port, cookie, stop, loaded)))
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return quiet, loaded, counts, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--clients', type=int, default=32, help='concurrent login loops')
+    parser.add_argument('--duration', type=float, default=10, help='seconds of storm per setting')
+    parser.add_argument('--hash-workers', type=int, nargs='+', default=[0, 2])
+    parser.add_argument('--max-pending', type=int, default=32)
+    args = parser.parse_args()
+
+    from app import passwords
+
+    app, ctx = make_app('benchmark', reset=False)
+    print(f"hash method {app.config['PASSWORD_HASH_METHOD']}, {args.clients} login clients, "
+          f"{args.duration:.0f}s per setting")
+    print(f"{'workers':>7} {'logins/s':>9} {'503/s':>7} {'dash p50':>9} {'dash p95':>9} "
+          f"{'quiet p50':>10} {'quiet p95':>10}")
+
+    for workers in args.hash_workers:
+        app.config.update(PASSWORD_HASH_WORKERS=workers, PASSWORD_HASH_MAX_PENDING=args.max_pending)
+        passwords.init_app(app)
+        ensure_user(*STORM_USER)
+        ensure_user(*VIEWER_USER)
+        db.session.remove()
+
+        server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            quiet, loaded, counts, elapsed = run(server.server_port, args.clients, args.duration)
+        finally:
+            server.shutdown()
+            passwords.hasher_for(app).shutdown()
+
+        ok = counts.get(302, 0)
+        print(f"{workers:>7} {ok / elapsed:>9.1f} {counts.get(503, 0) / elapsed:>7.1f} "
+              f"{statistics.median(loaded) if loaded else 0:>7.1f}ms {percentile(loaded, 0.95):>7.1f}ms "
+              f"{statistics.median(quiet) if quiet else 0:>8.1f}ms {percentile(quiet, 0.95):>8.1f}ms")
+
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Benchmark POS sale ingestion: sales per second from concurrent tills.
+
+Each --tills thread records --batch sales at a time, each sale taking one
+unit of a few products drawn from a small hot set, for --duration seconds.
+Reports sales/s, batch latency and how many batches failed.
+
+    python benchmarks/bench_pos.py --tills 1 4 8 --batch 1 10 --duration 5
+"""
+
+import argparse
+import random
+import statistics
+import threading
+import time
+
+from common import db, make_app
+
+
+def seed_products(count):
+    from app.models import Product
+
+    products = [Product(name=f'POS bench {i}', price=100, cost=50, stock_quantity=10 ** 9, min_stock=1)
+                for i in range(count)]
+    db.session.add_all(products)
+    db.session.commit()
+    return [product.id for product in products]
+
+
+def till(app, number, product_ids, batch, items, stop, results):
+    from app.pos import record_pos_sales
+
+    rng = random.Random(number)
+    sequence = 0
+    with app.app_context():
+        while not stop.is_set():
+            sales = []
+            for _ in range(batch):
+                sequence += 1
+                sales.append({
+                    'invoice_number': f'B{number:02d}-{time.monotonic_ns() % 10 ** 9}-{sequence}'[:20],
+                    'items': [{'product_id': product_id, 'quantity': 1}
+                              for product_id in rng.sample(product_ids, items)],
+                })
+            start = time.perf_counter()
+            try:
+                created, _ = record_pos_sales(sales)
+                results.append((len(created), time.perf_counter() - start, None))
+            except Exception as exc:
+                results.append((0, time.perf_counter() - start, type(exc).__name__))
+            finally:
+                db.session.remove()
+
+
+def run(app, tills, batch, items, duration, product_ids):
+    stop, results = threading.Event(), []
+    threads = [threading.Thread(target=till, args=(app, n, product_ids, batch, items, stop, results))
+               for n in range(tills)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--tills', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--batch', type=int, nargs='+', default=[1, 10])
+    parser.add_argument('--items', type=int, default=3, help='products per sale')
+    parser.add_argument('--products', type=int, default=20, help='size of the hot product set')
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    app, ctx = make_app('benchmark')
+    product_ids = seed_products(args.products)
+    db.session.remove()
+
+    print(f"{args.products} hot products, {args.items} items per sale, {args.duration:.0f}s per setting")
+    print(f"{'tills':>5} {'batch':>5} {'sales/s':>8} {'p50 ms':>7} {'p95 ms':>7} {'errors':>6}")
+    for tills in args.tills:
+        for batch in args.batch:
+            results, elapsed = run(app, tills, batch, args.items, args.duration, product_ids)
+            latencies = sorted(seconds * 1000 for _, seconds, _ in results)
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+            errors = sum(1 for _, _, error in results if error)
+            print(f"{tills:>5} {batch:>5} {sum(n for n, _, _ in results) / elapsed:>8.0f} "
+                  f"{statistics.median(latencies) if latencies else 0:>7.1f} {p95:>7.1f} {errors:>6}")
+
+    ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
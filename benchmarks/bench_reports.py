@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Benchmark generate_sales_report over a year of sales.
+
+Compares the chunked pandas engine with the previous implementation that
+loaded every Sale in the period as an ORM object, and reports peak Python
+memory for each.
+
+    python benchmarks/bench_reports.py --sizes 10000 100000
+"""
+
+import argparse
+import tracemalloc
+from datetime import datetime, timedelta
+
+from common import db, make_app, seed_sales, time_call
+
+
+def legacy_sales_report(start_date, end_date):
+    """The pre-engine implementation, kept here for comparison"""
+    from app.models import Sale
+    from app.utils import get_sales_by_day, get_top_selling_products_in_period
+
+    sales = Sale.query.filter(Sale.sale_date >= start_date, Sale.sale_date <= end_date).all()
+    return {
+        'total_sales': sum(sale.total_amount for sale in sales),
+        'total_transactions': len(sales),
+        'average_transaction': sum(sale.total_amount for sale in sales) / len(sales) if sales else 0,
+        'sales_by_day': get_sales_by_day(start_date, end_date),
+        'top_products': get_top_selling_products_in_period(start_date, end_date),
+    }
+
+
+def peak_kib(func):
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    db.session.rollback()
+    return peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from app.utils import generate_sales_report
+
+    end = datetime.now()
+    start = end - timedelta(days=365)
+
+    def engine():
+        return generate_sales_report(start, end)
+
+    def legacy():
+        return legacy_sales_report(start, end)
+
+    print(f"{'sales':>10} {'engine ms':>10} {'engine KiB':>11} {'legacy ms':>10} {'legacy KiB':>11}")
+    for size in args.sizes:
+        app, ctx = make_app()
+        seed_sales(size)
+
+        engine_ms, _ = time_call(engine, args.repeat)
+        legacy_ms, _ = time_call(legacy, args.repeat)
+        print(f"{size:>10} {engine_ms:>10.1f} {peak_kib(engine):>11.0f} "
+              f"{legacy_ms:>10.1f} {peak_kib(legacy):>11.0f}")
+
+        db.session.remove()
+        ctx.pop()
+
+
+if __name__ == '__main__':
+    main()
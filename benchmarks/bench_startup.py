@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark cold start: importing the app, create_app() and the flask CLI.
+
+Each sample runs in a fresh interpreter, so nothing is already imported.
+Startup should not pay for pandas/numpy (loaded on the first report) or
+for schema work (done by `flask init-db`, not on boot).
+
+    python benchmarks/bench_startup.py --repeat 10 --config testing
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ('pandas', 'numpy')
+
+PROBE = """
+import json, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app(sys.argv[1])
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - start) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'heavy': [name for name in sys.argv[2:] if name in sys.modules],
+}))
+"""
+
+
+def probe_app(config_name):
+    """Time the import and create_app() in a fresh interpreter"""
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', PROBE, config_name, *HEAVY_MODULES], cwd=ROOT,
+                            capture_output=True, text=True, check=True)
+    sample = json.loads(result.stdout.strip().splitlines()[-1])
+    sample['process_ms'] = (time.perf_counter() - start) * 1000
+    return sample
+
+
+def time_cli(config_name):
+    """Wall time of `flask --app run.py --help` in a fresh interpreter"""
+    env = dict(os.environ, FLASK_CONFIG=config_name)
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-m', 'flask', '--app', 'run.py', '--help'], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    elapsed = (time.perf_counter() - start) * 1000
+    if result.returncode != 0 or 'init-db' not in result.stdout:
+        raise RuntimeError((result.stderr or result.stdout).strip().splitlines()[-1])
+    return elapsed
+
+
+def summary(values):
+    return f"median {statistics.median(values):8.1f} ms   best {min(values):8.1f} ms"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--config', default='testing', help='config name passed to create_app()')
+    parser.add_argument('--skip-cli', action='store_true', help='only time the import and create_app()')
+    args = parser.parse_args()
+
+    samples = [probe_app(args.config) for _ in range(args.repeat)]
+    print(f"Cold start over {args.repeat} fresh interpreters ({args.config} config):")
+    print(f"  {'import app':<24} {summary([s['import_ms'] for s in samples])}")
+    print(f"  {'create_app()':<24} {summary([s['create_app_ms'] for s in samples])}")
+    print(f"  {'whole process':<24} {summary([s['process_ms'] for s in samples])}")
+
+    heavy = sorted({name for s in samples for name in s['heavy']})
+    print(f"  heavy modules loaded at startup: {', '.join(heavy) if heavy else 'none'}")
+
+    if not args.skip_cli:
+        try:
+            timings = [time_cli(args.config) for _ in range(args.repeat)]
+            print(f"  {'flask --help':<24} {summary(timings)}")
+        except RuntimeError as exc:
+            print(f"  flask --help failed: {exc}")
+
+    if heavy:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
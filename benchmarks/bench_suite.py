@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Time every page, JSON API and app.utils function at several dataset sizes.
+
+Pages and APIs go through the Flask test client as a logged-in user;
+utils functions are called inside the app context. Runs against the
+'benchmark' config: a SQLite file under instance/ by default, or any
+database given in BENCH_DATABASE_URL (e.g. a local MySQL). The result
+cache is disabled so every call does its real work.
+
+    python benchmarks/bench_suite.py --sizes 10k 1m --output benchmarks/baseline.json
+    python benchmarks/bench_suite.py --sizes 10k --compare benchmarks/baseline.json
+
+A dataset already holding the requested number of sales is reused; pass
+--reseed to rebuild it.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta
+
+from common import db, make_app, seed_sales, time_call
+
+BENCH_USER = ('bench', 'bench@example.com', 'bench-password')
+
+
+def parse_size(value):
+    """Parse 10000, 10k or 1m"""
+    value = value.lower()
+    multiplier = {'k': 1000, 'm': 1000000}.get(value[-1], 1)
+    return int(float(value.rstrip('km')) * multiplier)
+
+
+def route_targets():
+    """(name, method, path, json body) for every page and API"""
+    today = date.today()
+    month_ago = today - timedelta(days=30)
+    period = {'date_from': month_ago.isoformat(), 'date_to': today.isoformat()}
+    query = f"date_from={period['date_from']}&date_to={period['date_to']}"
+    return [
+        ('page:dashboard', 'GET', '/dashboard', None),
+        ('page:sales', 'GET', '/sales', None),
+        ('page:sales?filtered', 'GET', f'/sales?payment_method=cash&{query}', None),
+        ('page:customers', 'GET', '/customers', None),
+        ('page:customers?sort=total_spent', 'GET', '/customers?sort=total_spent&order=desc', None),
+        ('page:inventory', 'GET', '/inventory', None),
+        ('page:reports', 'GET', '/reports', None),
+        ('api:sales-data', 'GET', '/api/sales-data', None),
+        ('api:sales', 'GET', '/api/sales', None),
+        ('api:dashboard-stats', 'GET', '/api/dashboard-stats', None),
+        ('api:reports sales', 'POST', '/api/reports', dict(period, type='sales')),
+        ('api:reports customers', 'POST', '/api/reports', {'type': 'customers'}),
+        ('export:sales.csv 30d', 'GET', f'/export/sales.csv?{query}', None),
+    ]
+
+
+def utils_targets():
+    """(name, callable) for every app.utils function"""
+    from app import utils
+    from app.models import Sale
+
+    now = datetime.now()
+    year_ago, month_ago = now - timedelta(days=365), now - timedelta(days=30)
+    sale = Sale.query.order_by(Sale.id.desc()).first()
+    return [
+        ('utils:generate_invoice_number', utils.generate_invoice_number),
+        ('utils:calculate_profit', lambda: utils.calculate_profit(db.session.get(Sale, sale.id))),
+        ('utils:get_top_selling_products', lambda: utils.get_top_selling_products(30)),
+        ('utils:get_customer_analytics', utils.get_customer_analytics),
+        ('utils:generate_sales_report 365d', lambda: utils.generate_sales_report(year_ago, now)),
+        ('utils:get_sales_by_day 30d', lambda: utils.get_sales_by_day(month_ago, now)),
+        ('utils:get_top_selling_products_in_period 365d',
+         lambda: utils.get_top_selling_products_in_period(year_ago, now)),
+    ]
+
+
+def ensure_dataset(size, reseed, workers=1):
+    """Seed `size` sales unless the database already holds exactly that many"""
+    from app.models import Sale
+
+    if not reseed and db.session.query(db.func.count(Sale.id)).scalar() == size:
+        return False
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    seed_sales(size, days=730, customers=max(200, size // 500), products=200, workers=workers)
+    return True
+
+
+def login(client):
+    from app.models import User
+
+    username, email, password = BENCH_USER
+    if User.query.filter_by(username=username).first() is None:
+        user = User(username=username, email=email, role='admin')
+        user.set_password(password)
+        db.session.add(user)
+        db.session.commit()
+    response = client.post('/auth/login', data={'username': username, 'password': password})
+    if response.status_code not in (200, 302):
+        raise RuntimeError(f'Benchmark login failed: {response.status_code}')
+
+
+def run_size(app, size, repeat):
+    client = app.test_client()
+    login(client)
+    results = {}
+
+    for name, method, path, body in route_targets():
+        status = []
+
+        def call():
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            status.append(response.status_code)
+
+        median_ms, best_ms = time_call(call, repeat)
+        results[name] = {'median_ms': round(median_ms, 2), 'best_ms': round(best_ms, 2), 'status': status[-1]}
+        print(f"  {name:<48} {median_ms:>10.2f} ms  [{status[-1]}]", flush=True)
+
+    for name, func in utils_targets():
+        median_ms, best_ms = time_call(func, repeat)
+        results[name] = {'median_ms': round(median_ms, 2), 'best_ms': round(best_ms, 2)}
+        print(f"  {name:<48} {median_ms:>10.2f} ms", flush=True)
+
+    return results
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, baseline_path, tolerance):
+    """Print timing ratios against a baseline; return the regressed entries"""
+    with open(baseline_path) as handle:
+        baseline = json.load(handle)['results']
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} (tolerance x{tolerance}):")
+    for size, timings in results.items():
+        for name, timing in timings.items():
+            before = baseline.get(size, {}).get(name)
+            if not before or not before['median_ms']:
+                continue
+            ratio = timing['median_ms'] / before['median_ms']
+            flag = 'REGRESSION' if ratio > tolerance else ''
+            print(f"  {size:>9} {name:<48} x{ratio:>6.2f} {flag}")
+            if flag:
+                regressions.append((size, name, ratio))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=parse_size, nargs='+', default=[10000],
+                        help='sale counts, e.g. 10k 1m 10m')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--reseed', action='store_true', help='always regenerate the dataset')
+    parser.add_argument('--workers', type=int, default=1, help='processes used to seed the dataset')
+    parser.add_argument('--output', help='write results as a JSON baseline')
+    parser.add_argument('--compare', help='baseline JSON to compare against')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='flag entries slower than baseline by this factor')
+    args = parser.parse_args()
+
+    instance = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'instance')
+    os.makedirs(instance, exist_ok=True)
+
+    results = {}
+    dialect = None
+    for size in args.sizes:
+        app, ctx = make_app('benchmark', reset=False)
+        dialect = db.engine.dialect.name
+        start = time.perf_counter()
+        if ensure_dataset(size, args.reseed, args.workers):
+            print(f"Seeded {size} sales in {time.perf_counter() - start:.1f}s")
+        print(f"{size} sales on {dialect}:")
+        results[str(size)] = run_size(app, size, args.repeat)
+        db.session.remove()
+        ctx.pop()
+
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump({
+                'meta': {
+                    'created': datetime.now().isoformat(timespec='seconds'),
+                    'commit': git_commit(),
+                    'database': dialect,
+                    'python': platform.python_version(),
+                    'repeat': args.repeat,
+                },
+                'results': results,
+            }, handle, indent=2, sort_keys=True)
+        print(f"\nWrote {args.output}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
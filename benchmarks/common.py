@@ -0,0 +1,47 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+
+import os
+import statistics
+import sys
+import time
+
+# Allow running the scripts directly from the project root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app, db  # noqa: E402
+
+
+def make_app(config_name='testing', reset=True):
+    """Create an app and push its context, by default with an empty schema"""
+    app = create_app(config_name)
+    ctx = app.app_context()
+    ctx.push()
+    if reset:
+        db.drop_all()
+    db.create_all()
+    return app, ctx
+
+
+def seed_sales(count, days=365, customers=200, products=50, seed=42, batch_size=10000,
+               max_items=3, workers=1):
+    """Insert `count` sales over the last `days` days with the bulk generator"""
+    from app.rollup import rebuild_rollup
+    from app.sample_data import generate
+
+    db.session.commit()
+    generate(db.engine, sales=count, customers=customers, products=products, days=days,
+             seed=seed, workers=workers, batch_size=batch_size, max_items=max_items)
+    rebuild_rollup()
+
+
+def time_call(func, repeat=5):
+    """Return (median, best) wall time in milliseconds over `repeat` calls"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+        db.session.rollback()
+    return statistics.median(timings), min(timings)
@@ -16,6 +16,48 @@ class Config:
     SQLALCHEMY_DATABASE_URI = f"mysql+mysqlconnector://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
+    # Connection pool; recycle below MySQL's wait_timeout and ping on
+    # checkout so idle connections never surface as "server has gone away"
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.getenv('DB_POOL_TIMEOUT', 10))  # seconds to wait for a connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))  # seconds
+    DB_POOL_PRE_PING = os.getenv('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes')
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': DB_POOL_SIZE,
+        'max_overflow': DB_MAX_OVERFLOW,
+        'pool_timeout': DB_POOL_TIMEOUT,
+        'pool_recycle': DB_POOL_RECYCLE,
+        'pool_pre_ping': DB_POOL_PRE_PING,
+    }
+    
+    # Statements slower than this are logged with their SQL
+    SLOW_QUERY_MS = int(os.getenv('SLOW_QUERY_MS', 500))
+    
+    # Per-request SQL profiler with Server-Timing headers (off by default)
+    PROFILER_ENABLED = os.getenv('PROFILER_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    PROFILER_SLOW_MS = int(os.getenv('PROFILER_SLOW_MS', 200))  # keep requests slower than this
+    PROFILER_N_PLUS_ONE = int(os.getenv('PROFILER_N_PLUS_ONE', 5))  # repeats of one statement shape
+    PROFILER_RING_SIZE = int(os.getenv('PROFILER_RING_SIZE', 50))
+    
+    # Prometheus /metrics; set a token to require "Authorization: Bearer <token>"
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+    # Without a token, metrics are switched off rather than served publicly
+    METRICS_REQUIRE_TOKEN = False
+    
+    # Authenticated-user snapshots kept per process (0 disables the cache)
+    USER_CACHE_TTL = int(os.getenv('USER_CACHE_TTL', 300))  # seconds
+    USER_CACHE_MAX_ENTRIES = int(os.getenv('USER_CACHE_MAX_ENTRIES', 10000))
+    
+    # Password hashing: a full Werkzeug method string; older hashes are
+    # upgraded on login. Hashing runs on a bounded pool (0 workers = inline)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 32))
+    PASSWORD_HASH_TIMEOUT = int(os.getenv('PASSWORD_HASH_TIMEOUT', 10))  # seconds
+    
     # Session Config
     SESSION_TYPE = 'filesystem'
     PERMANENT_SESSION_LIFETIME = 3600  # 1 hour
@@ -24,6 +66,34 @@ class Config:
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = 'static/uploads'
     
+    # Result cache for the JSON APIs: memory (per process, single-worker
+    # deployments only), sqlite (shared by the workers on one host) or null
+    # (disabled, no ETags)
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'memory')
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv('CACHE_DEFAULT_TIMEOUT', 60))  # seconds
+    CACHE_MAX_ENTRIES = int(os.getenv('CACHE_MAX_ENTRIES', 512))
+    CACHE_PATH = os.getenv('CACHE_PATH', 'instance/result_cache.sqlite')
+    
+    # Live dashboard stream (Server-Sent Events)
+    SSE_POLL_INTERVAL = int(os.getenv('SSE_POLL_INTERVAL', 2))  # seconds between change checks
+    SSE_HEARTBEAT_INTERVAL = int(os.getenv('SSE_HEARTBEAT_INTERVAL', 15))
+    SSE_PUBLISHER_THREAD = True
+    
+    # Background report jobs (0 workers runs reports inline)
+    REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', 2))
+    REPORT_MAX_PENDING = int(os.getenv('REPORT_MAX_PENDING', 16))
+    REPORT_CACHE_TIMEOUT = int(os.getenv('REPORT_CACHE_TIMEOUT', 3600))  # seconds
+    
+    # Invoice numbers (PREFIX-YYYYMMDD-NNNNNN, PREFIX at most 3 characters), leased per process in blocks
+    INVOICE_PREFIX = os.getenv('INVOICE_PREFIX', 'INV')
+    INVOICE_BLOCK_SIZE = int(os.getenv('INVOICE_BLOCK_SIZE', 100))
+    
+    # Rendered invoices are cached by content hash (seconds)
+    INVOICE_CACHE_TIMEOUT = int(os.getenv('INVOICE_CACHE_TIMEOUT', 604800))
+    
+    # Stock snapshots for point-in-time stock (0 = only `flask snapshot-stock`)
+    STOCK_SNAPSHOT_INTERVAL_HOURS = int(os.getenv('STOCK_SNAPSHOT_INTERVAL_HOURS', 24))
+    
     # Email Config (for future alerts)
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
     MAIL_PORT = int(os.getenv('MAIL_PORT', 587))
@@ -42,15 +112,34 @@ class DevelopmentConfig(Config):
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    # In-memory SQLite is one static connection; pool options don't apply
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    # The in-memory database is a single connection, keep it on one thread
+    SSE_PUBLISHER_THREAD = False
+    REPORT_WORKERS = 0
+    # Full-strength hashing only slows the suite down
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
+
+class BenchmarkConfig(Config):
+    TESTING = True
+    # A file (or a local MySQL) so large seeded datasets can be reused
+    SQLALCHEMY_DATABASE_URI = os.getenv('BENCH_DATABASE_URL', 'sqlite:///' + os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'instance', 'benchmark.sqlite'))
+    # Time the queries themselves, not cache hits
+    CACHE_BACKEND = 'null'
+    SSE_PUBLISHER_THREAD = False
+    REPORT_WORKERS = 0
 
 class ProductionConfig(Config):
     DEBUG = False
     TESTING = False
+    METRICS_REQUIRE_TOKEN = True
 
 # Choose config based on environment
 config = {
     'development': DevelopmentConfig,
     'testing': TestingConfig,
+    'benchmark': BenchmarkConfig,
     'production': ProductionConfig,
     'default': DevelopmentConfig
 }
\ No newline at end of file
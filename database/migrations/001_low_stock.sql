@@ -0,0 +1,24 @@
+-- Low stock tracking and restock alerts, for databases created before them.
+-- setup.sql only creates missing tables, so an existing products table
+-- keeps its old columns; run this once after upgrading:
+--     mysql -u root -p business_dashboard < database/migrations/001_low_stock.sql
+-- SQLite databases use 001_low_stock.sqlite.sql instead.
+
+USE business_dashboard;
+
+ALTER TABLE products
+    ADD COLUMN low_stock BOOLEAN AS (COALESCE(stock_quantity, 0) < COALESCE(min_stock, 0)) STORED,
+    ADD INDEX idx_low_stock (low_stock, name);
+
+-- Restock alerts, queued when a product crosses its minimum stock
+CREATE TABLE IF NOT EXISTS restock_alert (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    product_id INT NOT NULL,
+    event VARCHAR(10) NOT NULL,
+    stock_quantity INT NOT NULL,
+    min_stock INT NOT NULL,
+    created_at DATETIME NOT NULL,
+    sent_at DATETIME NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    INDEX idx_restock_alert_pending (sent_at, id)
+);
@@ -0,0 +1,52 @@
+-- Low stock tracking and restock alerts for SQLite databases created before
+-- them (see 001_low_stock.sql for MySQL). SQLite cannot add a STORED
+-- generated column to an existing table, so the product table is rebuilt
+-- the way SQLite recommends: the new table is created and filled, the old
+-- one dropped and the new one renamed into its place. Back up the database
+-- file first, then run this once with the app stopped:
+--     sqlite3 path/to/database.sqlite < database/migrations/001_low_stock.sqlite.sql
+
+PRAGMA foreign_keys = OFF;
+BEGIN;
+
+CREATE TABLE product_new (
+    id INTEGER NOT NULL,
+    name VARCHAR(100) NOT NULL,
+    description TEXT,
+    category VARCHAR(50),
+    price FLOAT NOT NULL,
+    cost FLOAT NOT NULL,
+    stock_quantity INTEGER,
+    min_stock INTEGER,
+    low_stock BOOLEAN GENERATED ALWAYS AS (coalesce(stock_quantity, 0) < coalesce(min_stock, 0)) STORED,
+    created_at DATETIME,
+    updated_at DATETIME,
+    PRIMARY KEY (id)
+);
+INSERT INTO product_new (id, name, description, category, price, cost, stock_quantity, min_stock,
+                     created_at, updated_at)
+SELECT id, name, description, category, price, cost, stock_quantity, min_stock, created_at, updated_at
+FROM product;
+DROP TABLE product;
+ALTER TABLE product_new RENAME TO product;
+
+CREATE INDEX idx_product_name ON product (name);
+CREATE INDEX idx_product_category ON product (category);
+CREATE INDEX idx_product_low_stock ON product (low_stock, name);
+
+CREATE TABLE IF NOT EXISTS restock_alert (
+    id INTEGER NOT NULL,
+    product_id INTEGER NOT NULL,
+    event VARCHAR(10) NOT NULL,
+    stock_quantity INTEGER NOT NULL,
+    min_stock INTEGER NOT NULL,
+    created_at DATETIME NOT NULL,
+    sent_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY (product_id) REFERENCES product (id) ON DELETE CASCADE
+);
+CREATE INDEX IF NOT EXISTS idx_restock_alert_pending ON restock_alert (sent_at, id);
+
+PRAGMA foreign_key_check;
+COMMIT;
+PRAGMA foreign_keys = ON;
@@ -42,11 +42,13 @@ CREATE TABLE IF NOT EXISTS products (
     cost DECIMAL(10, 2) NOT NULL,
     stock_quantity INT DEFAULT 0,
     min_stock INT DEFAULT 10,
+    low_stock BOOLEAN AS (COALESCE(stock_quantity, 0) < COALESCE(min_stock, 0)) STORED,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
     INDEX idx_name (name),
     INDEX idx_category (category),
     INDEX idx_stock (stock_quantity),
+    INDEX idx_low_stock (low_stock, name),
     CHECK (price >= 0),
     CHECK (cost >= 0),
     CHECK (stock_quantity >= 0),
@@ -106,7 +108,34 @@ CREATE TABLE IF NOT EXISTS expenses (
     CHECK (amount >= 0)
 );
 
--- Stock adjustments table (for inventory tracking)
+-- Daily sales rollup (maintained by the application on every sale write,
+-- rebuild with: flask rebuild-sales-rollup)
+CREATE TABLE IF NOT EXISTS daily_sales_rollup (
+    day DATE NOT NULL,
+    payment_method VARCHAR(20) NOT NULL,
+    customer_type VARCHAR(20) NOT NULL,
+    sale_count INT NOT NULL DEFAULT 0,
+    revenue DOUBLE NOT NULL DEFAULT 0,
+    discount DOUBLE NOT NULL DEFAULT 0,
+    tax DOUBLE NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, payment_method, customer_type)
+);
+
+-- Restock alerts, queued when a product crosses its minimum stock
+-- (send with: flask send-restock-alerts)
+CREATE TABLE IF NOT EXISTS restock_alert (
+    id INT PRIMARY KEY AUTO_INCREMENT,
+    product_id INT NOT NULL,
+    event VARCHAR(10) NOT NULL,
+    stock_quantity INT NOT NULL,
+    min_stock INT NOT NULL,
+    created_at DATETIME NOT NULL,
+    sent_at DATETIME NULL,
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+    INDEX idx_restock_alert_pending (sent_at, id)
+);
+
+-- Stock adjustments table (the stock ledger; quantity is the signed change)
 CREATE TABLE IF NOT EXISTS stock_adjustments (
     id INT PRIMARY KEY AUTO_INCREMENT,
     product_id INT NOT NULL,
@@ -117,10 +146,32 @@ CREATE TABLE IF NOT EXISTS stock_adjustments (
     adjustment_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
     FOREIGN KEY (adjusted_by) REFERENCES users(id) ON DELETE SET NULL,
-    INDEX idx_product (product_id),
+    INDEX idx_product (product_id, adjustment_date),
     INDEX idx_adjustment_date (adjustment_date)
 );
 
+-- Invoice number counters, one row per day; processes lease blocks from them
+CREATE TABLE IF NOT EXISTS sequence_counter (
+    name VARCHAR(50) PRIMARY KEY,
+    next_value BIGINT NOT NULL
+);
+
+-- Periodic copies of every product's stock, for point-in-time stock
+-- (take one with: flask snapshot-stock)
+CREATE TABLE IF NOT EXISTS stock_snapshot (
+    taken_at DATETIME(6) NOT NULL,
+    product_id INT NOT NULL,
+    stock_quantity INT NOT NULL,
+    PRIMARY KEY (taken_at, product_id),
+    FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
+);
+
+-- Baseline snapshot, so stock that predates the ledger is known when
+-- upgrading an existing database (a no-op once any snapshot exists)
+INSERT INTO stock_snapshot (taken_at, product_id, stock_quantity)
+SELECT UTC_TIMESTAMP(6), id, COALESCE(stock_quantity, 0) FROM products
+WHERE NOT EXISTS (SELECT 1 FROM stock_snapshot);
+
 -- Audit log table
 CREATE TABLE IF NOT EXISTS audit_log (
     id INT PRIMARY KEY AUTO_INCREMENT,
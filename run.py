@@ -10,8 +10,8 @@ from app.models import db
 from flask_migrate import Migrate
 import click
 
-# Create application instance
-app = create_app()
+# Create application instance (FLASK_CONFIG picks the config, e.g. production)
+app = create_app(os.getenv('FLASK_CONFIG', 'default'))
 migrate = Migrate(app, db)
 
 @app.shell_context_processor
@@ -75,127 +75,100 @@ def create_user(username, email, password, role):
     print(f"User '{username}' created successfully with role '{role}'")
 
 @app.cli.command("generate-sample-data")
-def generate_sample_data():
+@click.option('--sales', default=50, help='Number of sales to generate')
+@click.option('--customers', default=10, help='Number of customers')
+@click.option('--products', default=8, help='Number of products')
+@click.option('--days', default=30, help='Length of the sales history in days, ending today')
+@click.option('--seed', default=42, help='Random seed; the same seed gives the same data')
+@click.option('--workers', default=1, help='Worker processes writing blocks of days in parallel')
+@click.option('--batch-size', default=10000, help='Rows per INSERT batch')
+@click.option('--max-items', default=5, help='Maximum items per sale')
+def generate_sample_data(sales, customers, products, days, seed, workers, batch_size, max_items):
     """Generate sample data for testing"""
-    import random
-    from datetime import datetime, timedelta
-    from app.models import Customer, Product, Sale, SaleItem, Expense
-    
-    print("Generating sample data...")
-    
-    # Create sample customers
-    customer_names = [
-        "John Smith", "Mary Johnson", "Robert Brown", "Linda Davis",
-        "Michael Wilson", "Sarah Miller", "David Moore", "Karen Taylor",
-        "James Anderson", "Jennifer Thomas"
-    ]
-    
-    customers = []
-    for name in customer_names:
-        customer = Customer(
-            name=name,
-            email=f"{name.lower().replace(' ', '.')}@example.com",
-            phone=f"+265 {random.randint(880, 999)} {random.randint(100000, 999999)}",
-            address=f"Address {random.randint(1, 100)}, City",
-            customer_type=random.choice(['retail', 'wholesale', 'business'])
-        )
-        customers.append(customer)
-        db.session.add(customer)
-    
-    db.session.commit()
-    print(f"Created {len(customers)} customers")
-    
-    # Create sample products
-    products_data = [
-        ("Laptop Dell", "15-inch laptop", "Electronics", 850000, 650000, 20),
-        ("Wireless Mouse", "Bluetooth mouse", "Electronics", 15000, 8000, 50),
-        ("Keyboard", "Mechanical keyboard", "Electronics", 45000, 25000, 30),
-        ("Monitor 24-inch", "Full HD monitor", "Electronics", 180000, 120000, 15),
-        ("Office Chair", "Ergonomic chair", "Furniture", 85000, 50000, 25),
-        ("Desk Lamp", "LED lamp", "Home", 12000, 6000, 40),
-        ("Notebook", "Premium notebook", "Stationery", 8000, 3500, 100),
-        ("Pen Set", "Executive pen set", "Stationery", 15000, 7000, 60)
-    ]
-    
-    products = []
-    for name, desc, category, price, cost, stock in products_data:
-        product = Product(
-            name=name,
-            description=desc,
-            category=category,
-            price=price,
-            cost=cost,
-            stock_quantity=stock,
-            min_stock=stock // 3
-        )
-        products.append(product)
-        db.session.add(product)
-    
-    db.session.commit()
-    print(f"Created {len(products)} products")
-    
-    # Create sample sales (last 30 days)
-    sales = []
-    start_date = datetime.now() - timedelta(days=30)
-    
-    for i in range(50):  # 50 sample sales
-        sale_date = start_date + timedelta(days=random.randint(0, 30), hours=random.randint(9, 17))
-        customer = random.choice(customers)
-        
-        sale = Sale(
-            invoice_number=f"INV-{sale_date.strftime('%Y%m%d')}-{i+1:03d}",
-            customer_id=customer.id,
-            sale_date=sale_date,
-            total_amount=0,  # Will be calculated
-            discount=random.choice([0, 5000, 10000]),
-            tax=random.choice([0, 5000, 10000, 15000]),
-            payment_method=random.choice(['cash', 'card', 'mobile_money', 'bank_transfer'])
-        )
-        
-        # Add 1-5 items to each sale
-        total_amount = 0
-        items_count = random.randint(1, 5)
-        
-        for j in range(items_count):
-            product = random.choice(products)
-            quantity = random.randint(1, 3)
-            unit_price = product.price
-            subtotal = quantity * unit_price
-            
-            item = SaleItem(
-                product_id=product.id,
-                quantity=quantity,
-                unit_price=unit_price,
-                subtotal=subtotal
-            )
-            sale.items.append(item)
-            total_amount += subtotal
-        
-        sale.total_amount = total_amount - sale.discount + sale.tax
-        sales.append(sale)
-        db.session.add(sale)
-    
-    db.session.commit()
-    print(f"Created {len(sales)} sales")
-    
-    # Create sample expenses
-    expense_categories = ['Rent', 'Salaries', 'Utilities', 'Marketing', 'Supplies', 'Internet', 'Transport']
-    
-    for i in range(20):
-        expense = Expense(
-            category=random.choice(expense_categories),
-            description=f"{random.choice(expense_categories)} expense {i+1}",
-            amount=random.randint(10000, 300000),
-            expense_date=start_date + timedelta(days=random.randint(0, 30)),
-            payment_method=random.choice(['cash', 'bank_transfer', 'card'])
-        )
-        db.session.add(expense)
-    
-    db.session.commit()
-    print("Created sample expenses")
+    import time
+    from app.cache import cache
+    from app.ledger import take_snapshot
+    from app.rollup import rebuild_rollup
+    from app.sample_data import generate
+    
+    print(f"Generating {sales} sales over {days} days...")
+    started = time.perf_counter()
+    
+    def progress(block, written):
+        elapsed = time.perf_counter() - started
+        print(f"\r  {written['sales']:,}/{sales:,} sales, {written['items']:,} items "
+              f"({written['sales'] / max(elapsed, 1e-9):,.0f} sales/s)", end='', flush=True)
+    
+    written = generate(db.engine, sales=sales, customers=customers, products=products, days=days,
+                       seed=seed, workers=workers, batch_size=batch_size, max_items=max_items,
+                       progress=progress)
+    print()
+    print(f"Created {written['customers']} customers, {written['products']} products, "
+          f"{written['expenses']} expenses")
+    print(f"Created {written['sales']} sales with {written['items']} items "
+          f"in {time.perf_counter() - started:.1f}s")
+    
+    # Bulk inserts bypass the session listeners
+    rows = rebuild_rollup()
+    cache.invalidate('sales', 'products', 'customers')
+    print(f"Daily sales rollup rebuilt: {rows} rows")
+    # Sample stock is written without ledger entries; give it a baseline
+    take_snapshot()
     
     print("Sample data generation complete!")
 
+@app.cli.command("rebuild-sales-rollup")
+def rebuild_sales_rollup():
+    """Recompute the daily sales rollup from the sales table"""
+    from app.rollup import rebuild_rollup
+    
+    print("Rebuilding daily sales rollup...")
+    rows = rebuild_rollup()
+    print(f"Daily sales rollup rebuilt: {rows} rows")
+
+@app.cli.command("snapshot-stock")
+def snapshot_stock():
+    """Record every product's stock on hand for point-in-time stock queries"""
+    from app.ledger import take_snapshot
+    
+    taken_at = take_snapshot()
+    print(f"Stock snapshot taken at {taken_at:%Y-%m-%d %H:%M:%S} UTC")
+
+@app.cli.command("send-restock-alerts")
+@click.option('--batch-size', default=100, show_default=True, help='alerts per batch')
+def send_restock_alerts(batch_size):
+    """Log and mark sent every queued restock alert"""
+    from app.restock import dispatch_alerts, log_alerts
+    
+    sent = dispatch_alerts(log_alerts, batch_size=batch_size)
+    print(f"Restock alerts sent: {sent}")
+
+@app.cli.command("import-csv")
+@click.argument('dataset', type=click.Choice(['customers', 'products', 'sales']))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=1000, help='Rows per transaction')
+@click.option('--rejects', type=click.Path(dir_okay=False), help='Write rejected lines and reasons to this CSV')
+def import_csv_file(dataset, path, batch_size, rejects):
+    """Bulk import customers, products or sales from a CSV file"""
+    import csv
+    from app.importer import import_csv
+    
+    print(f"Importing {dataset} from {path}...")
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        report = import_csv(dataset, handle, batch_size=batch_size)
+    
+    print(f"Read {report.rows} rows in {report.seconds:.1f}s ({report.rows_per_second:,.0f} rows/s)")
+    print(f"Inserted {report.inserted}, updated {report.updated}, "
+          f"skipped {report.skipped}, rejected {report.rejected}")
+    for line, message in report.errors[:10]:
+        print(f"  line {line}: {message}")
+    if rejects and report.errors:
+        with open(rejects, 'w', newline='') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['line', 'error'])
+            writer.writerows(report.errors)
+        print(f"Wrote {len(report.errors)} rejects to {rejects}")
+
 @app.cli.command("backup-db")
 def backup_db():
     """Backup database using the backup script"""
@@ -7,28 +7,31 @@ var salesChart = null;
 function loadDashboardStats() {
     fetch('/api/dashboard-stats')
         .then(response => response.json())
-        .then(data => {
-            // Update Today's Sales
-            document.getElementById('todaySales').textContent = formatCurrency(data.today_sales);
-            const changeElement = document.getElementById('salesChange');
-            changeElement.textContent = data.sales_change + '% from yesterday';
-            changeElement.className = 'card-text ' + (data.sales_change >= 0 ? 'text-success' : 'text-danger');
-            
-            // Update This Month
-            document.getElementById('monthSales').textContent = formatCurrency(data.month_sales);
-            
-            // Update Low Stock Count
-            document.getElementById('lowStockCount').textContent = data.low_stock_count;
-            
-            // Update Total Customers
-            document.getElementById('totalCustomers').textContent = data.total_customers;
-        })
+        .then(renderDashboardStats)
         .catch(error => {
             console.error('Error loading dashboard stats:', error);
             showError('Failed to load dashboard statistics');
         });
 }
 
+// Update the stat cards from a stats payload
+function renderDashboardStats(data) {
+    // Update Today's Sales
+    document.getElementById('todaySales').textContent = formatCurrency(data.today_sales);
+    const changeElement = document.getElementById('salesChange');
+    changeElement.textContent = data.sales_change + '% from yesterday';
+    changeElement.className = 'card-text ' + (data.sales_change >= 0 ? 'text-success' : 'text-danger');
+    
+    // Update This Month
+    document.getElementById('monthSales').textContent = formatCurrency(data.month_sales);
+    
+    // Update Low Stock Count
+    document.getElementById('lowStockCount').textContent = data.low_stock_count;
+    
+    // Update Total Customers
+    document.getElementById('totalCustomers').textContent = data.total_customers;
+}
+
 // Load sales chart
 function loadSalesChart() {
     fetch('/api/sales-data')
@@ -139,7 +142,7 @@ function viewSaleDetails(saleId) {
                     <div class="modal-dialog modal-lg">
                         <div class="modal-content">
                             <div class="modal-header">
-                                <h5 class="modal-title">Sale Details: ${sale.invoice_number}</h5>
+                                <h5 class="modal-title">Sale Details: ${escapeHtml(sale.invoice_number)}</h5>
                                 <button type="button" class="btn-close" data-bs-dismiss="modal"></button>
                             </div>
                             <div class="modal-body">
@@ -147,9 +150,9 @@ function viewSaleDetails(saleId) {
                                     <div class="col-md-6">
                                         <h6>Sale Information</h6>
                                         <table class="table table-sm">
-                                            <tr><th>Date:</th><td>${formatDateTime(sale.sale_date)}</td></tr>
-                                            <tr><th>Customer:</th><td>${sale.customer_name || 'Walk-in'}</td></tr>
-                                            <tr><th>Payment Method:</th><td>${sale.payment_method}</td></tr>
+                                            <tr><th>Date:</th><td>${escapeHtml(formatDateTime(sale.sale_date))}</td></tr>
+                                            <tr><th>Customer:</th><td>${escapeHtml(sale.customer_name || 'Walk-in')}</td></tr>
+                                            <tr><th>Payment Method:</th><td>${escapeHtml(sale.payment_method)}</td></tr>
                                             <tr><th>Status:</th><td><span class="badge bg-success">Paid</span></td></tr>
                                         </table>
                                     </div>
@@ -178,8 +181,8 @@ function viewSaleDetails(saleId) {
                                         <tbody>
                                             ${sale.items.map(item => `
                                                 <tr>
-                                                    <td>${item.product_name}</td>
-                                                    <td>${item.quantity}</td>
+                                                    <td>${escapeHtml(item.product_name)}</td>
+                                                    <td>${escapeHtml(item.quantity)}</td>
                                                     <td>${formatCurrency(item.unit_price)}</td>
                                                     <td>${formatCurrency(item.subtotal)}</td>
                                                 </tr>
@@ -217,11 +220,7 @@ function viewSaleDetails(saleId) {
 
 // Print invoice
 function printInvoice(saleId) {
-    // In a real implementation, this would open a print-friendly invoice page
     window.open(`/invoice/${saleId}/print`, '_blank');
-    
-    // For demo purposes, show message
-    showSuccess('Opening printable invoice...');
 }
 
 // Quick actions
@@ -250,8 +249,11 @@ function initDashboard() {
     loadDashboardStats();
     loadSalesChart();
     
-    // Set up auto-refresh (every 2 minutes)
-    setInterval(loadDashboardStats, 120000);
+    // Live updates are pushed by the server; fall back to polling every
+    // 2 minutes when the browser has no EventSource support
+    if (!setupRealTimeUpdates()) {
+        setInterval(loadDashboardStats, 120000);
+    }
     
     // Add refresh button if not exists
     if (!document.getElementById('refreshBtn')) {
@@ -264,36 +266,29 @@ function initDashboard() {
             `;
         }
     }
-    
-    // Initialize real-time updates for today's sales
-    setupRealTimeUpdates();
 }
 
-// Setup real-time updates (simulated)
+// Subscribe to server-pushed dashboard statistics
+var dashboardStream = null;
+
 function setupRealTimeUpdates() {
-    // In a real implementation, this would use WebSockets
-    // For now, we'll simulate updates every 30 seconds
-    setInterval(() => {
-        // Update today's sales with a small random change
-        const todaySalesEl = document.getElementById('todaySales');
-        if (todaySalesEl) {
-            const currentText = todaySalesEl.textContent;
-            const currentAmount = parseFloat(currentText.replace(/[^0-9.-]+/g, ""));
-            if (!isNaN(currentAmount)) {
-                const change = Math.random() * 1000 - 500; // Random change between -500 and +500
-                const newAmount = Math.max(0, currentAmount + change);
-                todaySalesEl.textContent = formatCurrency(newAmount);
-                
-                // Update change indicator
-                const changeEl = document.getElementById('salesChange');
-                if (changeEl) {
-                    const changePercent = ((change / currentAmount) * 100).toFixed(2);
-                    changeEl.textContent = (change >= 0 ? '+' : '') + changePercent + '% from last update';
-                    changeEl.className = 'card-text ' + (change >= 0 ? 'text-success' : 'text-danger');
-                }
-            }
-        }
-    }, 30000); // Update every 30 seconds
+    if (!window.EventSource) {
+        return false;
+    }
+    if (dashboardStream) {
+        return true;
+    }
+    
+    // EventSource reconnects on its own and resends Last-Event-ID,
+    // so the server only replays a snapshot if we missed one
+    dashboardStream = new EventSource('/api/stream/dashboard');
+    dashboardStream.addEventListener('stats', function(event) {
+        renderDashboardStats(JSON.parse(event.data));
+    });
+    dashboardStream.onerror = function() {
+        console.warn('Dashboard stream interrupted, reconnecting...');
+    };
+    return true;
 }
 
 // Export dashboard data
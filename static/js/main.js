@@ -49,6 +49,13 @@ function formatCurrencyOnPage() {
     });
 }
 
+// Escape text for interpolation into HTML strings
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value == null ? '' : value;
+    return div.innerHTML;
+}
+
 // Format currency with MWK prefix
 function formatCurrency(amount) {
     if (typeof amount !== 'number') {
@@ -284,6 +291,42 @@ function exportToCSV(data, filename) {
     downloadFile(filename + '.csv', csv, 'text/csv');
 }
 
+// Upload a CSV file to a bulk import endpoint and reload with the result
+function importCsv(url) {
+    var input = document.createElement('input');
+    input.type = 'file';
+    input.accept = '.csv,text/csv';
+    input.onchange = function() {
+        if (!input.files.length) return;
+        var form = new FormData();
+        form.append('file', input.files[0]);
+        
+        fetch(url, {method: 'POST', body: form, headers: {'X-Requested-With': 'XMLHttpRequest'}})
+            .then(function(response) {
+                return response.json().then(function(body) {
+                    if (!response.ok) throw new Error(body.error || response.statusText);
+                    return body;
+                });
+            })
+            .then(function(report) {
+                var message = `Imported ${report.inserted} new, ${report.updated} updated, ` +
+                    `${report.skipped} skipped, ${report.rejected} rejected ` +
+                    `(${numberWithCommas(Math.round(report.rows_per_second))} rows/s)`;
+                if (report.rejected) {
+                    var first = report.errors[0];
+                    showWarning(`${message}. Line ${first.line}: ${escapeHtml(first.error)}`);
+                } else {
+                    showSuccess(message);
+                    setTimeout(function() { window.location.reload(); }, 2000);
+                }
+            })
+            .catch(function(error) {
+                showError('Import failed: ' + escapeHtml(error.message));
+            });
+    };
+    input.click();
+}
+
 // Theme switcher (light/dark mode)
 function toggleTheme() {
     var html = document.documentElement;
@@ -0,0 +1,109 @@
+"""
+Tests for the API result cache
+"""
+
+import os
+import tempfile
+import unittest
+from unittest import mock
+from datetime import datetime
+from app import create_app, db
+from app.models import User, Sale
+from app.cache import LRUCache, NullCache, SQLiteCache
+
+class CacheBackendTestCase(unittest.TestCase):
+    """Test case for cache backends"""
+
+    def test_lru_eviction_and_expiry(self):
+        """Test the LRU drops old and expired entries"""
+        cache = LRUCache(max_entries=2, default_timeout=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b'))
+
+        with mock.patch('app.cache.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(cache.get('a'))
+
+    def test_sqlite_backend_is_shared(self):
+        """Test two handles on one file see the same entries and versions"""
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'cache.sqlite')
+            first, second = SQLiteCache(path), SQLiteCache(path)
+
+            first.set('key', b'body')
+            first.bump(['sales'])
+
+            self.assertEqual(second.get('key'), b'body')
+            self.assertEqual(second.versions(['sales', 'products']), (1, 0))
+            self.assertEqual(first.epoch, second.epoch)
+
+class CachedApiTestCase(unittest.TestCase):
+    """Test case for cached JSON endpoints"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        user = User(username='cacher', email='cacher@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'cacher', 'password': 'pass'})
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_etag_and_not_modified(self):
+        """Test unchanged data returns 304 for a matching ETag"""
+        first = self.client.get('/api/dashboard-stats')
+        self.assertEqual(first.status_code, 200)
+        self.assertIsNotNone(first.headers.get('ETag'))
+
+        again = self.client.get('/api/dashboard-stats', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+    def test_sale_write_invalidates(self):
+        """Test committing a sale changes the ETag and the body"""
+        first = self.client.get('/api/dashboard-stats')
+
+        db.session.add(Sale(invoice_number='INV-CACHE', sale_date=datetime.now(), total_amount=250))
+        db.session.commit()
+
+        second = self.client.get('/api/dashboard-stats', headers={'If-None-Match': first.headers['ETag']})
+        self.assertEqual(second.status_code, 200)
+        self.assertNotEqual(second.headers['ETag'], first.headers['ETag'])
+        self.assertEqual(second.get_json()['today_sales'], 250)
+
+    def test_cached_body_is_reused(self):
+        """Test a repeated request is served from the cache"""
+        backend = self.app.extensions['result_cache']
+        self.client.get('/api/sales-data')
+        hits = backend.hits
+
+        response = self.client.get('/api/sales-data')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(backend.hits, hits + 1)
+
+    def test_null_backend_never_revalidates(self):
+        """Test a disabled cache sends no ETag and never answers 304"""
+        etag = self.client.get('/api/dashboard-stats').headers['ETag']
+        self.app.extensions['result_cache'] = NullCache()
+
+        response = self.client.get('/api/dashboard-stats', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.headers.get('ETag'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+"""
+Tests for connection pool and query instrumentation
+"""
+
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, exc, text
+from app import create_app, db
+from app.auth import create_default_admin
+from app.models import User
+from app.dbmonitor import DatabaseMonitor, monitor_for
+
+class DatabaseMonitorTestCase(unittest.TestCase):
+    """Test case for pool gauges, checkout waits and the slow-query log"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        create_default_admin()
+
+        # A file database gets a real QueuePool, sized to force a timeout
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        self.engine = create_engine(f'sqlite:///{self.path}', pool_size=1, max_overflow=0, pool_timeout=0.05,
+                                    pool_pre_ping=True)
+        self.monitor = DatabaseMonitor(self.app, self.engine)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        self.engine.dispose()
+        os.remove(self.path)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_pool_gauges_and_timeout(self):
+        """Test active connections are counted and exhausted waits time out"""
+        first = self.engine.connect()
+        self.assertEqual(self.monitor.active, 1)
+        with self.assertRaises(exc.TimeoutError):
+            self.engine.connect()
+        first.close()
+
+        stats = self.monitor.snapshot()
+        self.assertEqual((stats['active'], stats['peak_active'], stats['timeouts']), (0, 1, 1))
+        self.assertEqual(stats['checkout_wait']['count'], 2)
+        self.assertGreaterEqual(stats['checkout_wait']['max_ms'], 50)
+        self.assertEqual(stats['pool']['class'], 'QueuePool')
+        self.assertEqual(stats['pool']['checkedout'], 0)
+
+    def test_dispose_keeps_instrumentation(self):
+        """Test the recreated pool is still timed after dispose"""
+        self.engine.dispose()
+        with self.engine.connect() as conn:
+            conn.execute(text('select 1'))
+        self.assertEqual(self.monitor.checkout_wait.count, 1)
+        self.assertEqual(self.monitor.queries.count, 1)
+
+    def test_slow_query_log(self):
+        """Test statements over the threshold are logged with their SQL"""
+        self.monitor.slow_query_seconds = 0
+        with self.assertLogs(self.app.logger, 'WARNING') as logs:
+            with self.engine.connect() as conn:
+                conn.execute(text('select   42'))
+        self.assertIn('select 42', logs.output[0])
+        self.assertEqual(self.monitor.slow_queries, 1)
+
+        with self.engine.connect() as conn:
+            with self.assertRaises(exc.OperationalError):
+                conn.execute(text('select * from missing_table'))
+            self.assertEqual(conn.info.get('query_started', []), [])
+
+    def test_app_engine_and_stats_endpoint(self):
+        """Test the app's engine is instrumented and stats are admin only"""
+        db.session.execute(text('select 1'))
+        self.assertGreater(monitor_for(self.app).queries.count, 0)
+
+        client = self.app.test_client()
+        client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+        stats = client.get('/api/db-stats').get_json()
+        self.assertIn('checkout_wait', stats)
+
+        user = User(username='clerk', email='clerk@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        client.get('/auth/logout')
+        client.post('/auth/login', data={'username': 'clerk', 'password': 'pass'})
+        self.assertEqual(client.get('/api/db-stats').status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
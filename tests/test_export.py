@@ -0,0 +1,125 @@
+"""
+Tests for streaming exports
+"""
+
+import csv
+import io
+import json
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import User, Customer, Product, Sale
+from app.export import export_statement, stream_export
+
+class ExportTestCase(unittest.TestCase):
+    """Test case for CSV / NDJSON exports"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.customer = Customer(name='Export Customer', customer_type='wholesale')
+        db.session.add_all([self.customer, Product(name='Export Product', category='Tools', price=10, cost=5)])
+        db.session.commit()
+
+        base = datetime(2024, 3, 1, 9, 0)
+        for i in range(7):
+            db.session.add(Sale(
+                invoice_number=f'INV-E{i}',
+                customer_id=self.customer.id if i % 2 else None,
+                sale_date=base + timedelta(days=i),
+                total_amount=100 + i,
+                payment_method='card' if i % 3 == 0 else 'cash'
+            ))
+        db.session.commit()
+
+        user = User(username='exporter', email='exporter@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def login(self):
+        self.client.post('/auth/login', data={'username': 'exporter', 'password': 'pass'})
+
+    def read_csv(self, body):
+        return list(csv.DictReader(io.StringIO(body.decode('utf-8'))))
+
+    def test_streams_in_batches(self):
+        """Test each batch becomes one chunk and every row is written once"""
+        chunks = list(stream_export(export_statement('sales', {}), 'csv', batch_size=3))
+
+        self.assertEqual(len(chunks), 3)
+        rows = self.read_csv(b''.join(chunks))
+        self.assertEqual([row['invoice_number'] for row in rows],
+                         [f'INV-E{i}' for i in range(6, -1, -1)])
+        self.assertEqual(rows[0]['customer_name'], '')
+        self.assertEqual(rows[1]['customer_name'], 'Export Customer')
+
+    def test_sales_filters_match_listing(self):
+        """Test the sales export accepts the sales page filters"""
+        self.login()
+        response = self.client.get('/export/sales.csv?date_from=2024-03-02&date_to=2024-03-05&payment_method=cash')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/csv')
+        self.assertIn('attachment', response.headers['Content-Disposition'])
+        invoices = [row['invoice_number'] for row in self.read_csv(response.data)]
+        self.assertEqual(invoices, ['INV-E4', 'INV-E2', 'INV-E1'])
+
+    def test_ndjson(self):
+        """Test NDJSON exports one object per line"""
+        self.login()
+        response = self.client.get('/export/customers.ndjson?sort=total_spent&order=desc')
+        self.assertEqual(response.mimetype, 'application/x-ndjson')
+        lines = [json.loads(line) for line in response.data.decode().splitlines()]
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(lines[0]['name'], 'Export Customer')
+        self.assertEqual((lines[0]['order_count'], lines[0]['total_spent']), (3, 309.0))
+
+    def test_products_and_report(self):
+        """Test the product and report datasets"""
+        db.session.add(Product(name='Spare Part', category='Tools', price=4, cost=2, stock_quantity=50))
+        db.session.commit()
+        self.login()
+        products = self.read_csv(self.client.get('/export/products.csv?category=Tools').data)
+        self.assertEqual([row['name'] for row in products], ['Export Product', 'Spare Part'])
+        # The same stock and text filters as the inventory listing
+        products = self.read_csv(self.client.get('/export/products.csv?category=Tools&stock=out').data)
+        self.assertEqual([row['name'] for row in products], ['Export Product'])
+        products = self.read_csv(self.client.get('/export/products.csv?q=spare').data)
+        self.assertEqual([row['name'] for row in products], ['Spare Part'])
+
+        report = self.read_csv(self.client.get('/export/report.csv?date_from=2024-03-01&date_to=2024-03-03').data)
+        self.assertEqual([row['day'] for row in report], ['2024-03-01', '2024-03-02', '2024-03-03'])
+        self.assertEqual(report[1]['customer_type'], 'wholesale')
+        self.assertEqual(float(report[2]['revenue']), 102.0)
+
+    def test_bad_requests(self):
+        """Test unknown datasets 404 and bad filters 400"""
+        self.login()
+        self.assertEqual(self.client.get('/export/expenses.csv').status_code, 404)
+        self.assertEqual(self.client.get('/export/sales.xlsx').status_code, 404)
+        self.assertEqual(self.client.get('/export/sales.csv?date_from=nope').status_code, 400)
+        self.assertEqual(self.client.get('/export/customers.csv?sort=email').status_code, 400)
+        self.assertEqual(self.client.get('/export/products.csv?stock=nope').status_code, 400)
+
+    def test_empty_export_has_header(self):
+        """Test a CSV export with no matching rows still carries its header"""
+        self.login()
+        response = self.client.get('/export/products.csv?category=None')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data.decode('utf-8').splitlines(),
+                         ['id,name,category,price,cost,stock_quantity,min_stock'])
+        self.assertEqual(self.client.get('/export/products.ndjson?category=None').data, b'')
+
+if __name__ == '__main__':
+    unittest.main()
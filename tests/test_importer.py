@@ -0,0 +1,158 @@
+"""
+Tests for the bulk CSV importer
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from app import create_app, db
+from app.models import User, Customer, Product, Sale, SaleItem, DailySalesRollup
+from app.importer import import_csv
+
+CUSTOMERS = """name,email,phone,customer_type
+Alice,alice@example.com,0991,wholesale
+Bob,,0992,
+Carol,carol@example.com,,vip
+"""
+
+PRODUCTS = """name,price,cost,stock_quantity,category
+Widget,10,6,100,Tools
+Gadget,25.5,15,,Tools
+Broken,abc,1,,
+"""
+
+SALES = """invoice_number,sale_date,customer_email,payment_method,product,quantity,unit_price,tax
+POS-1,2024-05-01T10:00:00,alice@example.com,card,Widget,2,,1.5
+POS-1,2024-05-01T10:00:00,alice@example.com,card,Gadget,1,20,1.5
+POS-2,2024-05-01 12:30,,cash,Widget,3,,
+POS-3,2024-05-02,,cash,Nothing,1,,
+POS-4,2024-05-02,,cash,Widget,1,,
+POS-4,2024-05-02,,cash,Widget,0,,
+"""
+
+class ImporterTestCase(unittest.TestCase):
+    """Test case for validated, batched CSV imports"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.upload_folder = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.upload_folder
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.upload_folder)
+
+    def load(self, dataset, text, batch_size=2):
+        return import_csv(dataset, io.StringIO(text), batch_size=batch_size)
+
+    def test_customers_upsert(self):
+        """Test new customers insert, known ones update and bad rows are rejected"""
+        report = self.load('customers', CUSTOMERS)
+        self.assertEqual((report.rows, report.inserted, report.rejected), (3, 2, 1))
+        self.assertEqual(report.errors[0][0], 4)
+        self.assertIn('customer_type', report.errors[0][1])
+
+        report = self.load('customers', "name,email,customer_type\nAlice Smith,alice@example.com,retail\nBob,,business\n")
+        self.assertEqual((report.inserted, report.updated), (0, 2))
+        alice = Customer.query.filter_by(email='alice@example.com').one()
+        self.assertEqual((alice.name, alice.customer_type), ('Alice Smith', 'retail'))
+        self.assertEqual(Customer.query.filter_by(name='Bob').one().customer_type, 'business')
+        self.assertEqual(Customer.query.count(), 2)
+
+    def test_products_upsert(self):
+        """Test products key on name and absent columns keep their values"""
+        report = self.load('products', PRODUCTS)
+        self.assertEqual((report.inserted, report.rejected), (2, 1))
+        self.assertIn('price is not a number', report.errors[0][1])
+
+        report = self.load('products', "name,price,cost\nWidget,12,7\n")
+        self.assertEqual(report.updated, 1)
+        widget = Product.query.filter_by(name='Widget').one()
+        self.assertEqual((widget.price, widget.stock_quantity, widget.category), (12, 100, 'Tools'))
+
+    def test_sales_import(self):
+        """Test invoices group their lines, resolve keys and feed the rollup"""
+        self.load('customers', CUSTOMERS)
+        self.load('products', PRODUCTS)
+
+        report = self.load('sales', SALES)
+        self.assertEqual((report.rows, report.inserted, report.rejected), (6, 2, 2))
+        self.assertEqual([line for line, _ in report.errors], [5, 6])
+        self.assertIn("unknown product 'Nothing'", report.errors[0][1])
+        self.assertIn('quantity must be at least 1', report.errors[1][1])
+
+        sale = Sale.query.filter_by(invoice_number='POS-1').one()
+        self.assertEqual(sale.customer.name, 'Alice')
+        self.assertEqual(len(sale.items), 2)
+        self.assertAlmostEqual(sale.total_amount, 2 * 10 + 20 + 1.5)
+        self.assertIsNone(Sale.query.filter_by(invoice_number='POS-2').one().customer_id)
+        self.assertEqual(SaleItem.query.count(), 3)
+
+        rollup = {(r.customer_type, r.payment_method): (r.sale_count, r.revenue) for r in DailySalesRollup.query}
+        self.assertEqual(rollup, {('wholesale', 'card'): (1, 41.5), ('walk_in', 'cash'): (1, 30.0)})
+
+        again = self.load('sales', SALES)
+        self.assertEqual((again.inserted, again.skipped), (0, 2))
+        self.assertEqual(Sale.query.count(), 2)
+
+        # Re-typing a customer moves their sales, as a rebuild would
+        self.load('customers', "name,email,customer_type\nAlice,alice@example.com,business\n")
+        rollup = {(r.customer_type, r.payment_method): (r.sale_count, r.revenue)
+                  for r in DailySalesRollup.query if r.sale_count}
+        self.assertEqual(rollup, {('business', 'card'): (1, 41.5), ('walk_in', 'cash'): (1, 30.0)})
+
+    def test_split_invoice_is_rejected(self):
+        """Test a non-contiguous block of an invoice's lines is rejected, not skipped"""
+        self.load('products', PRODUCTS)
+        report = self.load('sales', "invoice_number,sale_date,product,quantity\n"
+                                    "POS-9,2024-05-03,Widget,1\nPOS-10,2024-05-03,Widget,1\n"
+                                    "POS-9,2024-05-03,Gadget,2\n", batch_size=1)
+        self.assertEqual((report.inserted, report.skipped, report.rejected), (2, 0, 1))
+        self.assertEqual(report.errors[0][0], 4)
+        self.assertIn('already started at line 2', report.errors[0][1])
+
+    def test_bad_header(self):
+        """Test empty files and unknown datasets are refused"""
+        with self.assertRaises(ValueError):
+            self.load('customers', '')
+        with self.assertRaises(ValueError):
+            self.load('expenses', 'name\nx\n')
+
+    def test_upload_requires_manager(self):
+        """Test the upload endpoint imports for managers only"""
+        for username, role in (('clerk', 'staff'), ('boss', 'manager')):
+            user = User(username=username, email=f'{username}@example.com', role=role)
+            user.set_password('pass')
+            db.session.add(user)
+        db.session.commit()
+
+        def upload():
+            return self.client.post('/api/import/products', data={
+                'file': (io.BytesIO(PRODUCTS.encode()), 'products.csv')
+            }, content_type='multipart/form-data')
+
+        self.client.post('/auth/login', data={'username': 'clerk', 'password': 'pass'})
+        self.assertEqual(upload().status_code, 403)
+        self.client.get('/auth/logout')
+
+        self.client.post('/auth/login', data={'username': 'boss', 'password': 'pass'})
+        response = upload()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['inserted'], 2)
+        self.assertEqual(Product.query.count(), 2)
+        # Uploads hold personal data and are never written under the static folder
+        self.assertEqual(os.listdir(self.upload_folder), [])
+        self.assertEqual(self.client.post('/api/import/products').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,121 @@
+"""
+Tests for the inventory summary and product listing
+"""
+
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User, Product
+from app.inventory import inventory_summary, list_products
+
+class InventoryTestCase(unittest.TestCase):
+    """Test case for the SQL-side inventory KPIs and paginated listing"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        db.session.add_all([
+            Product(name='Apple', category='Food', price=2, cost=1, stock_quantity=100, min_stock=10),
+            Product(name='Banana', category='Food', price=1, cost=0.5, stock_quantity=3, min_stock=10),
+            Product(name='Cable', category='Electronics', price=20, cost=8, stock_quantity=0, min_stock=5,
+                    description='USB charging cable'),
+            Product(name='Desk Lamp', category='Electronics', price=40, cost=25, stock_quantity=12, min_stock=4),
+            Product(name='Eraser 50%', category='Stationery', price=1, cost=0.25, stock_quantity=7, min_stock=10),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def names(self, filters=None, **kwargs):
+        return [product.name for product in list_products(filters, **kwargs).products]
+
+    def count_statements(self, func):
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            result = func()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+        return result, statements
+
+    def test_summary_matches_python_totals(self):
+        """Test the aggregate agrees with summing every product in Python"""
+        products = Product.query.all()
+        summary, statements = self.count_statements(inventory_summary)
+
+        self.assertEqual(len(statements), 1)
+        self.assertEqual(summary.total_products, 5)
+        self.assertAlmostEqual(summary.total_stock_value,
+                               sum(p.stock_quantity * p.cost for p in products))
+        self.assertEqual(summary.low_stock_count,
+                         sum(1 for p in products if 0 < p.stock_quantity < p.min_stock))
+        self.assertEqual(summary.out_of_stock_count, 1)
+
+    def test_empty_summary(self):
+        """Test an empty catalogue gives zeros"""
+        Product.query.delete()
+        db.session.commit()
+
+        self.assertEqual(tuple(inventory_summary()), (0, 0.0, 0, 0))
+
+    def test_filters(self):
+        """Test category, stock status and text filters"""
+        self.assertEqual(self.names({'category': 'Food'}), ['Apple', 'Banana'])
+        # Statuses are disjoint: out-of-stock products are not also low
+        self.assertEqual(self.names({'stock': 'low'}), ['Banana', 'Eraser 50%'])
+        self.assertEqual(self.names({'stock': 'out'}), ['Cable'])
+        self.assertEqual(self.names({'stock': 'good'}), ['Apple', 'Desk Lamp'])
+        self.assertEqual(self.names({'q': 'usb'}), ['Cable'])
+        self.assertEqual(self.names({'q': '50%'}), ['Eraser 50%'])
+        self.assertEqual(self.names({'category': 'Electronics', 'stock': 'out'}), ['Cable'])
+        self.assertEqual(self.names({'category': 'Electronics', 'stock': 'low'}), [])
+
+    def test_sort_and_pages(self):
+        """Test server-side sorting and offset pages"""
+        self.assertEqual(self.names(sort='stock_quantity', descending=True),
+                         ['Apple', 'Desk Lamp', 'Eraser 50%', 'Banana', 'Cable'])
+
+        page = list_products(sort='price', page=2, per_page=2)
+        self.assertEqual([p.name for p in page.products], ['Apple', 'Cable'])
+        self.assertEqual(page.total, 5)
+
+        with self.assertRaises(ValueError):
+            list_products(sort='description')
+
+    def test_inventory_api(self):
+        """Test the JSON endpoint filters, sorts and pages, and the page renders"""
+        user = User(username='stocker', email='stocker@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'stocker', 'password': 'pass'})
+
+        response = self.client.get('/api/inventory?stock=low&sort=name&order=desc&per_page=2')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual([p['name'] for p in data['products']], ['Eraser 50%', 'Banana'])
+        self.assertEqual({p['stock_status'] for p in data['products']}, {'low'})
+        self.assertEqual((data['page'], data['per_page'], data['total']), (1, 2, 2))
+
+        self.assertEqual(self.client.get('/api/inventory?stock=bogus').status_code, 400)
+        self.assertEqual(self.client.get('/api/inventory?sort=bogus').status_code, 400)
+
+        response = self.client.get('/inventory')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Electronics', response.data)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Tests for the sale detail API and printable invoices
+"""
+
+import unittest
+from datetime import datetime
+from unittest import mock
+from flask import render_template
+from sqlalchemy import event
+from app import create_app, db
+from app.invoices import load_sale, sale_detail
+from app.models import User, Customer, Product, Sale, SaleItem
+
+class InvoiceTestCase(unittest.TestCase):
+    """Test case for /api/sale/<id> and /invoice/<id>"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        user = User(username='printer', email='printer@example.com')
+        user.set_password('pass')
+        customer = Customer(name='Chikondi Traders')
+        products = [Product(name=f'Item {i}', price=100 + i, cost=50, stock_quantity=100) for i in range(6)]
+        db.session.add_all([user, customer] + products)
+        db.session.flush()
+        self.sale = Sale(invoice_number='INV-1', customer_id=customer.id, sale_date=datetime(2024, 3, 1, 9, 30),
+                         total_amount=0, discount=10, tax=5, payment_method='card', notes='Deliver (rear)')
+        self.sale.items = [SaleItem(product_id=p.id, quantity=2, unit_price=p.price, subtotal=2 * p.price)
+                           for p in products]
+        self.sale.total_amount = self.sale.calculate_total()
+        db.session.add(self.sale)
+        db.session.commit()
+        self.sale_id = self.sale.id
+        db.session.expunge_all()
+        self.client.post('/auth/login', data={'username': 'printer', 'password': 'pass'})
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_queries(self, func, table=None):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            result = func()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        if table is not None:
+            statements = [s for s in statements if f'FROM {table} ' in s or f'FROM {table}\n' in s]
+        return result, len(statements)
+
+    def test_detail_loads_in_constant_queries(self):
+        """Test the sale, customer, items and products load in four queries"""
+        detail, queries = self.count_queries(lambda: sale_detail(load_sale(self.sale_id)))
+
+        self.assertEqual(queries, 4)
+        self.assertEqual(detail['customer_name'], 'Chikondi Traders')
+        self.assertEqual([item['product_name'] for item in detail['items']], [f'Item {i}' for i in range(6)])
+        self.assertEqual(detail['subtotal'], 2 * sum(100 + i for i in range(6)))
+        self.assertIsNone(load_sale(999))
+
+    def test_sale_api(self):
+        """Test the detail endpoint the dashboard modal reads"""
+        data = self.client.get(f'/api/sale/{self.sale_id}').get_json()
+        self.assertEqual((data['invoice_number'], data['total_amount'], len(data['items'])), ('INV-1', 1225.0, 6))
+        self.assertEqual(self.client.get('/api/sale/999').status_code, 404)
+
+    def test_detail_cached_by_sale(self):
+        """Test other sales do not evict a sale's detail, and reprints skip the database"""
+        self.client.get(f'/api/sale/{self.sale_id}')
+        self.client.get(f'/invoice/{self.sale_id}/print')
+        db.session.add(Sale(invoice_number='INV-2', total_amount=10, payment_method='cash'))
+        db.session.commit()
+
+        response, queries = self.count_queries(lambda: self.client.get(f'/api/sale/{self.sale_id}'), 'sale')
+        self.assertEqual((response.get_json()['invoice_number'], queries), ('INV-1', 0))
+        response, queries = self.count_queries(lambda: self.client.get(f'/invoice/{self.sale_id}/print'), 'sale')
+        self.assertEqual((response.status_code, queries), (200, 0))
+
+    def test_pdf_filename_is_sanitised(self):
+        """Test an invoice number cannot break out of the Content-Disposition header"""
+        sale = db.session.get(Sale, self.sale_id)
+        sale.invoice_number = 'INV "7"/\r\nX: y'
+        db.session.commit()
+        disposition = self.client.get(f'/invoice/{self.sale_id}.pdf').headers['Content-Disposition']
+        self.assertEqual(disposition, 'inline; filename="INV_7_X_y.pdf"')
+
+    def test_invoices_render_once(self):
+        """Test reprints come from the content-addressed cache and revalidate by ETag"""
+        with mock.patch('app.invoices.render_template', wraps=render_template) as render:
+            first = self.client.get(f'/invoice/{self.sale_id}/print')
+            second = self.client.get(f'/invoice/{self.sale_id}/print')
+        self.assertEqual(render.call_count, 1)
+        self.assertEqual(first.data, second.data)
+        self.assertIn(b'Chikondi Traders', first.data)
+        etag = first.headers['ETag']
+
+        self.assertEqual(self.client.get(f'/invoice/{self.sale_id}/print',
+                                         headers={'If-None-Match': etag}).status_code, 304)
+
+        pdf = self.client.get(f'/invoice/{self.sale_id}.pdf')
+        self.assertEqual(pdf.mimetype, 'application/pdf')
+        self.assertTrue(pdf.data.startswith(b'%PDF-1.4') and pdf.data.rstrip().endswith(b'%%EOF'))
+        self.assertIn(b'INVOICE INV-1', pdf.data)
+        self.assertIn(b'Deliver \\(rear\\)', pdf.data)
+        self.assertNotEqual(pdf.headers['ETag'], etag)
+
+        # A corrected sale hashes to a new invoice
+        db.session.get(Sale, self.sale_id).notes = 'Collect'
+        db.session.commit()
+        changed = self.client.get(f'/invoice/{self.sale_id}/print')
+        self.assertNotEqual(changed.headers['ETag'], etag)
+        self.assertIn(b'Collect', changed.data)
+        self.assertEqual(self.client.get('/invoice/999/print').status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+"""
+Tests for background report jobs
+"""
+
+import threading
+import unittest
+from datetime import datetime
+from unittest import mock
+from app import create_app, db
+from app.models import User, Customer, Sale
+from app.jobs import FINISHED, QueueFull, ReportJobs, REPORT_TYPES
+
+class ReportJobsTestCase(unittest.TestCase):
+    """Test case for report job submission and caching"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        customer = Customer(name='Job Customer')
+        db.session.add(customer)
+        db.session.commit()
+        db.session.add_all([
+            Sale(invoice_number='INV-J1', customer_id=customer.id, sale_date=datetime(2024, 6, 1, 9), total_amount=100),
+            Sale(invoice_number='INV-J2', sale_date=datetime(2024, 6, 2, 9), total_amount=50),
+        ])
+        user = User(username='reporter', email='reporter@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'reporter', 'password': 'pass'})
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def submit(self, **data):
+        return self.client.post('/api/reports', json=data)
+
+    def test_sales_report_job(self):
+        """Test a sales report runs and its status can be fetched"""
+        response = self.submit(type='sales', date_from='2024-06-01', date_to='2024-06-30')
+        self.assertEqual(response.status_code, 200)
+        job = response.get_json()
+        self.assertEqual(job['status'], FINISHED)
+        self.assertFalse(job['cached'])
+        self.assertEqual(job['result']['total_sales'], 150.0)
+
+        status = self.client.get(job['url']).get_json()
+        self.assertEqual(status['job_id'], job['job_id'])
+        self.assertEqual(status['result']['total_transactions'], 2)
+
+    def test_status_from_another_worker(self):
+        """Test a job accepted by one worker can be polled on another sharing the cache"""
+        job = self.submit(type='sales', date_from='2024-06-01', date_to='2024-06-30').get_json()
+
+        # A second executor stands in for another worker process
+        other = ReportJobs(self.app)
+        status = other.get(job['job_id']).to_dict()
+        self.assertEqual((status['status'], status['result']['total_sales']), (FINISHED, 150.0))
+        self.assertIsNone(other.get('missing'))
+
+    def test_identical_requests_hit_cache(self):
+        """Test repeated requests are served from the cache until data changes"""
+        self.submit(type='customers')
+        again = self.submit(type='customers').get_json()
+        self.assertTrue(again['cached'])
+        self.assertEqual(again['result'][0]['name'], 'Job Customer')
+
+        period = {'type': 'sales', 'date_from': '2024-06-01', 'date_to': '2024-06-30'}
+        self.submit(**period)
+        self.assertTrue(self.submit(**period).get_json()['cached'])
+
+        db.session.add(Sale(invoice_number='INV-J3', sale_date=datetime(2024, 6, 3, 9), total_amount=25))
+        db.session.commit()
+        fresh = self.submit(**period).get_json()
+        self.assertFalse(fresh['cached'])
+        self.assertEqual(fresh['result']['total_sales'], 175.0)
+
+    def test_bad_requests(self):
+        """Test validation errors and unknown jobs"""
+        self.assertEqual(self.submit(type='payroll').status_code, 400)
+        self.assertEqual(self.submit(type='sales', date_from='2024-06-30', date_to='2024-06-01').status_code, 400)
+        self.assertEqual(self.submit(type='sales').status_code, 400)
+        self.assertEqual(self.client.get('/api/reports/missing').status_code, 404)
+
+    def test_bounded_pool(self):
+        """Test background jobs dedupe identical work and reject when the queue is full"""
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def slow_report(params):
+            calls.append(params)
+            started.set()
+            release.wait(5)
+            return {'value': params['n']}
+
+        self.app.config.update(REPORT_WORKERS=1, REPORT_MAX_PENDING=1)
+        jobs = ReportJobs(self.app)
+        try:
+            with mock.patch.dict(REPORT_TYPES, {'slow': (slow_report, False)}):
+                running = jobs.submit('slow', {'n': 1})
+                # Wait for the worker to pick the first job up so the next one queues
+                started.wait(5)
+
+                self.assertIs(jobs.submit('slow', {'n': 1}), running)
+                queued = jobs.submit('slow', {'n': 2})
+                with self.assertRaises(QueueFull):
+                    jobs.submit('slow', {'n': 3})
+
+                release.set()
+                jobs.shutdown()
+        finally:
+            release.set()
+
+        self.assertEqual((running.status, running.result), (FINISHED, {'value': 1}))
+        self.assertEqual(queued.result, {'value': 2})
+        self.assertEqual(len(calls), 2)
+
+if __name__ == '__main__':
+    unittest.main()
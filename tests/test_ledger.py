@@ -0,0 +1,195 @@
+"""
+Tests for the stock ledger and point-in-time stock
+"""
+
+import io
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.importer import import_csv
+from app.ledger import (InsufficientStock, list_adjustments, maybe_snapshot, record_movements, stock_as_of,
+                        take_snapshot)
+from app.models import User, Product, RestockAlert, StockAdjustment, StockSnapshot
+
+class LedgerTestCase(unittest.TestCase):
+    """Test case for stock movements, snapshots and stock as of a date"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.start = datetime(2024, 3, 1, 8, 0)
+        self.widget = Product(name='Widget', price=10, cost=5, stock_quantity=20, min_stock=5,
+                              created_at=self.start)
+        self.gadget = Product(name='Gadget', price=10, cost=5, stock_quantity=0, min_stock=5,
+                              created_at=self.start)
+        db.session.add_all([self.widget, self.gadget])
+        db.session.commit()
+        self.widget_id, self.gadget_id = self.widget.id, self.gadget.id
+        # Date the opening stock entries to when the products were created
+        StockAdjustment.query.update({'adjustment_date': self.start})
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def move(self, day, *movements):
+        return record_movements(list(movements), at=self.start + timedelta(days=day))
+
+    def ledger(self, product_id):
+        return [(a.adjustment_type, a.quantity) for a in reversed(list_adjustments(product_id).adjustments)]
+
+    def test_opening_stock_and_edits_are_ledgered(self):
+        """Test ORM writes to stock_quantity leave ledger rows"""
+        self.assertEqual(self.ledger(self.widget_id), [('in', 20)])
+        self.assertEqual(self.ledger(self.gadget_id), [])
+
+        self.widget.stock_quantity = 17
+        db.session.commit()
+        self.assertEqual(self.ledger(self.widget_id), [('in', 20), ('correction', -3)])
+
+    def test_record_movements(self):
+        """Test a batch updates stock once per product and records every movement"""
+        recorded = self.move(1,
+                             {'product_id': self.widget_id, 'type': 'out', 'quantity': 5},
+                             {'product_id': self.widget_id, 'type': 'out', 'quantity': 3, 'reason': 'Damaged'},
+                             {'product_id': self.gadget_id, 'type': 'in', 'quantity': 12})
+
+        self.assertEqual(recorded, 3)
+        self.assertEqual(db.session.get(Product, self.widget_id).stock_quantity, 12)
+        self.assertEqual(db.session.get(Product, self.gadget_id).stock_quantity, 12)
+        self.assertEqual(self.ledger(self.widget_id), [('in', 20), ('out', -5), ('out', -3)])
+        # Gadget went from out of stock to above its minimum
+        self.assertEqual([a.event for a in RestockAlert.query.order_by(RestockAlert.id)], ['low', 'restocked'])
+
+    def test_rejected_batches_write_nothing(self):
+        """Test invalid and overselling batches are rolled back whole"""
+        with self.assertRaises(InsufficientStock) as caught:
+            self.move(1, {'product_id': self.gadget_id, 'type': 'in', 'quantity': 2},
+                      {'product_id': self.widget_id, 'type': 'out', 'quantity': 21})
+        self.assertEqual(caught.exception.product_ids, [self.widget_id])
+
+        for bad in ({'product_id': self.widget_id, 'type': 'out', 'quantity': -1},
+                    {'product_id': self.widget_id, 'type': 'loss', 'quantity': 1},
+                    {'product_id': 999, 'type': 'in', 'quantity': 1}):
+            with self.assertRaises(ValueError):
+                self.move(1, bad)
+
+        self.assertEqual(db.session.get(Product, self.widget_id).stock_quantity, 20)
+        self.assertEqual(db.session.get(Product, self.gadget_id).stock_quantity, 0)
+        self.assertEqual(StockAdjustment.query.count(), 1)
+
+    def test_stock_as_of(self):
+        """Test point-in-time stock with and without snapshots agrees with replaying the ledger"""
+        self.move(1, {'product_id': self.widget_id, 'type': 'out', 'quantity': 4})
+        self.move(2, {'product_id': self.gadget_id, 'type': 'in', 'quantity': 10})
+        take_snapshot(self.start + timedelta(days=2, hours=12))
+        self.move(3, {'product_id': self.widget_id, 'type': 'correction', 'quantity': -1},
+                  {'product_id': self.gadget_id, 'type': 'out', 'quantity': 6})
+
+        def at(days):
+            return stock_as_of(self.start + timedelta(days=days, hours=1))
+
+        self.assertEqual(stock_as_of(self.start - timedelta(hours=1)), {})
+        self.assertEqual(at(0), {self.widget_id: 20, self.gadget_id: 0})
+        self.assertEqual(at(1), {self.widget_id: 16, self.gadget_id: 0})
+        self.assertEqual(at(2), {self.widget_id: 16, self.gadget_id: 10})
+        self.assertEqual(at(3), {self.widget_id: 15, self.gadget_id: 4})
+        self.assertEqual(stock_as_of(self.start + timedelta(days=3, hours=1), [self.gadget_id]),
+                         {self.gadget_id: 4})
+
+    def test_stock_before_any_snapshot(self):
+        """Test stock that predates the ledger is replayed back from current stock, not from zero"""
+        # An upgraded database: stock on hand with no ledger rows or snapshots
+        StockAdjustment.query.delete()
+        db.session.commit()
+        self.move(1, {'product_id': self.widget_id, 'type': 'out', 'quantity': 4})
+
+        self.assertEqual(stock_as_of(self.start + timedelta(hours=1)), {self.widget_id: 20, self.gadget_id: 0})
+        self.assertEqual(stock_as_of(self.start + timedelta(days=2)), {self.widget_id: 16, self.gadget_id: 0})
+
+        # The same answers replaying back from a later snapshot
+        take_snapshot(self.start + timedelta(days=3))
+        self.assertEqual(stock_as_of(self.start + timedelta(hours=1)), {self.widget_id: 20, self.gadget_id: 0})
+
+    def test_delta_scan_starts_at_snapshot(self):
+        """Test the adjustments read are bounded by the nearest snapshot"""
+        self.move(1, {'product_id': self.widget_id, 'type': 'out', 'quantity': 4})
+        snapshot = take_snapshot(self.start + timedelta(days=2))
+        self.move(3, {'product_id': self.widget_id, 'type': 'out', 'quantity': 1})
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append((statement, parameters))
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            stock = stock_as_of(self.start + timedelta(days=4))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        self.assertEqual(stock[self.widget_id], 15)
+        self.assertEqual(len(statements), 2)
+        self.assertIn(snapshot.isoformat(' '), str(statements[1][1]))
+
+    def test_periodic_snapshots(self):
+        """Test a snapshot is taken once the interval has passed"""
+        self.app.config['STOCK_SNAPSHOT_INTERVAL_HOURS'] = 24
+        self.assertIsNotNone(maybe_snapshot(self.start))
+        self.assertIsNone(maybe_snapshot(self.start + timedelta(hours=23)))
+        self.assertIsNotNone(maybe_snapshot(self.start + timedelta(hours=25)))
+        self.assertEqual(StockSnapshot.query.count(), 4)
+
+        self.app.config['STOCK_SNAPSHOT_INTERVAL_HOURS'] = 0
+        self.assertIsNone(maybe_snapshot(self.start + timedelta(days=9)))
+
+    def test_import_is_ledgered(self):
+        """Test stock set by a CSV import is recorded as corrections and opening stock"""
+        import_csv('products', io.StringIO('name,price,cost,stock_quantity\n'
+                                           'Widget,10,5,25\n'
+                                           'Sprocket,4,2,7\n'))
+        sprocket = Product.query.filter_by(name='Sprocket').one()
+
+        self.assertEqual(self.ledger(self.widget_id), [('in', 20), ('correction', 5)])
+        self.assertEqual(self.ledger(sprocket.id), [('in', 7)])
+
+    def test_ledger_api(self):
+        """Test recording, listing and point-in-time stock over HTTP"""
+        user = User(username='keeper', email='keeper@example.com', role='manager')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'keeper', 'password': 'pass'})
+
+        response = self.client.post('/api/stock/adjustments', json={'movements': [
+            {'product_id': self.widget_id, 'type': 'out', 'quantity': 2, 'reason': 'Sample'}]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json(), {'recorded': 1})
+
+        response = self.client.post('/api/stock/adjustments', json={'movements': [
+            {'product_id': self.gadget_id, 'type': 'out', 'quantity': 1}]})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['product_ids'], [self.gadget_id])
+        self.assertEqual(self.client.post('/api/stock/adjustments', json={}).status_code, 400)
+
+        data = self.client.get(f'/api/stock/adjustments?product_id={self.widget_id}').get_json()
+        self.assertEqual([(a['type'], a['quantity']) for a in data['adjustments']], [('out', -2), ('in', 20)])
+        self.assertEqual(data['adjustments'][0]['adjusted_by'], user.id)
+
+        data = self.client.get('/api/stock/as-of').get_json()
+        self.assertEqual(data['stock'], {str(self.widget_id): 18, str(self.gadget_id): 0})
+        data = self.client.get('/api/stock/as-of?date=2024-02-01').get_json()
+        self.assertEqual(data['stock'], {})
+        self.assertEqual(self.client.get('/api/stock/as-of?at=yesterday').status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,217 @@
+"""
+Tests for paginated listings
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User, Customer, Product, Sale, SaleItem
+from app.listings import list_customers, list_sales
+from app.pagination import InvalidCursor
+
+class ListingsTestCase(unittest.TestCase):
+    """Test case for keyset-paginated sales"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.customer = Customer(name='Listing Customer')
+        self.product = Product(name='Listing Product', price=10, cost=5)
+        db.session.add_all([self.customer, self.product])
+        db.session.commit()
+
+        # Pairs of sales share a timestamp so the id tie-breaker matters
+        self.base = datetime(2024, 3, 1, 9, 0)
+        for i in range(10):
+            sale = Sale(
+                invoice_number=f'INV-L{i}',
+                customer_id=self.customer.id if i % 2 else None,
+                sale_date=self.base + timedelta(hours=i // 2),
+                total_amount=100 + i,
+                payment_method='card' if i % 3 == 0 else 'cash'
+            )
+            for _ in range(i % 3 + 1):
+                sale.items.append(SaleItem(product_id=self.product.id, quantity=1, unit_price=10, subtotal=10))
+            db.session.add(sale)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def collect_pages(self, filters=None, limit=3):
+        invoices, cursor = [], None
+        while True:
+            page = list_sales(filters, cursor, limit)
+            invoices.extend(sale.invoice_number for sale in page.sales)
+            if not page.next_cursor:
+                return invoices
+            cursor = page.next_cursor
+
+    def test_pages_cover_all_sales_in_order(self):
+        """Test walking the cursor visits every sale exactly once"""
+        expected = [s.invoice_number for s in Sale.query.order_by(Sale.sale_date.desc(), Sale.id.desc())]
+
+        self.assertEqual(self.collect_pages(limit=3), expected)
+
+    def test_filters(self):
+        """Test date, customer and payment filters"""
+        invoices = self.collect_pages({'customer_id': self.customer.id, 'payment_method': 'cash'})
+        self.assertEqual(sorted(invoices), ['INV-L1', 'INV-L5', 'INV-L7'])
+
+        invoices = self.collect_pages({'date_from': self.base.date(), 'date_to': self.base.date()})
+        self.assertEqual(len(invoices), 10)
+
+        invoices = self.collect_pages({'date_from': (self.base + timedelta(days=1)).date()})
+        self.assertEqual(invoices, [])
+
+    def test_item_counts(self):
+        """Test item counts come back for every sale on the page"""
+        page = list_sales(limit=10)
+        for sale in page.sales:
+            self.assertEqual(page.item_counts[sale.id], len(sale.items))
+
+    def test_fixed_query_count(self):
+        """Test a page costs the same number of queries at any size"""
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            for limit in (2, 10):
+                statements.clear()
+                db.session.expire_all()
+                page = list_sales(limit=limit)
+                for sale in page.sales:
+                    sale.customer and sale.customer.name
+                self.assertEqual(len(statements), 2)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+    def test_invalid_cursor(self):
+        """Test malformed cursors are rejected"""
+        with self.assertRaises(InvalidCursor):
+            list_sales(cursor='not-a-cursor')
+
+    def test_sales_api(self):
+        """Test the JSON sales endpoint"""
+        user = User(username='lister', email='lister@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'lister', 'password': 'pass'})
+
+        response = self.client.get('/api/sales?per_page=4&payment_method=cash')
+        self.assertEqual(response.status_code, 200)
+        data = response.get_json()
+        self.assertEqual(len(data['sales']), 4)
+        self.assertIsNotNone(data['next_cursor'])
+        self.assertIn('item_count', data['sales'][0])
+
+        response = self.client.get('/api/sales?cursor=garbage')
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.get('/sales?customer_id=%d' % self.customer.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'INV-L1', response.data)
+
+class CustomerListingTestCase(unittest.TestCase):
+    """Test case for the customers page aggregates"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.customers = [Customer(name=name) for name in ('Alice', 'Bob', 'Carol', 'Dave')]
+        db.session.add_all(self.customers)
+        db.session.commit()
+
+        # Alice: 2 orders / 300, Bob: 1 order / 500, Carol: 3 orders / 90, Dave: none
+        base = datetime(2024, 3, 1, 12, 0)
+        purchases = [(0, 100, 1), (0, 200, 5), (1, 500, 2), (2, 30, 3), (2, 30, 4), (2, 30, 6)]
+        for i, (index, amount, day) in enumerate(purchases):
+            db.session.add(Sale(invoice_number=f'INV-C{i}', customer_id=self.customers[index].id,
+                                sale_date=base + timedelta(days=day), total_amount=amount))
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def names(self, page):
+        return [customer.name for customer in page.customers]
+
+    def test_stats_by_name(self):
+        """Test aggregates are loaded for a page sorted by name"""
+        page = list_customers('name', per_page=3)
+
+        self.assertEqual(self.names(page), ['Alice', 'Bob', 'Carol'])
+        self.assertEqual(page.total, 4)
+        alice = page.stats[self.customers[0].id]
+        self.assertEqual((alice.total_spent, alice.order_count), (300.0, 2))
+        self.assertEqual(alice.last_purchase, datetime(2024, 3, 6, 12, 0))
+
+        page = list_customers('name', page=2, per_page=3)
+        self.assertEqual(self.names(page), ['Dave'])
+        self.assertEqual(page.stats[self.customers[3].id].order_count, 0)
+
+    def test_sort_by_measures(self):
+        """Test sorting by each aggregate"""
+        self.assertEqual(self.names(list_customers('total_spent', descending=True)),
+                         ['Bob', 'Alice', 'Carol', 'Dave'])
+        self.assertEqual(self.names(list_customers('order_count', descending=True)),
+                         ['Carol', 'Alice', 'Bob', 'Dave'])
+        self.assertEqual(self.names(list_customers('last_purchase', descending=True))[:3],
+                         ['Carol', 'Alice', 'Bob'])
+
+        page = list_customers('order_count', descending=True, per_page=2)
+        self.assertEqual(page.stats[self.customers[2].id].total_spent, 90.0)
+
+        with self.assertRaises(ValueError):
+            list_customers('email')
+
+    def test_customers_page_query_count(self):
+        """Test the customers page renders with a fixed number of queries"""
+        user = User(username='viewer', email='viewer@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'viewer', 'password': 'pass'})
+
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', count)
+        try:
+            counts = []
+            for per_page in (1, 4):
+                statements.clear()
+                response = self.client.get(f'/customers?per_page={per_page}&sort=total_spent&order=desc')
+                self.assertEqual(response.status_code, 200)
+                counts.append(len(statements))
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', count)
+
+        self.assertEqual(counts[0], counts[1])
+        self.assertIn(b'MWK 500.00', response.data)
+
+if __name__ == '__main__':
+    unittest.main()
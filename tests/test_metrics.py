@@ -0,0 +1,119 @@
+"""
+Tests for the Prometheus metrics endpoint
+"""
+
+import gc
+import re
+import threading
+import unittest
+from unittest import mock
+from config import TestingConfig
+from app import create_app, db
+from app.auth import create_default_admin
+from app.metrics import metrics_for, query_labels
+
+def sample(body, name, **labels):
+    """Value of one sample in a text exposition, or None"""
+    wanted = ','.join(f'{key}="{value}"' for key, value in labels.items())
+    pattern = '^' + re.escape(name + (f'{{{wanted}}}' if labels else '')) + r' (\S+)$'
+    match = re.search(pattern, body, re.MULTILINE)
+    return float(match.group(1)) if match else None
+
+class MetricsTestCase(unittest.TestCase):
+    """Test case for request, query, pool and cache metrics"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        create_default_admin()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        return response.get_data(as_text=True)
+
+    def test_request_histograms(self):
+        """Test requests are counted per endpoint with cumulative buckets"""
+        for _ in range(3):
+            self.client.get('/auth/login')
+        self.client.get('/no-such-page')
+        body = self.scrape()
+
+        self.assertEqual(sample(body, 'http_requests_total', endpoint='auth.login', method='GET', status='200'), 3)
+        self.assertEqual(sample(body, 'http_requests_total', endpoint='unmatched', method='GET', status='404'), 1)
+        self.assertEqual(sample(body, 'http_request_duration_seconds_count', endpoint='auth.login'), 3)
+        self.assertEqual(sample(body, 'http_request_duration_seconds_bucket', endpoint='auth.login', le='+Inf'), 3)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        # The scrape in progress is the one active request
+        self.assertEqual(sample(body, 'http_requests_active'), 1)
+
+    def test_query_pool_and_cache_metrics(self):
+        """Test DB time by statement shape, pool gauges and cache ratio"""
+        self.client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+        self.client.get('/api/dashboard-stats')
+        self.client.get('/api/dashboard-stats')
+        body = self.scrape()
+
+        self.assertGreater(sample(body, 'db_query_duration_seconds_count', operation='select', table='user'), 0)
+        self.assertIsNotNone(sample(body, 'db_pool_checked_out'))
+        self.assertIsNotNone(sample(body, 'db_pool_checkout_wait_seconds_count'))
+        self.assertEqual(sample(body, 'cache_hits_total'), 1)
+        self.assertEqual(sample(body, 'cache_misses_total'), 1)
+        self.assertEqual(sample(body, 'cache_hit_ratio'), 0.5)
+
+    def test_thread_shards_are_merged_and_retired(self):
+        """Test counts from finished threads survive in the totals"""
+        registry = metrics_for(self.app)
+        shards = len(registry._shards)
+
+        def work():
+            with self.app.test_request_context('/auth/login'):
+                registry._start()
+                registry._finish(None)
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        del threads, thread
+        gc.collect()
+
+        self.assertEqual(registry.collect().requests[('auth.login', 'GET', 500)], 4)
+        self.assertEqual(len(registry._shards), shards)
+
+    def test_token_and_disable(self):
+        """Test the optional bearer token and the kill switch"""
+        with mock.patch.object(TestingConfig, 'METRICS_TOKEN', 'secret'):
+            client = create_app('testing').test_client()
+        self.assertEqual(client.get('/metrics').status_code, 401)
+        self.assertEqual(client.get('/metrics', headers={'Authorization': 'Bearer secret'}).status_code, 200)
+
+        with mock.patch.object(TestingConfig, 'METRICS_ENABLED', False):
+            client = create_app('testing').test_client()
+        self.assertEqual(client.get('/metrics').status_code, 404)
+
+        # Configurations that require a token refuse to serve without one
+        with mock.patch.object(TestingConfig, 'METRICS_REQUIRE_TOKEN', True):
+            client = create_app('testing').test_client()
+        self.assertEqual(client.get('/metrics').status_code, 404)
+
+    def test_query_labels(self):
+        """Test statements reduce to operation and main table"""
+        self.assertEqual(query_labels('SELECT sale.id FROM sale JOIN customer ON 1'), ('select', 'sale'))
+        self.assertEqual(query_labels('INSERT INTO sale_item (a) VALUES (?)'), ('insert', 'sale_item'))
+        self.assertEqual(query_labels('UPDATE "product" SET price=?'), ('update', 'product'))
+
+if __name__ == '__main__':
+    unittest.main()
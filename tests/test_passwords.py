@@ -0,0 +1,103 @@
+"""
+Tests for bounded password hashing and hash upgrades
+"""
+
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from werkzeug.security import generate_password_hash
+from app import create_app, db
+from app.models import User
+from app.passwords import HasherBusy, PasswordHasher, hasher_for
+
+class PasswordTestCase(unittest.TestCase):
+    """Test case for the hashing pool, backpressure and rehash on login"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_user(self, pwhash):
+        user = User(username='clerk', email='clerk@example.com', password_hash=pwhash)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+    def login(self, password):
+        return self.client.post('/auth/login', data={'username': 'clerk', 'password': password})
+
+    def test_hash_uses_configured_method(self):
+        """Test new hashes carry the configured parameters"""
+        user = User(username='new', email='new@example.com')
+        user.set_password('secret')
+        self.assertTrue(user.password_hash.startswith('pbkdf2:sha256:1000$'))
+        self.assertTrue(user.check_password('secret'))
+        self.assertFalse(user.check_password('wrong'))
+
+    def test_old_hash_upgraded_on_login(self):
+        """Test a successful login re-hashes with the configured method"""
+        user_id = self.add_user(generate_password_hash('secret', 'pbkdf2:sha256:2000'))
+
+        self.assertEqual(self.login('wrong').status_code, 200)
+        self.assertTrue(db.session.get(User, user_id).password_hash.startswith('pbkdf2:sha256:2000$'))
+
+        self.assertEqual(self.login('secret').status_code, 302)
+        db.session.expire_all()
+        upgraded = db.session.get(User, user_id).password_hash
+        self.assertTrue(upgraded.startswith('pbkdf2:sha256:1000$'))
+        self.assertFalse(hasher_for(self.app).needs_rehash(upgraded))
+
+    def test_busy_login_gets_503(self):
+        """Test a saturated hasher turns logins away with Retry-After"""
+        self.add_user(generate_password_hash('secret', 'pbkdf2:sha256:1000'))
+        with mock.patch.object(hasher_for(self.app), 'verify', side_effect=HasherBusy):
+            response = self.login('secret')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers['Retry-After'], '2')
+        self.assertIn(b'Too many sign-ins', response.data)
+
+    def test_bounded_queue(self):
+        """Test work beyond workers + pending is rejected, then accepted again"""
+        hasher = PasswordHasher(SimpleNamespace(config={'PASSWORD_HASH_WORKERS': 1, 'PASSWORD_HASH_MAX_PENDING': 1}))
+        release = threading.Event()
+        started = threading.Semaphore(0)
+
+        def slow():
+            started.release()
+            release.wait(5)
+            return 'done'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(hasher._run(slow))) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        started.acquire(timeout=5)
+        deadline = time.monotonic() + 5
+        while hasher._slots._value and time.monotonic() < deadline:  # wait for the second to queue
+            time.sleep(0.001)
+
+        with self.assertRaises(HasherBusy):
+            hasher._run(slow)
+        self.assertEqual(hasher.busy, 1)
+
+        release.set()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(results, ['done', 'done'])
+        self.assertEqual(hasher._run(lambda: 'again'), 'again')
+        hasher.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,237 @@
+"""
+Tests for point-of-sale sale ingestion
+"""
+
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from sqlalchemy import event, func
+from app import create_app, db
+from app.ledger import InsufficientStock
+from app.models import User, Customer, Product, Sale, SaleItem, DailySalesRollup, StockAdjustment, StockSnapshot
+from app.pos import DuplicateInvoices, SaleRejected, record_pos_sales
+from config import TestingConfig
+
+class PosTestCase(unittest.TestCase):
+    """Test case for POST /api/sales and the atomic stock decrement"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.customer = Customer(name='Till Customer', customer_type='wholesale')
+        self.pen = Product(name='Pen', price=500, cost=200, stock_quantity=10, min_stock=2)
+        self.pad = Product(name='Pad', price=1500, cost=900, stock_quantity=3, min_stock=1)
+        db.session.add_all([self.customer, self.pen, self.pad])
+        db.session.commit()
+        self.pen_id, self.pad_id, self.customer_id = self.pen.id, self.pad.id, self.customer.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def sale(self, invoice, *items, **fields):
+        return dict({'invoice_number': invoice,
+                     'items': [{'product_id': product_id, 'quantity': quantity} for product_id, quantity in items]},
+                    **fields)
+
+    def stock(self):
+        return dict(db.session.query(Product.id, Product.stock_quantity).all())
+
+    def test_single_sale(self):
+        """Test a sale writes items, decrements stock and feeds the rollup and ledger"""
+        created, duplicates = record_pos_sales([self.sale(
+            'POS-1', (self.pen_id, 2), (self.pad_id, 1), customer_id=self.customer_id,
+            payment_method='card', discount=100, tax=50, sale_date='2024-03-01T10:00:00')])
+
+        self.assertEqual(duplicates, [])
+        self.assertEqual(created[0]['total_amount'], 2450.0)
+        sale = db.session.get(Sale, created[0]['id'])
+        self.assertEqual(sorted((i.product_id, i.quantity, i.subtotal) for i in sale.items),
+                         sorted([(self.pen_id, 2, 1000.0), (self.pad_id, 1, 1500.0)]))
+        self.assertEqual(self.stock(), {self.pen_id: 8, self.pad_id: 2})
+
+        rollup = DailySalesRollup.query.one()
+        self.assertEqual((rollup.payment_method, rollup.customer_type, rollup.sale_count, rollup.revenue),
+                         ('card', 'wholesale', 1, 2450.0))
+        self.assertEqual(db.session.query(func.sum(StockAdjustment.quantity)).filter(
+            StockAdjustment.reason == 'Sale POS-1').scalar(), -3)
+        # Till sales keep the periodic snapshots going
+        self.assertEqual(StockSnapshot.query.count(), 2)
+
+    def test_batch_uses_one_stock_update(self):
+        """Test a batch decrements every product with a single UPDATE"""
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            created, _ = record_pos_sales([self.sale(f'POS-{i}', (self.pen_id, 1), (self.pad_id, 1))
+                                           for i in range(3)])
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        self.assertEqual(len(created), 3)
+        self.assertEqual(self.stock(), {self.pen_id: 7, self.pad_id: 0})
+        self.assertEqual(len([s for s in statements if s.startswith('UPDATE product ')]), 1)
+
+    def test_oversell_rejects_whole_batch(self):
+        """Test a batch that oversells any product writes nothing"""
+        with self.assertRaises(InsufficientStock) as caught:
+            record_pos_sales([self.sale('POS-1', (self.pen_id, 1)),
+                              self.sale('POS-2', (self.pad_id, 2)),
+                              self.sale('POS-3', (self.pad_id, 2))])
+
+        self.assertEqual(caught.exception.product_ids, [self.pad_id])
+        self.assertEqual(self.stock(), {self.pen_id: 10, self.pad_id: 3})
+        self.assertEqual(Sale.query.count(), 0)
+        self.assertEqual(SaleItem.query.count(), 0)
+        self.assertEqual(DailySalesRollup.query.count(), 0)
+
+    def test_duplicates_and_validation(self):
+        """Test resent invoices are skipped and bad sales are rejected by position"""
+        record_pos_sales([self.sale('POS-1', (self.pen_id, 1))])
+        created, duplicates = record_pos_sales([self.sale('POS-1', (self.pen_id, 1)),
+                                                self.sale('POS-2', (self.pen_id, 1)),
+                                                self.sale('POS-2', (self.pen_id, 1))])
+        self.assertEqual([sale['invoice_number'] for sale in created], ['POS-2'])
+        self.assertEqual(duplicates, ['POS-1', 'POS-2'])
+        self.assertEqual(self.stock()[self.pen_id], 8)
+
+        for bad in (self.sale('POS-3'),
+                    self.sale('POS-3', (self.pen_id, 0)),
+                    self.sale('POS-3', (999, 1)),
+                    self.sale('POS-3', (self.pen_id, 1), customer_id=999),
+                    self.sale('POS-3', (self.pen_id, 1), payment_method='cheque'),
+                    self.sale('POS-3' * 10, (self.pen_id, 1)),
+                    self.sale('INV-20240301-000001', (self.pen_id, 1)),
+                    self.sale('POS-3', (self.pen_id, 1), discount=501)):
+            with self.assertRaises(SaleRejected) as caught:
+                record_pos_sales([self.sale('POS-4', (self.pen_id, 1)), bad])
+            self.assertEqual(caught.exception.index, 1)
+        self.assertIn('discount exceeds the sale subtotal', str(caught.exception))
+        self.assertEqual(Sale.query.count(), 2)
+
+    def test_resend_during_first_write(self):
+        """Test a resend that passes the duplicate check before the first write lands"""
+        record_pos_sales([self.sale('POS-1', (self.pen_id, 1))])
+
+        # The first check runs before the other request has committed POS-1
+        with mock.patch('app.pos.existing_invoices', side_effect=[set(), {'POS-1'}, {'POS-1'}]):
+            created, duplicates = record_pos_sales([self.sale('POS-1', (self.pen_id, 1)),
+                                                    self.sale('POS-2', (self.pen_id, 1))])
+        self.assertEqual([sale['invoice_number'] for sale in created], ['POS-2'])
+        self.assertEqual(duplicates, ['POS-1'])
+        self.assertEqual(self.stock()[self.pen_id], 8)
+
+        # A clash that survives the retry is refused, not a server error
+        with mock.patch('app.pos.existing_invoices', side_effect=[set(), {'POS-2'}] * 2):
+            with self.assertRaises(DuplicateInvoices) as caught:
+                record_pos_sales([self.sale('POS-2', (self.pen_id, 1))])
+        self.assertEqual(caught.exception.invoice_numbers, ['POS-2'])
+        self.assertEqual(Sale.query.count(), 2)
+
+        # Numbers the server issued are still accepted as resends
+        issued, _ = record_pos_sales([{'items': [{'product_id': self.pen_id, 'quantity': 1}]}])
+        created, duplicates = record_pos_sales([self.sale(issued[0]['invoice_number'], (self.pen_id, 1))])
+        self.assertEqual((created, duplicates), ([], [issued[0]['invoice_number']]))
+
+    def test_sales_endpoint(self):
+        """Test single and batch posts over HTTP"""
+        user = User(username='till', email='till@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'till', 'password': 'pass'})
+
+        response = self.client.post('/api/sales', json=self.sale('POS-1', (self.pen_id, 1)))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['created'][0]['invoice_number'], 'POS-1')
+
+        response = self.client.post('/api/sales', json={'sales': [self.sale('POS-1', (self.pen_id, 1)),
+                                                                   self.sale('POS-2', (self.pad_id, 3))]})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.get_json()['duplicates'], ['POS-1'])
+
+        response = self.client.post('/api/sales', json=self.sale('POS-3', (self.pad_id, 1)))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.get_json()['product_ids'], [self.pad_id])
+
+        response = self.client.post('/api/sales', json={'sales': [{'invoice_number': 'POS-4'}]})
+        self.assertEqual((response.status_code, response.get_json()['index']), (400, 0))
+        self.assertEqual(self.client.post('/api/sales', data='nonsense').status_code, 400)
+
+        # The listing still answers GET on the same URL
+        self.assertEqual(len(self.client.get('/api/sales').get_json()['sales']), 2)
+
+class PosConcurrencyTestCase(unittest.TestCase):
+    """Test concurrent tills never oversell"""
+
+    def setUp(self):
+        """Set up a file database several threads can share"""
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        with mock.patch.multiple(TestingConfig, SQLALCHEMY_DATABASE_URI='sqlite:///' + self.path,
+                                 SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': 30}}):
+            self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        product = Product(name='Hot Item', price=100, cost=50, stock_quantity=60, min_stock=5)
+        db.session.add(product)
+        db.session.commit()
+        self.product_id = product.id
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        os.remove(self.path)
+
+    def test_concurrent_tills(self):
+        """Test racing batches sell exactly the available stock"""
+        sold, rejected, errors = [], [], []
+
+        def till(number):
+            with self.app.app_context():
+                try:
+                    for batch in range(5):
+                        sales = [{'invoice_number': f'T{number}-{batch}-{i}',
+                                  'items': [{'product_id': self.product_id, 'quantity': 1}]} for i in range(4)]
+                        try:
+                            created, _ = record_pos_sales(sales)
+                            sold.append(len(created))
+                        except InsufficientStock:
+                            rejected.append(len(sales))
+                except Exception as exc:  # pragma: no cover - reported below
+                    errors.append(exc)
+                finally:
+                    db.session.remove()
+
+        threads = [threading.Thread(target=till, args=(n,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(sum(sold), 60)
+        self.assertEqual(len(rejected), 5)
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Product, self.product_id).stock_quantity, 0)
+        self.assertEqual(db.session.query(func.sum(SaleItem.quantity)).scalar(), 60)
+
+if __name__ == '__main__':
+    unittest.main()
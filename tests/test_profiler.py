@@ -0,0 +1,83 @@
+"""
+Tests for the per-request profiler
+"""
+
+import unittest
+from unittest import mock
+from config import TestingConfig
+from app import create_app, db
+from app.auth import create_default_admin
+from app.models import Customer
+from app.profiler import profiler_for, statement_shape
+
+class ProfilerTestCase(unittest.TestCase):
+    """Test case for query counting, N+1 detection and /debug/perf"""
+
+    def setUp(self):
+        """Set up test environment"""
+        with mock.patch.multiple(TestingConfig, PROFILER_ENABLED=True, PROFILER_SLOW_MS=10000):
+            self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        create_default_admin()
+        db.session.add_all([Customer(name=f'Customer {i}') for i in range(6)])
+        db.session.commit()
+
+        @self.app.route('/_n_plus_one')
+        def n_plus_one():
+            ids = [c.id for c in Customer.query.all()]
+            names = [db.session.query(Customer.name).filter(Customer.id == i).scalar() for i in ids]
+            return ','.join(names)
+
+        self.client = self.app.test_client()
+        self.profiler = profiler_for(self.app)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_statement_shape(self):
+        """Test literals and IN lists collapse to one shape"""
+        self.assertEqual(statement_shape("SELECT * FROM t1 WHERE id IN (?, ?, ?) AND name = 'x''y' LIMIT 10"),
+                         'SELECT * FROM t1 WHERE id IN (?) AND name = ? LIMIT ?')
+        self.assertEqual(statement_shape('SELECT a\n  FROM t WHERE id = 7'), statement_shape('SELECT a FROM t WHERE id = 12'))
+
+    def test_server_timing_and_n_plus_one(self):
+        """Test requests get Server-Timing and repeated shapes are recorded"""
+        with self.assertLogs(self.app.logger, 'WARNING'):
+            response = self.client.get('/_n_plus_one')
+        timing = response.headers['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="7 queries"', timing)
+        self.assertIn('total;dur=', timing)
+
+        entry, = self.profiler.entries()
+        self.assertEqual(entry['endpoint'], 'n_plus_one')
+        self.assertEqual(entry['queries'], 7)
+        self.assertEqual(entry['n_plus_one'][0]['count'], 6)
+        self.assertIn('WHERE customer.id = ?', entry['n_plus_one'][0]['sql'])
+
+    def test_fast_requests_are_not_kept(self):
+        """Test only slow or N+1 requests enter the ring buffer"""
+        response = self.client.get('/auth/login')
+        self.assertIn('Server-Timing', response.headers)
+        self.assertEqual(self.profiler.entries(), [])
+
+    def test_debug_page_is_admin_only(self):
+        """Test /debug/perf lists entries for admins only"""
+        self.client.get('/_n_plus_one')
+        self.assertEqual(self.client.get('/debug/perf').status_code, 302)
+
+        self.client.post('/auth/login', data={'username': 'admin', 'password': 'admin123'})
+        page = self.client.get('/debug/perf')
+        self.assertEqual(page.status_code, 200)
+        self.assertIn(b'/_n_plus_one', page.data)
+        self.assertIn(b'N+1', page.data)
+        data = self.client.get('/debug/perf?format=json').get_json()
+        self.assertTrue(data['enabled'])
+
+if __name__ == '__main__':
+    unittest.main()
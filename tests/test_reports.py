@@ -0,0 +1,96 @@
+"""
+Tests for the sales report engine
+"""
+
+import unittest
+from datetime import date, datetime, timedelta
+from app import create_app, db
+from app.models import Customer, Product, Sale, SaleItem
+from app.reports import sales_report
+from app.utils import generate_sales_report
+
+class ReportsTestCase(unittest.TestCase):
+    """Test case for chunked report aggregation"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.customer = Customer(name='Report Customer', customer_type='business')
+        self.products = [Product(name=f'Product {i}', price=10, cost=5) for i in range(3)]
+        db.session.add_all([self.customer] + self.products)
+        db.session.commit()
+
+        # 12 sales over 4 days; product i sells (i + 1) units per sale
+        base = datetime(2024, 5, 1, 10, 0)
+        for i in range(12):
+            sale = Sale(
+                invoice_number=f'INV-R{i}',
+                customer_id=self.customer.id if i % 3 == 0 else None,
+                sale_date=base + timedelta(days=i % 4, minutes=i),
+                total_amount=10.0 * (i + 1),
+                tax=1.0,
+                payment_method='card' if i % 2 else 'cash'
+            )
+            product = self.products[i % 3]
+            quantity = i % 3 + 1
+            sale.items.append(SaleItem(product_id=product.id, quantity=quantity,
+                                       unit_price=10, subtotal=10.0 * quantity))
+            db.session.add(sale)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_matches_row_by_row_totals(self):
+        """Test aggregates agree with a plain Python pass, across chunk sizes"""
+        sales = Sale.query.all()
+        expected_total = sum(s.total_amount for s in sales)
+
+        for chunk_size in (1, 5, 1000):
+            report = sales_report(date(2024, 5, 1), date(2024, 5, 4), chunk_size=chunk_size)
+            self.assertEqual(report['total_transactions'], 12)
+            self.assertAlmostEqual(report['total_sales'], expected_total)
+            self.assertAlmostEqual(report['average_transaction'], expected_total / 12)
+            self.assertAlmostEqual(report['total_tax'], 12.0)
+
+            self.assertEqual([d['date'] for d in report['sales_by_day']],
+                             ['2024-05-01', '2024-05-02', '2024-05-03', '2024-05-04'])
+            self.assertAlmostEqual(report['sales_by_day'][0]['total'], 10 + 50 + 90)
+
+            self.assertEqual(report['sales_by_payment_method']['cash'], {'count': 6, 'total': 360.0})
+            self.assertEqual(report['sales_by_customer_type']['business']['count'], 4)
+            self.assertEqual(report['sales_by_customer_type']['walk_in']['count'], 8)
+
+            top = report['top_products']
+            self.assertEqual([p['name'] for p in top], ['Product 2', 'Product 1', 'Product 0'])
+            self.assertEqual((top[0]['quantity'], top[0]['revenue']), (12, 120.0))
+
+    def test_period_bounds(self):
+        """Test date periods include the whole end day and datetime ends include that instant"""
+        report = sales_report(date(2024, 5, 2), date(2024, 5, 2))
+        self.assertEqual(report['total_transactions'], 3)
+
+        report = generate_sales_report(datetime(2024, 5, 1), datetime(2024, 5, 1, 10, 4))
+        self.assertEqual(report['total_transactions'], 2)
+        report = generate_sales_report(datetime(2024, 5, 1), datetime(2024, 5, 1, 10, 3, 59))
+        self.assertEqual(report['total_transactions'], 1)
+
+    def test_empty_period(self):
+        """Test a period with no sales"""
+        report = sales_report(date(2023, 1, 1), date(2023, 1, 31))
+        self.assertEqual(report['total_transactions'], 0)
+        self.assertEqual(report['average_transaction'], 0)
+        self.assertEqual(len(report['sales_by_day']), 31)
+        self.assertEqual(sum(day['total'] for day in report['sales_by_day']), 0)
+        self.assertEqual(report['sales_by_payment_method'], {})
+        self.assertEqual(report['top_products'], [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,138 @@
+"""
+Tests for the low-stock flag and restock alert queue
+"""
+
+import io
+import unittest
+from sqlalchemy import update
+from app import create_app, db
+from app.importer import import_csv
+from app.models import User, Product, RestockAlert
+from app.restock import IS_LOW_STOCK, dispatch_alerts, low_stock_products, pending_alerts, stock_transitions
+
+class RestockTestCase(unittest.TestCase):
+    """Test case for event-driven restock alerts"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.widget = Product(name='Widget', price=10, cost=5, stock_quantity=20, min_stock=10)
+        self.gadget = Product(name='Gadget', price=10, cost=5, stock_quantity=2, min_stock=10)
+        db.session.add_all([self.widget, self.gadget])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def events(self):
+        return [(alert.product.name, alert.event) for alert in pending_alerts()]
+
+    def test_flag_follows_stock(self):
+        """Test the generated column tracks stock and minimum changes"""
+        self.assertEqual([p.name for p in low_stock_products()], ['Gadget'])
+
+        self.widget.stock_quantity = 3
+        self.gadget.min_stock = 1
+        db.session.commit()
+
+        self.assertEqual([p.name for p in low_stock_products()], ['Widget'])
+        self.assertTrue(self.widget.low_stock)
+
+    def test_low_stock_lookup_uses_index(self):
+        """Test the low-stock filter is an index read, not a table scan"""
+        stmt = db.select(Product.id).where(IS_LOW_STOCK).order_by(Product.name)
+        sql = str(stmt.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = ' '.join(str(row) for row in db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)))
+
+        self.assertIn('idx_product_low_stock', plan)
+
+    def test_alerts_only_on_transitions(self):
+        """Test alerts are queued when the flag flips, not on every write"""
+        self.assertEqual(self.events(), [('Gadget', 'low')])
+
+        # Still above the minimum, and still below it: no new alerts
+        self.widget.stock_quantity = 15
+        self.gadget.stock_quantity = 1
+        db.session.commit()
+        self.assertEqual(len(self.events()), 1)
+
+        self.widget.stock_quantity = 9
+        db.session.commit()
+        self.gadget.stock_quantity = 50
+        db.session.commit()
+        self.assertEqual(self.events(), [('Gadget', 'low'), ('Widget', 'low'), ('Gadget', 'restocked')])
+
+        alert = pending_alerts()[1]
+        self.assertEqual((alert.stock_quantity, alert.min_stock), (9, 10))
+
+    def test_rollback_queues_nothing(self):
+        """Test a rolled back change leaves no alert"""
+        self.widget.stock_quantity = 0
+        db.session.flush()
+        db.session.rollback()
+
+        self.assertEqual(self.events(), [('Gadget', 'low')])
+
+    def test_core_writes(self):
+        """Test bulk writers queue alerts through stock_transitions"""
+        table = Product.__table__
+        with db.engine.begin() as connection:
+            with stock_transitions(connection, [self.widget.id, self.gadget.id]):
+                connection.execute(update(table).values(stock_quantity=table.c.stock_quantity * 2 - 36))
+
+        # Widget 20 -> 4 goes low; Gadget 2 -> -32 stays low
+        self.assertEqual(self.events(), [('Gadget', 'low'), ('Widget', 'low')])
+
+    def test_import_queues_alerts(self):
+        """Test product imports queue alerts for new and updated products"""
+        csv_file = io.StringIO('name,price,cost,stock_quantity,min_stock\n'
+                               'Widget,10,5,1,10\n'
+                               'Sprocket,4,2,0,5\n'
+                               'Cog,4,2,50,5\n')
+        import_csv('products', csv_file)
+
+        self.assertEqual(self.events(), [('Gadget', 'low'), ('Widget', 'low'), ('Sprocket', 'low')])
+
+    def test_dispatch_marks_sent(self):
+        """Test dispatching drains the queue once"""
+        self.widget.stock_quantity = 0
+        db.session.commit()
+
+        batches = []
+        self.assertEqual(dispatch_alerts(batches.append, batch_size=1), 2)
+        self.assertEqual([len(batch) for batch in batches], [1, 1])
+        self.assertEqual(pending_alerts(), [])
+        self.assertEqual(dispatch_alerts(batches.append), 0)
+
+    def test_alert_api(self):
+        """Test listing and acknowledging alerts over HTTP"""
+        user = User(username='clerk', email='clerk@example.com', role='staff')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.client.post('/auth/login', data={'username': 'clerk', 'password': 'pass'})
+
+        response = self.client.get('/api/restock-alerts')
+        alerts = response.get_json()['alerts']
+        self.assertEqual([(a['product_name'], a['event']) for a in alerts], [('Gadget', 'low')])
+
+        response = self.client.post('/api/restock-alerts/ack', json={'ids': [alerts[0]['id']]})
+        self.assertEqual(response.status_code, 403)
+
+        user.role = 'manager'
+        db.session.commit()
+        response = self.client.post('/api/restock-alerts/ack', json={'ids': [alerts[0]['id']]})
+        self.assertEqual(response.get_json(), {'acknowledged': 1})
+        self.assertEqual(self.client.post('/api/restock-alerts/ack', json={'ids': 'all'}).status_code, 400)
+        self.assertEqual(RestockAlert.query.filter(RestockAlert.sent_at.is_(None)).count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()
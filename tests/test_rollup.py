@@ -0,0 +1,145 @@
+"""
+Tests for the daily sales rollup
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import Customer, Sale, DailySalesRollup
+from app.rollup import rebuild_rollup, WALK_IN
+from app.utils import get_sales_by_day
+
+class RollupTestCase(unittest.TestCase):
+    """Test case for incremental rollup maintenance"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.customer = Customer(name='Rollup Customer', customer_type='wholesale')
+        db.session.add(self.customer)
+        db.session.commit()
+
+        self.day = datetime(2024, 3, 1, 10, 30)
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def add_sale(self, invoice, amount, customer=None, payment='cash', sale_date=None):
+        sale = Sale(
+            invoice_number=invoice,
+            customer_id=customer.id if customer else None,
+            sale_date=sale_date or self.day,
+            total_amount=amount,
+            discount=10,
+            tax=5,
+            payment_method=payment
+        )
+        db.session.add(sale)
+        db.session.commit()
+        return sale
+
+    def rollup_rows(self):
+        rows = DailySalesRollup.query.filter(DailySalesRollup.sale_count != 0).all()
+        return {
+            (row.day, row.payment_method, row.customer_type): (row.sale_count, row.revenue, row.discount, row.tax)
+            for row in rows
+        }
+
+    def test_insert_updates_rollup(self):
+        """Test inserted sales are added to the rollup"""
+        self.add_sale('INV-R1', 100, self.customer)
+        self.add_sale('INV-R2', 50, self.customer)
+        self.add_sale('INV-R3', 70)
+
+        rows = self.rollup_rows()
+        self.assertEqual(rows[(self.day.date(), 'cash', 'wholesale')], (2, 150, 20, 10))
+        self.assertEqual(rows[(self.day.date(), 'cash', WALK_IN)], (1, 70, 10, 5))
+
+    def test_update_moves_sale_between_rows(self):
+        """Test changing a sale moves its totals to the new key"""
+        sale = self.add_sale('INV-R4', 100, self.customer)
+
+        sale.payment_method = 'card'
+        sale.total_amount = 120
+        sale.sale_date = self.day + timedelta(days=1)
+        db.session.commit()
+
+        rows = self.rollup_rows()
+        self.assertNotIn((self.day.date(), 'cash', 'wholesale'), rows)
+        self.assertEqual(rows[(self.day.date() + timedelta(days=1), 'card', 'wholesale')], (1, 120, 10, 5))
+
+    def test_delete_removes_sale(self):
+        """Test deleted sales are subtracted from the rollup"""
+        self.add_sale('INV-R5', 100, self.customer)
+        sale = self.add_sale('INV-R6', 40, self.customer)
+
+        db.session.delete(sale)
+        db.session.commit()
+
+        rows = self.rollup_rows()
+        self.assertEqual(rows[(self.day.date(), 'cash', 'wholesale')], (1, 100, 10, 5))
+
+    def test_rollback_discards_deltas(self):
+        """Test a rolled back flush leaves the rollup untouched"""
+        self.add_sale('INV-R7', 100)
+
+        db.session.add(Sale(invoice_number='INV-R8', sale_date=self.day, total_amount=30))
+        db.session.flush()
+        db.session.rollback()
+
+        rows = self.rollup_rows()
+        self.assertEqual(rows[(self.day.date(), 'cash', WALK_IN)], (1, 100, 10, 5))
+
+    def test_rebuild_matches_incremental(self):
+        """Test rebuilding from the sale table gives the same rollup"""
+        self.add_sale('INV-R9', 100, self.customer)
+        self.add_sale('INV-R10', 60, payment='mobile_money')
+        self.add_sale('INV-R11', 80, self.customer, sale_date=self.day + timedelta(days=2))
+
+        incremental = self.rollup_rows()
+        rebuild_rollup()
+
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_customer_type_change_rebuckets_sales(self):
+        """Test re-typing a customer moves their sales so a rebuild agrees"""
+        self.add_sale('INV-R15', 100, self.customer)
+        sale = self.add_sale('INV-R16', 40, self.customer, sale_date=self.day + timedelta(days=1))
+
+        # Re-type while also editing one of the customer's sales in the same flush
+        self.customer.customer_type = 'business'
+        sale.total_amount = 50
+        db.session.commit()
+
+        rows = self.rollup_rows()
+        self.assertEqual(rows[(self.day.date(), 'cash', 'business')], (1, 100, 10, 5))
+        self.assertEqual(rows[(self.day.date() + timedelta(days=1), 'cash', 'business')], (1, 50, 10, 5))
+        self.assertFalse(any(key[2] == 'wholesale' for key in rows))
+
+        incremental = self.rollup_rows()
+        rebuild_rollup()
+        self.assertEqual(self.rollup_rows(), incremental)
+
+    def test_sales_by_day(self):
+        """Test get_sales_by_day reads daily totals from the rollup, zero-filled"""
+        self.add_sale('INV-R12', 100, self.customer)
+        self.add_sale('INV-R13', 25)
+        self.add_sale('INV-R14', 80, sale_date=self.day + timedelta(days=3))
+
+        result = get_sales_by_day(self.day - timedelta(days=1), self.day + timedelta(days=1))
+
+        self.assertEqual(result, [
+            {'date': '2024-02-29', 'total': 0.0},
+            {'date': '2024-03-01', 'total': 125.0},
+            {'date': '2024-03-02', 'total': 0.0},
+        ])
+
+if __name__ == '__main__':
+    unittest.main()
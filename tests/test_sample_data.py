@@ -0,0 +1,94 @@
+"""
+Tests for the bulk sample-data generator
+"""
+
+import unittest
+from datetime import date
+import numpy as np
+from app import create_app, db
+from app.models import Customer, Product, Sale, SaleItem, Expense
+from app.sample_data import allocate, day_weights, generate, plan_blocks
+
+class SampleDataTestCase(unittest.TestCase):
+    """Test case for deterministic bulk generation"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def snapshot(self):
+        sales = db.session.query(Sale.id, Sale.invoice_number, Sale.customer_id, Sale.sale_date,
+                                 Sale.total_amount, Sale.payment_method).order_by(Sale.id).all()
+        items = db.session.query(SaleItem.sale_id, SaleItem.product_id, SaleItem.quantity,
+                                 SaleItem.subtotal).order_by(SaleItem.id).all()
+        return sales, items
+
+    def test_generates_requested_volume(self):
+        """Test row counts and that sale totals agree with their items"""
+        written = generate(db.engine, sales=500, customers=20, products=30, days=60,
+                           end=date(2024, 6, 30), batch_size=97)
+
+        self.assertEqual(written['sales'], 500)
+        self.assertEqual(db.session.query(Sale).count(), 500)
+        self.assertEqual(db.session.query(SaleItem).count(), written['items'])
+        self.assertEqual(db.session.query(Customer).count(), 20)
+        self.assertEqual(db.session.query(Product).count(), 30)
+        self.assertGreater(db.session.query(Expense).count(), 0)
+
+        first, last = db.session.query(db.func.min(Sale.sale_date), db.func.max(Sale.sale_date)).one()
+        self.assertGreaterEqual(first.date(), date(2024, 5, 2))
+        self.assertLessEqual(last.date(), date(2024, 6, 30))
+
+        for sale in Sale.query.limit(25):
+            self.assertAlmostEqual(sale.total_amount, sale.calculate_total(), places=2)
+
+    def test_same_seed_same_data(self):
+        """Test generation is reproducible from the seed"""
+        options = dict(sales=300, customers=15, products=10, days=40, end=date(2024, 3, 31))
+        generate(db.engine, seed=7, **options)
+        first = self.snapshot()
+
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        generate(db.engine, seed=7, **options)
+        self.assertEqual(self.snapshot(), first)
+
+        db.session.remove()
+        db.drop_all()
+        db.create_all()
+        generate(db.engine, seed=8, **options)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_seasonality(self):
+        """Test day allocation follows weekday and month weights exactly"""
+        counts = allocate(7000, day_weights(date(2024, 1, 1), 366))
+        self.assertEqual(counts.sum(), 7000)
+
+        december = counts[335:366].sum()
+        january = counts[0:31].sum()
+        self.assertGreater(december, january * 1.5)
+
+        saturdays, sundays = counts[5::7].sum(), counts[6::7].sum()
+        self.assertGreater(saturdays, sundays * 2)
+
+    def test_block_plan(self):
+        """Test blocks cover the period with contiguous sale ids"""
+        blocks = plan_blocks(1000, date(2024, 1, 1), 30, first_sale_id=11)
+        self.assertEqual(len(blocks), 5)
+        self.assertEqual(sum(sum(b.day_counts) for b in blocks), 1000)
+        self.assertEqual(blocks[0].first_sale_id, 11)
+        self.assertEqual(blocks[1].first_sale_id, 11 + sum(blocks[0].day_counts))
+        self.assertTrue(np.array_equal(allocate(5, np.ones(3)), [2, 2, 1]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+"""
+Tests for invoice number allocation
+"""
+
+import os
+import re
+import tempfile
+import threading
+import unittest
+from datetime import date
+from unittest import mock
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Product, Sale, SequenceCounter
+from app.pos import record_pos_sales
+from app.sequence import InvoiceSequence
+from app.utils import generate_invoice_number
+from config import TestingConfig
+
+class SequenceTestCase(unittest.TestCase):
+    """Test case for block-leased invoice numbers"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app.config['INVOICE_BLOCK_SIZE'] = 10
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_format(self):
+        """Test numbers are readable, dated and consecutive within a process"""
+        sequence = InvoiceSequence(self.app)
+        self.assertEqual(sequence.allocate(3, date(2024, 3, 1)),
+                         ['INV-20240301-000001', 'INV-20240301-000002', 'INV-20240301-000003'])
+        self.assertTrue(re.fullmatch(r'INV-\d{8}-\d{6}', generate_invoice_number()))
+        self.assertEqual(sequence.allocate(1, date(2024, 3, 2)), ['INV-20240302-000001'])
+
+        # Longer prefixes would not fit Sale.invoice_number once the counter grows
+        for prefix in ('', 'SHOP'):
+            self.app.config['INVOICE_PREFIX'] = prefix
+            with self.assertRaises(ValueError):
+                InvoiceSequence(self.app)
+
+    def test_numbers_come_from_memory_within_a_block(self):
+        """Test the counter is only touched once per block"""
+        sequence = InvoiceSequence(self.app)
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            numbers = [sequence.allocate()[0] for _ in range(25)]
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        self.assertEqual(len(set(numbers)), 25)
+        self.assertEqual(sequence.leases, 3)
+        self.assertLessEqual(len(statements), 3 * 2)
+
+        # Once the block is used up, a request larger than a block takes one lease
+        sequence.allocate(5)
+        self.assertEqual(sequence.leases, 3)
+        self.assertEqual(len(set(sequence.allocate(40))), 40)
+        self.assertEqual(sequence.leases, 4)
+
+    def test_processes_get_disjoint_blocks(self):
+        """Test allocators sharing a counter never overlap and leave gaps"""
+        first, second = InvoiceSequence(self.app), InvoiceSequence(self.app)
+        day = date(2024, 3, 1)
+        a = first.allocate(2, day)
+        b = second.allocate(2, day)
+        c = first.allocate(9, day)
+
+        self.assertEqual(a, ['INV-20240301-000001', 'INV-20240301-000002'])
+        self.assertEqual(b, ['INV-20240301-000011', 'INV-20240301-000012'])
+        self.assertEqual(c[-1], 'INV-20240301-000021')
+        self.assertEqual(len(set(a + b + c)), 13)
+        self.assertEqual(db.session.get(SequenceCounter, 'invoice:20240301').next_value, 31)
+
+    def test_pos_numbers_missing_invoices(self):
+        """Test till sales sent without an invoice number are numbered"""
+        product = Product(name='Pen', price=500, cost=200, stock_quantity=10, min_stock=2)
+        db.session.add(product)
+        db.session.commit()
+        item = {'product_id': product.id, 'quantity': 1}
+
+        created, _ = record_pos_sales([{'items': [item]}, {'invoice_number': 'POS-1', 'items': [item]},
+                                       {'items': [item]}])
+        numbers = [sale['invoice_number'] for sale in created]
+        self.assertEqual(numbers[1], 'POS-1')
+        self.assertRegex(numbers[0], r'^INV-\d{8}-000001$')
+        self.assertRegex(numbers[2], r'^INV-\d{8}-000002$')
+        self.assertEqual(Sale.query.count(), 3)
+
+class SequenceConcurrencyTestCase(unittest.TestCase):
+    """Stress test many threads and processes drawing numbers at once"""
+
+    def setUp(self):
+        """Set up a file database several threads can share"""
+        handle, self.path = tempfile.mkstemp(suffix='.sqlite')
+        os.close(handle)
+        with mock.patch.multiple(TestingConfig, SQLALCHEMY_DATABASE_URI='sqlite:///' + self.path,
+                                 SQLALCHEMY_ENGINE_OPTIONS={'connect_args': {'timeout': 30}}):
+            self.app = create_app('testing')
+        self.app.config['INVOICE_BLOCK_SIZE'] = 7
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        db.engine.dispose()
+        self.app_context.pop()
+        os.remove(self.path)
+
+    def test_no_collisions(self):
+        """Test numbers stay unique across racing threads and allocators"""
+        # Four allocators stand in for worker processes, each shared by four threads
+        sequences = [InvoiceSequence(self.app) for _ in range(4)]
+        day = date(2024, 3, 1)
+        numbers, errors = [], []
+
+        def worker(sequence):
+            with self.app.app_context():
+                try:
+                    drawn = []
+                    for i in range(60):
+                        drawn.extend(sequence.allocate(1 + i % 3, day))
+                    numbers.extend(drawn)
+                except Exception as exc:  # pragma: no cover - reported below
+                    errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(sequences[n % 4],)) for n in range(16)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(numbers), 16 * 120)
+        self.assertEqual(len(set(numbers)), len(numbers))
+        leased = db.session.get(SequenceCounter, 'invoice:20240301').next_value - 1
+        self.assertGreaterEqual(leased, len(numbers))
+        # Unused numbers are at most one partly used block per allocator
+        self.assertLess(leased - len(numbers), 4 * 7)
+
+if __name__ == '__main__':
+    unittest.main()
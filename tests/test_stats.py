@@ -0,0 +1,81 @@
+"""
+Tests for the dashboard KPI service
+"""
+
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from app import create_app, db
+from app.models import Customer, Product, Sale
+from app.stats import dashboard_kpis
+
+class StatsTestCase(unittest.TestCase):
+    """Test case for dashboard statistics"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.today = datetime(2024, 3, 2).date()
+        noon = datetime(2024, 3, 2, 12, 0)
+
+        db.session.add_all([
+            Customer(name='Stats Customer'),
+            Product(name='Low', price=10, cost=5, stock_quantity=1, min_stock=5),
+            Product(name='Fine', price=10, cost=5, stock_quantity=50, min_stock=5),
+            Sale(invoice_number='INV-S1', sale_date=noon, total_amount=300),
+            Sale(invoice_number='INV-S2', sale_date=noon.replace(hour=23, minute=59), total_amount=100),
+            Sale(invoice_number='INV-S3', sale_date=noon - timedelta(days=1), total_amount=200),
+            Sale(invoice_number='INV-S4', sale_date=noon - timedelta(days=2), total_amount=50),
+            Sale(invoice_number='INV-S5', sale_date=noon + timedelta(days=1), total_amount=999),
+        ])
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_dashboard_kpis(self):
+        """Test KPI values use half-open day ranges"""
+        stats = dashboard_kpis(self.today)
+
+        self.assertEqual(stats, {
+            'today_sales': 400.0,
+            'yesterday_sales': 200.0,
+            'month_sales': 600.0,
+            'low_stock_count': 1,
+            'total_customers': 1,
+            'sales_change': 100.0
+        })
+
+    def test_month_start_includes_previous_day(self):
+        """Test yesterday is counted on the first day of a month"""
+        stats = dashboard_kpis(datetime(2024, 3, 1).date())
+
+        self.assertEqual(stats['today_sales'], 200.0)
+        self.assertEqual(stats['yesterday_sales'], 50.0)
+        self.assertEqual(stats['month_sales'], 200.0)
+
+    def test_single_round_trip(self):
+        """Test all KPIs are computed by one statement"""
+        statements = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            dashboard_kpis(self.today)
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+
+        self.assertEqual(len(statements), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+"""
+Tests for the dashboard Server-Sent Events stream
+"""
+
+import json
+import unittest
+from unittest import mock
+from datetime import datetime
+from app import create_app, db
+from app.models import User, Sale
+from app.stream import broadcaster_for
+
+class StreamTestCase(unittest.TestCase):
+    """Test case for the live dashboard stream"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app.config['SSE_HEARTBEAT_INTERVAL'] = 0.01
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.broadcaster = broadcaster_for(self.app)
+        self.broadcaster.heartbeat_interval = 0.01
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def read_event(self, stream):
+        """Return (id, data) of the next stats event, skipping other frames"""
+        while True:
+            frame = next(stream)
+            if frame.startswith('id: '):
+                lines = dict(line.split(': ', 1) for line in frame.strip().split('\n'))
+                return lines['id'], json.loads(lines['data'])
+
+    def test_stream_pushes_changes(self):
+        """Test a committed sale produces a new snapshot"""
+        stream = self.broadcaster.events()
+        self.assertTrue(next(stream).startswith('retry: '))
+
+        first_id, first = self.read_event(stream)
+        self.assertEqual(first['today_sales'], 0)
+
+        db.session.add(Sale(invoice_number='INV-SSE', sale_date=datetime.now(), total_amount=75))
+        db.session.commit()
+
+        second_id, second = self.read_event(stream)
+        self.assertNotEqual(first_id, second_id)
+        self.assertEqual(second['today_sales'], 75)
+        stream.close()
+        self.assertEqual(self.broadcaster.subscribers, 0)
+
+    def test_sees_writes_from_other_workers(self):
+        """Test changes are detected from the database, not this process's cache versions"""
+        self.assertTrue(self.broadcaster.refresh())
+        self.assertFalse(self.broadcaster.refresh())
+
+        # Another worker's commit bumps nothing in this process
+        with mock.patch('app.cache.ResultCache.invalidate'):
+            db.session.add(Sale(invoice_number='INV-OTHER', sale_date=datetime.now(), total_amount=20))
+            db.session.commit()
+
+        self.assertTrue(self.broadcaster.refresh())
+        self.assertEqual(json.loads(self.broadcaster.latest[1])['today_sales'], 20)
+
+    def test_last_event_id_skips_replay(self):
+        """Test a reconnecting client with the latest id only gets heartbeats"""
+        self.broadcaster.refresh()
+        latest_id = self.broadcaster.latest[0]
+
+        stream = self.broadcaster.events(last_event_id=latest_id)
+        next(stream)
+        self.assertEqual(next(stream), ': heartbeat\n\n')
+        stream.close()
+
+    def test_one_computation_for_many_clients(self):
+        """Test several viewers share one KPI computation"""
+        with mock.patch('app.stats.dashboard_kpis', return_value={'today_sales': 1}) as kpis:
+            streams = [self.broadcaster.events() for _ in range(5)]
+            for stream in streams:
+                next(stream)
+                self.read_event(stream)
+            for stream in streams:
+                stream.close()
+
+        self.assertEqual(kpis.call_count, 1)
+
+    def test_stream_endpoint(self):
+        """Test the endpoint requires login and serves an event stream"""
+        client = self.app.test_client()
+        response = client.get('/api/stream/dashboard')
+        self.assertEqual(response.status_code, 302)
+
+        user = User(username='streamer', email='streamer@example.com')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        client.post('/auth/login', data={'username': 'streamer', 'password': 'pass'})
+
+        response = client.get('/api/stream/dashboard', buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        response.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+"""
+Tests for the time-bucketing query layer
+"""
+
+import unittest
+from datetime import date, datetime
+from sqlalchemy import func, select
+from sqlalchemy.dialects import mysql
+from app import create_app, db
+from app.models import Sale
+from app.routes import get_monthly_sales_data
+from app.timeseries import bucket_expression, buckets, half_open, period_range, shift_months, time_series
+
+class TimeSeriesTestCase(unittest.TestCase):
+    """Test case for bucketed, zero-filled series"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        # Mon 2024-01-01 .. Sun 2024-03-03 span two months and several weeks
+        sales = [(datetime(2024, 1, 1, 8), 10), (datetime(2024, 1, 7, 23, 59), 20),
+                 (datetime(2024, 1, 8, 0, 0), 40), (datetime(2024, 3, 3, 12), 80)]
+        for i, (sale_date, amount) in enumerate(sales):
+            db.session.add(Sale(invoice_number=f'INV-T{i}', sale_date=sale_date, total_amount=amount))
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up after tests"""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def series(self, start, end, grain):
+        points = time_series({'total': func.sum(Sale.total_amount), 'count': func.count(Sale.id)},
+                             Sale.sale_date, start, end, grain)
+        return [(str(p['bucket']), p['total'], p['count']) for p in points]
+
+    def test_daily_buckets_are_zero_filled(self):
+        """Test every day in the range appears, empty ones as zero"""
+        result = self.series(date(2023, 12, 31), date(2024, 1, 3), 'day')
+        self.assertEqual(result, [('2023-12-31', 0.0, 0.0), ('2024-01-01', 10.0, 1.0), ('2024-01-02', 0.0, 0.0)])
+
+    def test_week_and_month_buckets(self):
+        """Test ISO weeks start on Monday and months on the 1st"""
+        weeks = self.series(date(2024, 1, 1), date(2024, 1, 15), 'week')
+        self.assertEqual(weeks, [('2024-01-01', 30.0, 2.0), ('2024-01-08', 40.0, 1.0)])
+
+        months = self.series(date(2024, 1, 1), date(2024, 4, 1), 'month')
+        self.assertEqual(months, [('2024-01-01', 70.0, 3.0), ('2024-02-01', 0.0, 0.0), ('2024-03-01', 80.0, 1.0)])
+
+    def test_half_open_range(self):
+        """Test the end bound is exclusive and the filter is on the raw column"""
+        result = self.series(datetime(2024, 1, 7, 23, 59), datetime(2024, 1, 8), 'day')
+        self.assertEqual(result, [('2024-01-07', 20.0, 1.0)])
+
+        sql = str(select(Sale.id).where(*half_open(Sale.sale_date, date(2024, 1, 1), date(2024, 2, 1))))
+        self.assertIn('sale.sale_date >= ', sql)
+        self.assertIn('sale.sale_date < ', sql)
+
+        self.assertEqual(period_range(date(2024, 1, 1), date(2024, 1, 31)),
+                         (datetime(2024, 1, 1), datetime(2024, 2, 1)))
+        # A datetime end still includes that instant, as the old <= filter did
+        start, end = period_range(date(2024, 1, 1), datetime(2024, 1, 31, 23, 59, 59))
+        self.assertTrue(start <= datetime(2024, 1, 31, 23, 59, 59) < end <= datetime(2024, 2, 1))
+
+    def test_mysql_expressions(self):
+        """Test MySQL bucketing compiles to native date functions"""
+        compile_mysql = lambda expr: str(expr.compile(dialect=mysql.dialect()))
+        self.assertIn('date(sale.sale_date)', compile_mysql(bucket_expression(Sale.sale_date, 'day', 'mysql')))
+        self.assertIn('weekday(sale.sale_date)', compile_mysql(bucket_expression(Sale.sale_date, 'week', 'mysql')))
+        self.assertIn('date_format(sale.sale_date', compile_mysql(bucket_expression(Sale.sale_date, 'month', 'mysql')))
+        with self.assertRaises(ValueError):
+            bucket_expression(Sale.sale_date, 'hour', 'mysql')
+
+    def test_calendar_helpers(self):
+        """Test month shifting and bucket enumeration"""
+        self.assertEqual(shift_months(date(2024, 1, 31), -1), date(2023, 12, 1))
+        self.assertEqual(shift_months(date(2024, 11, 15), 3), date(2025, 2, 1))
+        self.assertEqual(list(buckets(date(2024, 1, 3), date(2024, 1, 10), 'week')),
+                         [date(2024, 1, 1), date(2024, 1, 8)])
+
+    def test_monthly_chart_has_six_months(self):
+        """Test the dashboard chart data always covers six calendar months"""
+        data = get_monthly_sales_data()
+        self.assertEqual(len(data['months']), 6)
+        self.assertEqual(data['months'][-1], datetime.now().strftime('%Y-%m'))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+"""
+Tests for the cached Flask-Login user loader
+"""
+
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.cache import cache
+from app.models import User
+from app.usercache import UserSnapshot
+
+class UserCacheTestCase(unittest.TestCase):
+    """Test case for user snapshots and their invalidation"""
+
+    def setUp(self):
+        """Set up test environment"""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        user = User(username='clerk', email='clerk@example.com', role='staff')
+        user.set_password('pass')
+        db.session.add(user)
+        db.session.commit()
+        self.user_id = user.id
+
+        self.user_queries = 0
+        event.listen(db.engine, 'before_cursor_execute', self.count_user_queries)
+
+        self.client = self.app.test_client()
+        self.request('/auth/login', method='POST', data={'username': 'clerk', 'password': 'pass'})
+
+    def tearDown(self):
+        """Clean up after tests"""
+        event.remove(db.engine, 'before_cursor_execute', self.count_user_queries)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def count_user_queries(self, conn, cursor, statement, parameters, context, executemany):
+        if 'FROM user' in statement:
+            self.user_queries += 1
+
+    def request(self, path, **kwargs):
+        # Requests get their own app context (and so their own g and session)
+        self.app_context.pop()
+        try:
+            return self.client.open(path, **kwargs)
+        finally:
+            self.app_context.push()
+
+    @property
+    def user(self):
+        return db.session.get(User, self.user_id)
+
+    def stats_status(self):
+        return self.request('/api/db-stats').status_code
+
+    def test_requests_reuse_the_snapshot(self):
+        """Test authenticated requests after the first cost no user query"""
+        self.user_queries = 0
+        for _ in range(5):
+            self.assertEqual(self.request('/reports').status_code, 200)
+        self.assertEqual(self.user_queries, 1)
+
+        snapshot = self.app.extensions['user_cache'].load(self.user_id)
+        self.assertIsInstance(snapshot, UserSnapshot)
+        self.assertEqual((snapshot.username, snapshot.role, snapshot.get_id()), ('clerk', 'staff', str(self.user_id)))
+
+    def test_role_change_evicts(self):
+        """Test a committed role change applies on the next request"""
+        self.assertEqual(self.stats_status(), 403)
+        self.user.role = 'admin'
+        db.session.commit()
+        self.assertEqual(self.stats_status(), 200)
+
+    def test_unrelated_change_keeps_entry(self):
+        """Test changes to other columns don't evict the snapshot"""
+        self.request('/reports')
+        self.user.email = 'new@example.com'
+        db.session.commit()
+        self.user_queries = 0
+        self.request('/reports')
+        self.assertEqual(self.user_queries, 0)
+
+    def test_password_change_and_delete_evict(self):
+        """Test password changes and deletes are not served from the cache"""
+        self.request('/reports')
+        self.user.set_password('new-pass')
+        db.session.commit()
+        self.user_queries = 0
+        self.request('/reports')
+        self.assertEqual(self.user_queries, 1)
+
+        db.session.delete(self.user)
+        db.session.commit()
+        self.assertEqual(self.request('/reports').status_code, 302)
+
+    def test_version_bump_from_another_process(self):
+        """Test a bumped 'users' version makes cached snapshots stale"""
+        self.request('/reports')
+        User.query.filter_by(id=self.user_id).update({'role': 'admin'})
+        db.session.commit()
+        self.assertEqual(self.stats_status(), 403)  # bulk update bypassed the session
+
+        cache.invalidate('users')
+        self.assertEqual(self.stats_status(), 200)
+
+if __name__ == '__main__':
+    unittest.main()